@@ -0,0 +1 @@
+"""Нагрузочные тесты бота на локальных заглушках."""
@@ -0,0 +1,208 @@
+"""Локальные заглушки API Практикума и Telegram Bot API для нагрузки."""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUSES = ('reviewing', 'rejected', 'reviewing', 'approved')
+HOMEWORK_NAME = re.compile(r'"(\w+):(\d+)"')
+
+
+class ServerConfig:
+    """Параметры заглушек: задержка, доля ошибок и размер ответа.
+
+    Доля `slow_rate` ответов API задерживается на `slow_latency` секунд:
+    так моделируется длинный хвост задержек.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, history=0,
+                 comment_size=0, change_every=10.0, telegram_latency=0.0,
+                 telegram_error_rate=0.0, started=None, slow_rate=0.0,
+                 slow_latency=1.0):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.history = history
+        self.comment_size = comment_size
+        self.change_every = change_every
+        self.telegram_latency = telegram_latency
+        self.telegram_error_rate = telegram_error_rate
+        self.started = time.time() if started is None else started
+
+    def phase(self, now):
+        """Номер текущего статуса и время, когда он появился."""
+        phase = int((now - self.started) // self.change_every)
+        return phase, self.started + phase * self.change_every
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    """Общая часть заглушек: keep-alive и ответы в JSON."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, data):
+        """Отправляем ответ в формате JSON."""
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Не засоряем вывод бенчмарка."""
+
+
+class PracticumHandler(JSONHandler):
+    """Заглушка `homework_statuses`: статус меняется раз в `change_every`.
+
+    Название работы содержит токен и номер статуса, чтобы заглушка
+    Telegram могла посчитать задержку уведомления.
+    """
+
+    def do_GET(self):
+        """Отвечаем на запрос статусов домашних работ."""
+        config = self.server.config
+        if self.path == '/stats':
+            self.send_json(200, {'requests': self.server.requests})
+            return
+        with self.server.lock:
+            self.server.requests += 1
+        if config.latency:
+            time.sleep(config.latency)
+        if random.random() < config.slow_rate:
+            time.sleep(config.slow_latency)
+        if random.random() < config.error_rate:
+            self.send_json(500, {'code': 'server_error'})
+            return
+        token = self.headers.get('Authorization', '').split()[-1]
+        query = parse_qs(urlparse(self.path).query)
+        from_date = int(query.get('from_date', ['0'])[0])
+        now = time.time()
+        phase, changed_at = config.phase(now)
+        homeworks = []
+        if changed_at >= from_date:
+            homeworks.append({
+                'id': 1,
+                'homework_name': f'{token}:{phase}',
+                'status': STATUSES[phase % len(STATUSES)],
+                'reviewer_comment': 'x' * config.comment_size,
+                'date_updated': str(int(changed_at * 1000)),
+            })
+        if from_date == 0:
+            homeworks.extend({
+                'id': number,
+                'homework_name': f'history{number}',
+                'status': 'approved',
+                'reviewer_comment': 'x' * config.comment_size,
+                'date_updated': '0',
+            } for number in range(2, config.history + 2))
+        self.send_json(200, {'homeworks': homeworks, 'current_date': int(now)})
+
+
+class TelegramHandler(JSONHandler):
+    """Заглушка Bot API: запоминает задержку каждого уведомления."""
+
+    def do_GET(self):
+        """Отдаём накопленную статистику по `/stats`."""
+        with self.server.lock:
+            stats = {
+                'messages': self.server.messages,
+                'latencies': list(self.server.latencies),
+            }
+        self.send_json(200, stats)
+
+    def do_POST(self):
+        """Принимаем `sendMessage`."""
+        config = self.server.config
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if config.telegram_latency:
+            time.sleep(config.telegram_latency)
+        if random.random() < config.telegram_error_rate:
+            self.send_json(500, {'ok': False, 'description': 'error'})
+            return
+        now = time.time()
+        latencies = [
+            now - (config.started + int(phase) * config.change_every)
+            for _, phase in HOMEWORK_NAME.findall(data.get('text', ''))
+        ]
+        with self.server.lock:
+            self.server.messages += 1
+            self.server.latencies.extend(latencies)
+            message_id = self.server.messages
+        self.send_json(200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(now),
+            'chat': {'id': data.get('chat_id'), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+
+class StubServer(ThreadingHTTPServer):
+    """Сервер с очередью соединений под сотни одновременных клиентов."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_server(handler, config):
+    """Создаём сервер заглушки на свободном порту."""
+    server = StubServer(('127.0.0.1', 0), handler)
+    server.config = config
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.messages = 0
+    server.latencies = []
+    return server
+
+
+class FakeServers:
+    """Запускаем обе заглушки в фоновых потоках."""
+
+    def __init__(self, config):
+        self.config = config
+        self.practicum = make_server(PracticumHandler, config)
+        self.telegram = make_server(TelegramHandler, config)
+
+    @property
+    def practicum_url(self):
+        """Адрес заглушки `homework_statuses`."""
+        return 'http://127.0.0.1:{}/api/user_api/homework_statuses/'.format(
+            self.practicum.server_address[1]
+        )
+
+    @property
+    def telegram_url(self):
+        """Базовый адрес заглушки Bot API для `telegram.Bot`."""
+        return 'http://127.0.0.1:{}/bot'.format(
+            self.telegram.server_address[1]
+        )
+
+    def start(self):
+        """Запускаем серверы."""
+        for server in (self.practicum, self.telegram):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Останавливаем серверы."""
+        for server in (self.practicum, self.telegram):
+            server.shutdown()
+            server.server_close()
+
+
+def serve_in_process(config, urls, stop):
+    """Точка входа дочернего процесса с заглушками.
+
+    Заглушки работают в отдельном процессе, чтобы их процессорное время
+    не попадало в замеры бота.
+    """
+    servers = FakeServers(config).start()
+    urls.put((servers.practicum_url, servers.telegram_url))
+    stop.wait()
+    servers.stop()
@@ -0,0 +1,90 @@
+"""Сколько памяти занимает состояние одного пользователя.
+
+Запуск:
+
+    python -m benchmarks.memory --tenants 100000
+
+Создаём пользователей так же, как `engine.load_tenants`, прогоняем через
+индекс статусов ответ API с несколькими работами и считаем выделенную
+память через `tracemalloc`.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+from scheduler import IDLE, AdaptiveSchedule  # noqa: E402
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+def make_response(rng, homeworks):
+    """Ответ API, как он приходит после `json.loads`."""
+    return json.loads(json.dumps({
+        'homeworks': [{
+            'id': rng.randrange(10 ** 6),
+            'homework_name': f'user__project_{number}.zip',
+            'status': rng.choice(STATUSES),
+            'reviewer_comment': 'Принято!',
+            'date_updated': '2024-01-01T00:00:00Z',
+        } for number in range(homeworks)],
+        'current_date': 1700000000 + rng.randrange(10 ** 6),
+    }))
+
+
+def build_tenants(count, homeworks, seed=0):
+    """Пользователи с состоянием после одного успешного опроса."""
+    rng = random.Random(seed)
+    schedule = AdaptiveSchedule(rng=rng.random)
+    tenants = []
+    for number in range(count):
+        tenant = engine.Tenant(f'y0_{number:040d}', 10 ** 9 + number)
+        response = make_response(rng, homeworks)
+        for homework in tenant.index.changes(response['homeworks']):
+            tenant.index.commit(homework)
+        tenant.timestamp = response['current_date']
+        schedule.next_interval(tenant, IDLE)
+        tenants.append(tenant)
+    return tenants
+
+
+def measure(count, homeworks):
+    """Байт на пользователя без учёта токена и номера чата."""
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    tenants = build_tenants(count, homeworks)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(
+        stat.size_diff for stat in snapshot.compare_to(baseline, 'filename')
+    )
+    inputs = sum(
+        sys.getsizeof(tenant.practicum_token) + sys.getsizeof(tenant.chat_id)
+        for tenant in tenants
+    )
+    return {
+        'tenants': count,
+        'homeworks_per_tenant': homeworks,
+        'bytes_per_tenant': round(total / count),
+        'state_bytes_per_tenant': round((total - inputs) / count),
+    }
+
+
+def main(argv=None):
+    """Печатаем расход памяти для разного числа работ у пользователя."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=100000)
+    parser.add_argument('--homeworks', type=int, nargs='+', default=[0, 1, 5])
+    args = parser.parse_args(argv)
+    results = [measure(args.tenants, count) for count in args.homeworks]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
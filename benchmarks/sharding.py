@@ -0,0 +1,98 @@
+"""Распределение пользователей по процессам и масштабирование по ядрам.
+
+Запуск:
+
+    python -m benchmarks.sharding --tenants 4000 --workers 1 2 4
+
+Сначала считаем, какая доля пользователей меняет обработчик при
+добавлении ещё одного: на кольце `supervisor.HashRing` и при делении по
+модулю. Затем делим пользователей по кольцу и прогоняем симуляцию
+опроса каждой доли в отдельном процессе, как это делает
+`supervisor.Supervisor`, и сравниваем пропускную способность с одним
+процессом.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.simulation import HOUR, simulate  # noqa: E402
+from supervisor import HashRing, ring_hash  # noqa: E402
+
+
+def moved_share(keys, workers):
+    """Доля ключей, сменивших обработчик при переходе к `workers + 1`."""
+    before = HashRing(f'worker-{number}' for number in range(workers))
+    after = HashRing(f'worker-{number}' for number in range(workers + 1))
+    ring = sum(before.node_for(key) != after.node_for(key) for key in keys)
+    modulo = sum(
+        ring_hash(key) % workers != ring_hash(key) % (workers + 1)
+        for key in keys
+    )
+    return {
+        'workers': f'{workers}->{workers + 1}',
+        'ideal': round(1 / (workers + 1), 3),
+        'ring': round(ring / len(keys), 3),
+        'modulo': round(modulo / len(keys), 3),
+    }
+
+
+def simulate_share(numbers, hours):
+    """Симуляция опроса одной доли пользователей."""
+    return simulate(numbers, hours * HOUR, rate=None)
+
+
+def run_sharded(tenants, workers, hours):
+    """Делим пользователей по кольцу и опрашиваем доли параллельно."""
+    ring = HashRing(f'worker-{number}' for number in range(workers))
+    shares = {node: [] for node in ring.nodes}
+    for number in range(tenants):
+        shares[ring.node_for(number)].append(number)
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        results = pool.starmap(
+            simulate_share, [(share, hours) for share in shares.values()]
+        )
+    elapsed = time.perf_counter() - started
+    requests = sum(result['requests'] for result in results)
+    return {
+        'workers': workers,
+        'tenants_per_worker': sorted(len(share) for share in shares.values()),
+        'requests': requests,
+        'wall_seconds': round(elapsed, 2),
+        'requests_per_second': round(requests / elapsed),
+    }
+
+
+def main(argv=None):
+    """Печатаем долю переездов и пропускную способность."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=4000)
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args(argv)
+    keys = range(args.tenants)
+    scaling = [
+        run_sharded(args.tenants, workers, args.hours)
+        for workers in args.workers
+    ]
+    for result in scaling:
+        result['speedup'] = round(
+            result['requests_per_second']
+            / scaling[0]['requests_per_second'], 2
+        )
+    results = {
+        'cpu_count': os.cpu_count(),
+        'moved': [moved_share(keys, workers) for workers in range(1, 8)],
+        'scaling': scaling,
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+"""Симуляция многопользовательского опроса в виртуальном времени.
+
+Запуск:
+
+    python -m benchmarks.simulation --tenants 5000 --hours 24
+
+Цикл событий asyncio идёт по виртуальным часам: `asyncio.sleep` не ждёт,
+а сразу переводит часы к ближайшему таймеру. API Практикума и Telegram
+заменены моделями в памяти, поэтому сутки опроса тысяч пользователей
+проходят за секунды, а стратегии опроса можно сравнить по числу запросов
+на одно уведомление.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import selectors
+import sys
+import time
+from concurrent.futures import Executor, Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+import homework  # noqa: E402
+from benchmarks.fake_servers import HOMEWORK_NAME  # noqa: E402
+from breaker import CircuitBreaker  # noqa: E402
+from cache import ResponseCache  # noqa: E402
+from scheduler import AdaptiveSchedule  # noqa: E402
+
+HOUR = 60 * 60
+STRATEGIES = {
+    'adaptive': AdaptiveSchedule,
+    'fixed': lambda rng: AdaptiveSchedule(
+        base=homework.RETRY_PERIOD, reviewing=homework.RETRY_PERIOD,
+        maximum=homework.RETRY_PERIOD, rng=rng
+    ),
+}
+
+
+class VirtualClock:
+    """Виртуальные часы, которые двигаются только вперёд и только явно."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        """Текущее виртуальное время."""
+        return self.now
+
+    def advance(self, seconds):
+        """Переводим часы вперёд на `seconds` секунд."""
+        self.now += max(0.0, seconds)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """Селектор, который вместо ожидания переводит виртуальные часы."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        """Возвращаем готовые события, не блокируясь."""
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            raise RuntimeError('Симуляции больше нечего ждать.')
+        self.clock.advance(timeout)
+        return events
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Цикл событий, в котором таймеры срабатывают по виртуальным часам."""
+
+    def __init__(self, clock):
+        super().__init__(VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self):
+        """Текущее виртуальное время."""
+        return self.clock()
+
+
+class InlineExecutor(Executor):
+    """Выполняем задачу сразу в вызывающем потоке.
+
+    Модели API отвечают мгновенно, а потоки в виртуальном времени только
+    мешали бы: цикл событий не знает, сколько им ждать.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        """Выполняем `fn` и возвращаем завершённый future."""
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+class SimulatedResponse:
+    """Ответ модели API с тем же интерфейсом, что у `requests.Response`."""
+
+    def __init__(self, status_code, data, url):
+        self.status_code = status_code
+        self.url = url
+        self.headers = {}
+        self.content = json.dumps(data).encode('utf-8')
+        self._data = data
+
+    def json(self):
+        """Тело ответа."""
+        return self._data
+
+
+class SimulatedPracticum:
+    """Модель API Практикума с жизненным циклом домашних работ.
+
+    Каждый пользователь сдаёт работу в среднем раз в `submit_every`
+    секунд, ревьюер берёт её через `pickup_time` и проверяет за
+    `review_time`. Половина работ возвращается на доработку и сдаётся
+    снова. Моменты смены статусов случайны, но воспроизводимы по `seed`.
+    В интервалы `outages` (начало, конец) API отвечает только ошибкой 500.
+    Объект подменяет `session` в `homework.request_api`.
+    """
+
+    def __init__(self, clock, submit_every=24 * HOUR, pickup_time=HOUR,
+                 review_time=6 * HOUR, error_rate=0.0, outages=(), seed=0):
+        self.clock = clock
+        self.outages = list(outages)
+        self.outage_requests = 0
+        self.submit_every = submit_every
+        self.pickup_time = pickup_time
+        self.review_time = review_time
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self.changes = 0
+        self.changed_at = {}
+        self._rng = random.Random(seed)
+        self._states = {}
+
+    def _state(self, token):
+        state = self._states.get(token)
+        if state is None:
+            rng = random.Random(f'{self.seed}:{token}')
+            state = self._states[token] = {
+                'rng': rng, 'homeworks': {}, 'id': 1, 'phase': 0,
+                'next': ('reviewing', rng.expovariate(1 / self.submit_every)),
+            }
+        return state
+
+    def _advance(self, token, now):
+        """Применяем все смены статуса, наступившие к моменту `now`."""
+        state = self._state(token)
+        rng = state['rng']
+        while state['next'][1] <= now:
+            status, changed_at = state['next']
+            state['phase'] += 1
+            name = f'{token}:{state["phase"]}'
+            state['homeworks'][state['id']] = {
+                'id': state['id'],
+                'homework_name': name,
+                'status': status,
+                'date_updated': int(changed_at),
+            }
+            self.changed_at[name] = changed_at
+            self.changes += 1
+            if status == 'reviewing':
+                state['next'] = ('approved' if rng.random() < 0.5
+                                 else 'rejected',
+                                 changed_at + rng.expovariate(
+                                     1 / self.review_time))
+            elif status == 'rejected':
+                state['next'] = ('reviewing', changed_at + rng.expovariate(
+                    1 / self.pickup_time))
+            else:
+                state['id'] += 1
+                state['next'] = ('reviewing', changed_at + rng.expovariate(
+                    1 / self.submit_every))
+        return state
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        """Отвечаем на запрос `homework_statuses`."""
+        self.requests += 1
+        now = self.clock()
+        if any(start <= now < end for start, end in self.outages):
+            self.outage_requests += 1
+            return SimulatedResponse(500, {'code': 'server_error'}, url)
+        if self._rng.random() < self.error_rate:
+            return SimulatedResponse(500, {'code': 'server_error'}, url)
+        token = headers['Authorization'].split()[-1]
+        from_date = int((params or {}).get('from_date', 0))
+        homeworks = [
+            item for item in self._advance(token, now)['homeworks'].values()
+            if item['date_updated'] >= from_date
+        ]
+        homeworks.sort(key=lambda item: item['date_updated'], reverse=True)
+        return SimulatedResponse(
+            200, {'homeworks': homeworks, 'current_date': int(now)}, url
+        )
+
+
+class SimulatedBot:
+    """Модель Telegram: запоминаем задержку каждого уведомления."""
+
+    def __init__(self, clock, practicum):
+        self.clock = clock
+        self.practicum = practicum
+        self.messages = 0
+        self.latencies = []
+
+    def send_message(self, chat_id, text, timeout=None):
+        """Принимаем сообщение."""
+        self.messages += 1
+        now = self.clock()
+        for token, phase in HOMEWORK_NAME.findall(text):
+            self.latencies.append(
+                now - self.practicum.changed_at[f'{token}:{phase}']
+            )
+
+
+def percentile(values, fraction):
+    """Перцентиль по выборке."""
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def simulate(tenants=1000, duration=24 * HOUR, strategy='adaptive',
+             seed=0, cache=True, breaker=True, rate=homework.PRACTICUM_RATE,
+             **practicum_options):
+    """Прогоняем движок `duration` виртуальных секунд и считаем итоги.
+
+    `tenants` - число пользователей или номера пользователей, если
+    симулируется только часть из них.
+    """
+    numbers = range(tenants) if isinstance(tenants, int) else list(tenants)
+    clock = VirtualClock()
+    practicum = SimulatedPracticum(clock, seed=seed, **practicum_options)
+    bot = SimulatedBot(clock, practicum)
+    polling = engine.PollingEngine(
+        bot,
+        [engine.Tenant(f'token{number}', number) for number in numbers],
+        schedule=STRATEGIES[strategy](rng=random.Random(seed).random),
+        session=practicum, cache=ResponseCache() if cache else None,
+        outbox_options={'clock': clock},
+        report_period=duration * 2, clock=clock, executor=InlineExecutor(),
+        breaker=CircuitBreaker(
+            clock=clock, rng=random.Random(seed).random
+        ) if breaker else None,
+        rate=rate
+    )
+
+    async def run():
+        try:
+            await asyncio.wait_for(polling.run(), timeout=duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await polling.outbox.stop()
+
+    loop = VirtualTimeLoop(clock)
+    started = time.perf_counter()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+    for tenant in polling.tenants:
+        practicum._advance(tenant.practicum_token, clock())
+    notifications = len(bot.latencies)
+    return {
+        'strategy': strategy,
+        'tenants': len(numbers),
+        'virtual_hours': round(clock() / HOUR, 2),
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'requests': practicum.requests,
+        'requests_during_outages': practicum.outage_requests,
+        'status_changes': practicum.changes,
+        'notifications': notifications,
+        'messages': bot.messages,
+        'requests_per_notification': round(
+            practicum.requests / max(notifications, 1), 2
+        ),
+        'latency_p50': round(percentile(bot.latencies, 0.5), 1),
+        'latency_p99': round(percentile(bot.latencies, 0.99), 1),
+    }
+
+
+def parse_args(argv=None):
+    """Разбираем параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES),
+                        action='append',
+                        help='можно указать несколько раз для сравнения')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--submit-every', type=float, default=24,
+                        help='как часто сдаются работы, часы')
+    parser.add_argument('--pickup-time', type=float, default=1,
+                        help='через сколько ревьюер берёт работу, часы')
+    parser.add_argument('--review-time', type=float, default=6,
+                        help='сколько длится проверка, часы')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов API с кодом 500')
+    parser.add_argument('--outage', type=float, nargs=2, action='append',
+                        metavar=('START', 'HOURS'), default=[],
+                        help='сбой API: начало и длительность, часы')
+    parser.add_argument('--practicum-rate', type=float,
+                        default=homework.PRACTICUM_RATE,
+                        help='общий лимит запросов к API в секунду')
+    parser.add_argument('--no-breaker', action='store_true',
+                        help='опрашивать без предохранителя')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Сравниваем стратегии опроса на одной и той же модели."""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+    results = [
+        simulate(
+            args.tenants, args.hours * HOUR, strategy, args.seed,
+            submit_every=args.submit_every * HOUR,
+            pickup_time=args.pickup_time * HOUR,
+            review_time=args.review_time * HOUR,
+            error_rate=args.error_rate, breaker=not args.no_breaker,
+            rate=args.practicum_rate,
+            outages=[(start * HOUR, (start + hours) * HOUR)
+                     for start, hours in args.outage],
+        )
+        for strategy in args.strategy or sorted(STRATEGIES)
+    ]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
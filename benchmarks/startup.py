@@ -0,0 +1,130 @@
+"""Время запуска: импорт `homework` и проверка настроек `--check`.
+
+Запуск:
+
+    python -m benchmarks.startup --runs 5 --budget-ms 60
+
+Импорт выполняется в отдельном интерпретаторе с `-X importtime`, из
+вывода берётся суммарное время импорта `homework` и самые тяжёлые
+модули. Отдельно замеряется полное время `python homework.py --check`
+по сравнению с пустым интерпретатором. Если импорт дольше бюджета
+`--budget-ms`, бенчмарк завершается с кодом 1.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('telegram', 'requests', 'urllib3', 'http.server')
+CHECK_ENV = {
+    'PRACTICUM_TOKEN': 'token',
+    'TELEGRAM_TOKEN': '123:token',
+    'TELEGRAM_CHAT_ID': '1',
+}
+
+
+def parse_importtime(output):
+    """Строки `-X importtime`: (модуль, глубина, своё и общее время, мкс)."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(own), int(cumulative)))
+    return entries
+
+
+def subtree(entries, module):
+    """Модуль и всё, что импортировано при его загрузке.
+
+    Вложенные импорты печатаются до самого модуля, поэтому идём назад от
+    его строки, пока глубина больше нуля.
+    """
+    for position in range(len(entries) - 1, -1, -1):
+        name, depth, _, _ = entries[position]
+        if name == module and depth == 0:
+            break
+    else:
+        raise LookupError(f'{module} не импортировался.')
+    start = position
+    while start > 0 and entries[start - 1][1] > 0:
+        start -= 1
+    return entries[start:position + 1]
+
+
+def import_profile(args, env=None):
+    """Запускаем интерпретатор с `-X importtime` и разбираем вывод."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+        env={**os.environ, **(env or {})}, capture_output=True, text=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_import(module='homework', runs=5, top=10):
+    """Лучшее из `runs` время импорта `module` и самые тяжёлые модули."""
+    best = None
+    for _ in range(runs):
+        modules = subtree(import_profile(['-c', f'import {module}']), module)
+        if best is None or modules[-1][3] < best[-1][3]:
+            best = modules
+    names = {name for name, _, _, _ in best}
+    heaviest = sorted(best[:-1], key=lambda entry: entry[3], reverse=True)
+    return {
+        'import_ms': round(best[-1][3] / 1000, 1),
+        'heavy_modules': sorted(
+            name for name in names
+            if name.split('.')[0] in HEAVY_MODULES or name in HEAVY_MODULES
+        ),
+        'heaviest': [
+            {'module': name, 'cumulative_ms': round(cumulative / 1000, 1)}
+            for name, depth, _, cumulative in heaviest if depth == 1
+        ][:top],
+    }
+
+
+def wall_time(args, runs=5, env=None):
+    """Лучшее из `runs` полное время работы интерпретатора, мс."""
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args], cwd=ROOT, check=True,
+            env={**os.environ, **(env or {})}, capture_output=True
+        )
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 1)
+
+
+def main(argv=None):
+    """Печатаем профиль импорта и проверяем бюджет времени запуска."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=60,
+                        help='предел времени импорта homework, мс')
+    args = parser.parse_args(argv)
+    results = measure_import(runs=args.runs, top=args.top)
+    results['check_ms'] = wall_time(
+        ['homework.py', '--check'], args.runs, CHECK_ENV
+    )
+    results['interpreter_ms'] = wall_time(['-c', 'pass'], args.runs)
+    results['budget_ms'] = args.budget_ms
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if results['import_ms'] > args.budget_ms:
+        print(
+            f'Импорт homework занял {results["import_ms"]} мс, бюджет '
+            f'{args.budget_ms} мс.', file=sys.stderr
+        )
+        sys.exit(1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
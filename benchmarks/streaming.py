@@ -0,0 +1,115 @@
+"""Память и время до первой работы при разборе большого ответа API.
+
+Запуск:
+
+    python -m benchmarks.streaming --homeworks 1000 10000 100000
+
+Тело ответа создаётся фрагментами по мере чтения, как при загрузке из
+сети. Сравниваем `response.json()` с `stream.HomeworkStream`: пиковую
+память сверх исходной, время до первой работы и время разбора целиком.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+from stream import STREAM_CHUNK_SIZE, HomeworkStream  # noqa: E402
+
+
+def body_chunks(count, comment_size, chunk_size=STREAM_CHUNK_SIZE):
+    """Тело ответа из `count` работ, фрагментами по `chunk_size` байт."""
+    buffer = bytearray(b'{"homeworks": [')
+    for number in range(count):
+        if number:
+            buffer += b', '
+        buffer += json.dumps({
+            'id': count - number,
+            'homework_name': f'user__project_{count - number}.zip',
+            'status': 'approved',
+            'reviewer_comment': 'x' * comment_size,
+            'date_updated': '2024-01-01T00:00:00Z',
+            'lesson_name': 'Итоговый проект',
+        }, ensure_ascii=False).encode('utf-8')
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    buffer += b'], "current_date": 1700000000}'
+    yield bytes(buffer)
+
+
+class ChunkedResponse:
+    """Ответ с телом из генератора фрагментов."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    @property
+    def content(self):
+        """Тело целиком, как `requests.Response.content`."""
+        return b''.join(self.chunks)
+
+    def json(self):
+        """Разбираем тело целиком."""
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=None):
+        """Отдаём тело по фрагментам."""
+        return self.chunks
+
+    def close(self):
+        """Соединения нет, закрывать нечего."""
+
+
+def loaded(response):
+    """Работы из ответа, загруженного целиком."""
+    return iter(homework.check_response(response.json()))
+
+
+def streamed(response):
+    """Работы из ответа, который читается потоком."""
+    return homework.check_response(HomeworkStream(response))
+
+
+def measure(strategy, count, comment_size):
+    """Пиковая память и время для одной стратегии разбора."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    homeworks = strategy(ChunkedResponse(body_chunks(count, comment_size)))
+    next(homeworks)
+    first = time.perf_counter() - started
+    total = 1 + sum(1 for _ in homeworks)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert total == count
+    return {
+        'first_homework_ms': round(first * 1000, 2),
+        'total_ms': round(elapsed * 1000, 2),
+        'peak_kib': round(peak / 1024),
+    }
+
+
+def main(argv=None):
+    """Сравниваем разбор целиком и потоком на ответах разного размера."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--homeworks', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--comment-size', type=int, default=200,
+                        help='длина комментария ревьюера, символов')
+    args = parser.parse_args(argv)
+    results = [{
+        'homeworks': count,
+        'json': measure(loaded, count, args.comment_size),
+        'stream': measure(streamed, count, args.comment_size),
+    } for count in args.homeworks]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
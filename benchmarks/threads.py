@@ -0,0 +1,130 @@
+"""Пул потоков против последовательного цикла опроса.
+
+Запуск:
+
+    python -m benchmarks.threads --tenants 200 --threads 4 16 64
+
+Заглушки API Практикума и Telegram работают в отдельном процессе. Один
+цикл опроса всех пользователей выполняется сначала последовательно, как
+в `homework.main()`: запрос, проверка ответа, отправка уведомления, затем
+в `threaded.ThreadedPoller` с разным числом потоков. В каждом цикле
+каждый пользователь получает одно уведомление.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+import homework  # noqa: E402
+from benchmarks.fake_servers import ServerConfig, serve_in_process  # noqa
+from http_pool import HttpPool  # noqa: E402
+from threaded import ThreadedPoller  # noqa: E402
+
+
+def make_tenants(count):
+    """Пользователи без сохранённого состояния."""
+    return [engine.Tenant(f'token{number}', number) for number in range(count)]
+
+
+def sequential_cycle(bot, tenants, session):
+    """Опрашиваем пользователей по одному, как основной цикл бота."""
+    for tenant in tenants:
+        response = homework.request_api(
+            tenant.headers, tenant.timestamp, session
+        )
+        for changed in tenant.index.changes(
+                homework.check_response(response)):
+            if homework.send_message_to_chat(
+                    bot, tenant.chat_id, homework.parse_status(changed)):
+                tenant.index.commit(changed)
+        tenant.timestamp = response['current_date']
+
+
+def threaded_cycle(bot, tenants, session, threads, senders):
+    """Опрашиваем пользователей в `ThreadedPoller`."""
+    poller = ThreadedPoller(
+        bot, tenants, threads, senders=senders, session=session,
+        rate=None, telegram_rate=None, stream=False
+    ).start()
+    try:
+        poller.run_cycle()
+    finally:
+        poller.stop()
+
+
+def measure(name, cycle, tenants, practicum_url, telegram_url, *args):
+    """Время одного цикла опроса `tenants` пользователей."""
+    homework.ENDPOINT = practicum_url
+    pool = HttpPool(per_host=max(args, default=1))
+    bot = pool.make_bot('123:benchmark', base_url=telegram_url)
+    users = make_tenants(tenants)
+    started = time.perf_counter()
+    try:
+        cycle(bot, users, pool, *args)
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'mode': name,
+        'seconds': round(elapsed, 3),
+        'polls_per_sec': round(tenants / elapsed, 1),
+        'notified': sum(bool(tenant.index.statuses) for tenant in users),
+    }
+
+
+def compare(tenants, threads, senders, practicum_url, telegram_url):
+    """Сравниваем последовательный цикл с пулом потоков."""
+    results = [measure(
+        'sequential', sequential_cycle, tenants, practicum_url, telegram_url
+    )]
+    for count in threads:
+        results.append(measure(
+            f'threads={count}', threaded_cycle, tenants, practicum_url,
+            telegram_url, count, senders
+        ))
+    for result in results:
+        result['speedup'] = round(results[0]['seconds'] / result['seconds'], 1)
+    return results
+
+
+def main(argv=None):
+    """Запускаем заглушки в дочернем процессе и сравнение в текущем."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=200)
+    parser.add_argument('--threads', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--senders', type=int, default=8,
+                        help='потоков отправки сообщений')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='задержка ответа API Практикума, с')
+    parser.add_argument('--telegram-latency', type=float, default=0.02)
+    args = parser.parse_args(argv)
+    config = ServerConfig(
+        latency=args.latency, telegram_latency=args.telegram_latency,
+        change_every=3600
+    )
+    urls = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    servers = multiprocessing.Process(
+        target=serve_in_process, args=(config, urls, stop), daemon=True
+    )
+    servers.start()
+    try:
+        practicum_url, telegram_url = urls.get(timeout=10)
+        results = compare(
+            args.tenants, args.threads, args.senders, practicum_url,
+            telegram_url
+        )
+    finally:
+        stop.set()
+        servers.join(timeout=5)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
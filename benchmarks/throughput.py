@@ -0,0 +1,183 @@
+"""Сквозной нагрузочный тест многопользовательского опроса.
+
+Запуск:
+
+    python -m benchmarks.throughput --tenants 1000 --duration 30
+
+Заглушки API Практикума и Telegram работают в отдельном процессе, бот
+опрашивает их через `engine.PollingEngine` так же, как настоящие сервисы.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+import homework  # noqa: E402
+from benchmarks.fake_servers import ServerConfig, serve_in_process  # noqa
+from cache import ResponseCache  # noqa: E402
+from hedging import HEDGE_WINS, HEDGED, Hedger  # noqa: E402
+from http_pool import HttpPool  # noqa: E402
+from scheduler import AdaptiveSchedule  # noqa: E402
+
+
+def current_rss():
+    """Текущий размер резидентной памяти процесса в байтах."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированной выборке."""
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def fetch_json(url):
+    """Получаем JSON со статистикой заглушки."""
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+async def run_for(polling, duration):
+    """Работаем `duration` секунд и останавливаем движок."""
+    try:
+        await asyncio.wait_for(polling.run(), timeout=duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await polling.outbox.stop()
+
+
+def run_benchmark(args, practicum_url, telegram_url):
+    """Запускаем движок против заглушек и собираем результаты."""
+    homework.ENDPOINT = practicum_url
+    rss_before = current_rss()
+    tenants = [
+        engine.Tenant(f'token{number}', number)
+        for number in range(args.tenants)
+    ]
+    pool = HttpPool(per_host=args.max_in_flight)
+    polling = engine.PollingEngine(
+        pool.make_bot('123:benchmark', base_url=telegram_url), tenants,
+        args.max_in_flight,
+        schedule=AdaptiveSchedule(
+            base=args.poll_period, reviewing=args.poll_period,
+            maximum=args.poll_period, jitter=0.1
+        ),
+        session=pool, cache=ResponseCache(),
+        outbox_options={
+            'global_rate': args.telegram_rate, 'chat_rate': args.chat_rate
+        },
+        report_period=args.duration * 2, rate=args.practicum_rate,
+        hedger=Hedger(budget=args.hedge_budget) if args.hedge else None
+    )
+    cpu_before = time.process_time()
+    started = time.monotonic()
+    asyncio.run(run_for(polling, args.duration))
+    elapsed = time.monotonic() - started
+    cpu = time.process_time() - cpu_before
+    rss = current_rss() - rss_before
+    polling.executor.shutdown(wait=True)
+    pool.close()
+
+    polls = fetch_json(practicum_url.split('/api/')[0] + '/stats')['requests']
+    telegram = fetch_json(telegram_url.rsplit('/bot', 1)[0] + '/stats')
+    latencies = telegram['latencies']
+    return {
+        'tenants': args.tenants,
+        'seconds': round(elapsed, 2),
+        'polls': polls,
+        'polls_per_sec': round(polls / elapsed, 1),
+        'cycles_per_sec': round(polls / elapsed / args.tenants, 3),
+        'messages': telegram['messages'],
+        'notifications': len(latencies),
+        'latency_p50': round(percentile(latencies, 0.5), 3),
+        'latency_p99': round(percentile(latencies, 0.99), 3),
+        'cpu_seconds': round(cpu, 2),
+        'cpu_ms_per_tenant': round(cpu * 1000 / args.tenants, 3),
+        'rss_bytes_per_tenant': round(rss / args.tenants),
+        'connections': pool.stats(),
+        'cache': polling.cache.stats(),
+        'hedged_requests': HEDGED.value(),
+        'hedge_wins': HEDGE_WINS.value(),
+    }
+
+
+def parse_args(argv=None):
+    """Разбираем параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--poll-period', type=float, default=5)
+    parser.add_argument('--change-every', type=float, default=10)
+    parser.add_argument('--max-in-flight', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='задержка ответа API Практикума, с')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов API Практикума с кодом 500')
+    parser.add_argument('--slow-rate', type=float, default=0.0,
+                        help='доля очень медленных ответов API')
+    parser.add_argument('--slow-latency', type=float, default=1.0,
+                        help='задержка медленного ответа API, с')
+    parser.add_argument('--hedge', action='store_true',
+                        help='дублировать медленные запросы к API')
+    parser.add_argument('--hedge-budget', type=float, default=0.05,
+                        help='доля дополнительных запросов на повторы')
+    parser.add_argument('--history', type=int, default=0,
+                        help='сколько старых работ отдавать при from_date=0')
+    parser.add_argument('--comment-size', type=int, default=0,
+                        help='длина комментария ревьюера, символов')
+    parser.add_argument('--practicum-rate', type=float, default=0,
+                        help='общий лимит запросов к API в секунду, '
+                             '0 - без ограничения')
+    parser.add_argument('--telegram-latency', type=float, default=0.02)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-rate', type=float, default=10000,
+                        help='общий лимит сообщений в секунду')
+    parser.add_argument('--chat-rate', type=float, default=100,
+                        help='лимит сообщений в секунду на чат')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Запускаем заглушки в дочернем процессе и бенчмарк в текущем."""
+    args = parse_args(argv)
+    config = ServerConfig(
+        latency=args.latency, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+        history=args.history, comment_size=args.comment_size,
+        change_every=args.change_every,
+        telegram_latency=args.telegram_latency,
+        telegram_error_rate=args.telegram_error_rate,
+    )
+    urls = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    servers = multiprocessing.Process(
+        target=serve_in_process, args=(config, urls, stop), daemon=True
+    )
+    servers.start()
+    try:
+        practicum_url, telegram_url = urls.get(timeout=10)
+        result = run_benchmark(args, practicum_url, telegram_url)
+    finally:
+        stop.set()
+        servers.join(timeout=5)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
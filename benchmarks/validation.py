@@ -0,0 +1,144 @@
+"""Микробенчмарк проверки ответа API и сборки сообщений о статусах.
+
+Запуск:
+
+    python -m benchmarks.validation --homeworks 100 10000 100000
+
+Сравниваем `homework.check_response` и сообщения из кэша
+`homework.render_verdict` с прежними версиями `check_response` и
+`parse_status`, которые проверяли ключи по одному и собирали новую
+строку для каждой работы.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+from exceptions import EmptyResponseFromAPIError  # noqa: E402
+from metrics import timed  # noqa: E402
+
+
+@timed('check_response')
+def legacy_check_response(response):
+    """Прежняя проверка ответа API."""
+    logging.debug(
+        'Проверяем ответ API на наличие ключа "homeworks".'
+    )
+    if not isinstance(response, dict):
+        raise TypeError('Ответ API ожидается в формате словаря.')
+    if 'homeworks' not in response:
+        raise EmptyResponseFromAPIError(
+            'Отсутствует ожидаемый ключ "homeworks" в ответе API.'
+        )
+    homeworks = response.get('homeworks')
+    if not isinstance(homeworks, list):
+        raise TypeError(
+            'Под ключом "homeworks" ожидается список.'
+        )
+    return homeworks
+
+
+@timed('parse_status')
+def legacy_parse_status(homework_data):
+    """Прежняя сборка сообщения о статусе."""
+    logging.debug(
+        'Получаем статус домашней работы.'
+    )
+    if 'homework_name' not in homework_data:
+        raise KeyError(
+            'Отсутствует ожидаемый ключ "homework_name" в ответе API.'
+        )
+    homework_name = homework_data.get('homework_name')
+    if 'status' not in homework_data:
+        raise KeyError(
+            'Отсутствует ожидаемый ключ "status" в ответе API.'
+        )
+    status = homework_data.get('status')
+    if status not in homework.HOMEWORK_VERDICTS:
+        raise ValueError(f'Неопознанный статус - {status}')
+    verdict = homework.HOMEWORK_VERDICTS.get(status)
+    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+
+
+def make_response(count, seed=0):
+    """Большой ответ API, как он приходит после `json.loads`."""
+    rng = random.Random(seed)
+    return json.loads(json.dumps({
+        'homeworks': [{
+            'id': number,
+            'homework_name': f'user__project_{number}.zip',
+            'status': rng.choice(list(homework.HOMEWORK_VERDICTS)),
+            'reviewer_comment': 'Принято!',
+            'date_updated': '2024-01-01T00:00:00Z',
+            'lesson_name': 'Итоговый проект',
+        } for number in range(count)],
+        'current_date': 1700000000,
+    }))
+
+
+def legacy_cycle(response):
+    """Проверка ответа и сообщения обо всех работах прежним способом."""
+    return [
+        legacy_parse_status(item)
+        for item in legacy_check_response(response)
+    ]
+
+
+def compiled_cycle(response):
+    """То же самое через скомпилированную проверку и кэш сообщений."""
+    return [
+        homework.render_verdict(item['homework_name'], item['status'])
+        for item in homework.check_response(response)
+    ]
+
+
+def best_of(func, argument, repeat):
+    """Лучшее время одного вызова в микросекундах."""
+    number = max(1, 100000 // max(1, len(argument['homeworks'])))
+    return min(timeit.repeat(
+        lambda: func(argument), number=number, repeat=repeat
+    )) / number * 10 ** 6
+
+
+def measure(count, repeat=5):
+    """Время проверки и сборки сообщений для ответа из `count` работ."""
+    response = make_response(count)
+    assert legacy_cycle(response) == compiled_cycle(response)
+    homework.render_verdict.cache_clear()
+    cold = best_of(compiled_cycle, response, 1)
+    results = {
+        'homeworks': count,
+        'legacy_check_us': best_of(legacy_check_response, response, repeat),
+        'compiled_check_us': best_of(
+            homework.check_response, response, repeat
+        ),
+        'legacy_cycle_us': best_of(legacy_cycle, response, repeat),
+        'compiled_cycle_cold_us': cold,
+        'compiled_cycle_us': best_of(compiled_cycle, response, repeat),
+    }
+    results['cycle_speedup'] = (
+        results['legacy_cycle_us'] / results['compiled_cycle_us']
+    )
+    return {key: round(value, 2) for key, value in results.items()}
+
+
+def main(argv=None):
+    """Печатаем время для ответов разного размера."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--homeworks', type=int, nargs='+',
+                        default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    results = [measure(count, args.repeat) for count in args.homeworks]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
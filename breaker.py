@@ -0,0 +1,117 @@
+import logging
+import os
+import random
+import threading
+import time
+from http import HTTPStatus
+
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', 30))
+BREAKER_MAX_RESET = float(os.getenv('BREAKER_MAX_RESET', 600))
+BREAKER_STAGGER = float(os.getenv('BREAKER_STAGGER', 60))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_CODES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+def is_outage(status_code):
+    """Проверяем, говорит ли ответ о недоступности сервиса.
+
+    `None` означает, что ответа не было совсем: ошибка соединения.
+    Остальные коды, например 401 при неверном токене, касаются одного
+    пользователя и предохранитель не размыкают.
+    """
+    return (
+        status_code is None
+        or status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+        or status_code == HTTPStatus.TOO_MANY_REQUESTS
+    )
+
+
+class CircuitBreaker:
+    """Общий предохранитель для запросов к API Практикума.
+
+    После `failures` сбоев подряд предохранитель размыкается, и запросы не
+    отправляются `reset` секунд. Затем он становится полуоткрытым и
+    пропускает `probes` пробных запросов: успех замыкает его, сбой снова
+    размыкает с вдвое большей паузой, но не дольше `max_reset`. Отложенные
+    опросы возвращаются по `retry_delay()` со случайным разбросом до
+    `stagger` секунд, чтобы после восстановления сервиса пользователи не
+    пришли к нему все одновременно.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset=BREAKER_RESET,
+                 max_reset=BREAKER_MAX_RESET, stagger=BREAKER_STAGGER,
+                 probes=1, clock=time.monotonic, rng=random.random):
+        self.failures = failures
+        self.reset = reset
+        self.max_reset = max_reset
+        self.stagger = stagger
+        self.probes = probes
+        self.clock = clock
+        self.rng = rng
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failed = 0
+        self._pause = reset
+        self._opened_until = 0.0
+        self._probing = 0
+
+    @property
+    def state(self):
+        """Текущее состояние предохранителя."""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and self.clock() >= self._opened_until:
+            self._state = HALF_OPEN
+            self._probing = 0
+            logging.info('Предохранитель API полуоткрыт, пробуем запрос.')
+        return self._state
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_until = self.clock() + self._pause
+        logging.warning(
+            'API недоступен, запросы приостановлены на %.0f с.', self._pause
+        )
+
+    def allow(self):
+        """Решаем, можно ли сейчас отправить запрос."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probing < self.probes:
+                self._probing += 1
+                return True
+            return False
+
+    def record(self, status_code):
+        """Учитываем результат запроса: код ответа или `None` при сбое."""
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+            if is_outage(status_code):
+                self._failed += 1
+                if state == HALF_OPEN:
+                    self._pause = min(self.max_reset, self._pause * 2)
+                    self._open()
+                elif state == CLOSED and self._failed >= self.failures:
+                    self._open()
+                return
+            if state != CLOSED:
+                logging.info('API снова доступен, запросы возобновлены.')
+            self._state = CLOSED
+            self._failed = 0
+            self._pause = self.reset
+
+    def retry_delay(self):
+        """Через сколько секунд повторить отложенный опрос."""
+        with self._lock:
+            remaining = max(0.0, self._opened_until - self.clock())
+        return remaining + self.rng() * self.stagger
@@ -0,0 +1,118 @@
+import hashlib
+import re
+import threading
+from http import HTTPStatus
+
+from exceptions import CacheEntryMissingError
+
+NOT_MODIFIED = object()
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*\d+')
+
+
+def body_digest(content):
+    """Хеш тела ответа без поля `current_date`.
+
+    API возвращает текущее время сервера в каждом ответе, поэтому без
+    маскировки этого поля одинаковые ответы различались бы всегда.
+    """
+    return hashlib.blake2b(
+        CURRENT_DATE.sub(b'', content), digest_size=16
+    ).digest()
+
+
+class CacheEntry:
+    """Что известно о последнем ответе API для одного токена."""
+
+    __slots__ = ('from_date', 'etag', 'last_modified', 'digest')
+
+    def __init__(self, from_date, etag, last_modified, digest):
+        self.from_date = from_date
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+
+
+class ResponseCache:
+    """Кеш ответов API по паре токен + `from_date`.
+
+    Если сервер отдаёт `ETag` или `Last-Modified`, следующий запрос
+    отправляется условным и ответ 304 считается попаданием. Иначе
+    сравниваем хеш тела с предыдущим ответом и не декодируем JSON, если
+    он не изменился. Для каждого токена хранится одна запись.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, headers, from_date):
+        entry = self._entries.get(headers['Authorization'])
+        if entry is not None and entry.from_date == from_date:
+            return entry
+        return None
+
+    def prepare(self, headers, from_date):
+        """Добавляем к заголовкам условия запроса, если они известны."""
+        entry = self._entry(headers, from_date)
+        if entry is None:
+            return headers
+        conditional = dict(headers)
+        if entry.etag:
+            conditional['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            conditional['If-Modified-Since'] = entry.last_modified
+        return conditional
+
+    def unchanged(self, headers, from_date, response, streamed=False):
+        """Проверяем, совпадает ли ответ с предыдущим, и запоминаем его.
+
+        Тело потокового ответа (`streamed`) не читается заранее, поэтому
+        для него работают только условные запросы и ответ 304. Если запись
+        сбросили, пока шёл условный запрос, ответ 304 не с чем сравнить:
+        выбрасываем `CacheEntryMissingError`, и запрос нужно повторить без
+        условий.
+        """
+        entry = self._entry(headers, from_date)
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            if entry is None:
+                raise CacheEntryMissingError(
+                    'Ответ 304 пришёл, когда записи кеша уже нет.'
+                )
+            hit = True
+        elif response.status_code != HTTPStatus.OK:
+            return False
+        else:
+            digest = None if streamed else body_digest(response.content)
+            hit = (
+                entry is not None and digest is not None
+                and entry.digest == digest
+            )
+            self._entries[headers['Authorization']] = CacheEntry(
+                from_date, response.headers.get('ETag'),
+                response.headers.get('Last-Modified'), digest
+            )
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def invalidate(self, headers):
+        """Забываем ответ для токена, чтобы следующий разобрать заново.
+
+        Нужно, если уведомления по ответу не доставлены: иначе такой же
+        ответ при следующем опросе считался бы попаданием и пропускался.
+        """
+        self._entries.pop(headers['Authorization'], None)
+
+    def stats(self):
+        """Доля запросов, на которые ответ не изменился."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+from collections import deque
+
+HISTORY_SIZE = int(os.getenv('HISTORY_SIZE', 10))
+COMMAND_POLL_TIMEOUT = int(os.getenv('COMMAND_POLL_TIMEOUT', 30))
+COMMAND_RETRY_DELAY = 5
+COMMANDS = ('/status', '/history')
+NO_STATUSES = 'Бот ещё не видел ни одной вашей работы.'
+
+
+class StatusCache:
+    """Последние статусы работ по чатам для команд /status и /history.
+
+    Поллер вызывает `record()` для каждого нового статуса, который видит
+    в ответе API, а при запуске статусы восстанавливает `restore()`.
+    Ответ на команду собирается при первом запросе и хранится, пока в
+    чате не появится новый статус, поэтому повторные команды стоят один
+    поиск в словаре и не обращаются к API. В истории чата хранятся
+    последние `history_size` изменений.
+    """
+
+    def __init__(self, verdicts, history_size=HISTORY_SIZE):
+        self.verdicts = verdicts
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._statuses = {}
+        self._history = {}
+        self._replies = {}
+
+    def record(self, chat_id, homework):
+        """Запоминаем новый статус работы и сбрасываем ответы чата.
+
+        Тот же статус повторно не записывается: поллер видит его снова,
+        если уведомление не удалось доставить.
+        """
+        chat_id = str(chat_id)
+        name, status = homework['homework_name'], homework['status']
+        with self._lock:
+            statuses = self._statuses.setdefault(chat_id, {})
+            if statuses.get(name) == status:
+                return
+            statuses[name] = status
+            history = self._history.get(chat_id)
+            if history is None:
+                history = self._history[chat_id] = deque(
+                    maxlen=self.history_size
+                )
+            history.append((homework.get('date_updated', ''), name, status))
+            for command in COMMANDS:
+                self._replies.pop((chat_id, command), None)
+
+    def restore(self, rows):
+        """Заполняем статусы `(чат, название работы, статус)` из хранилища.
+
+        Так /status отвечает и после перезапуска, не дожидаясь новых
+        статусов. Статусы, которые поллер уже записал, не заменяются, а
+        история изменений начинается с запуска.
+        """
+        with self._lock:
+            for chat_id, name, status in rows:
+                chat_id = str(chat_id)
+                self._statuses.setdefault(chat_id, {}).setdefault(
+                    name, status
+                )
+                self._replies.pop((chat_id, '/status'), None)
+
+    def _verdict(self, status):
+        return self.verdicts.get(status, status)
+
+    def _render(self, chat_id, command):
+        if command == '/status':
+            statuses = self._statuses.get(chat_id)
+            if not statuses:
+                return NO_STATUSES
+            return 'Статусы работ:\n' + '\n'.join(
+                f'{name}: {self._verdict(status)}'
+                for name, status in statuses.items()
+            )
+        history = self._history.get(chat_id)
+        if not history:
+            return NO_STATUSES
+        return 'Последние изменения статусов:\n' + '\n'.join(
+            f'{updated} {name}: {self._verdict(status)}'.lstrip()
+            for updated, name, status in reversed(history)
+        )
+
+    def reply(self, chat_id, command):
+        """Ответ на команду; `None`, если команда неизвестна."""
+        if command not in COMMANDS:
+            return None
+        key = (str(chat_id), command)
+        with self._lock:
+            text = self._replies.get(key)
+            if text is None:
+                text = self._replies[key] = self._render(*key)
+        return text
+
+
+class CommandReceiver:
+    """Принимаем команды боту long polling-ом `getUpdates` в фоне.
+
+    Отвечаем только на /status и /history из чатов `chats` и только из
+    `statuses`: запросов к API Практикума команды не вызывают. Ответ
+    отправляет `send(chat_id, text)`.
+    """
+
+    def __init__(self, bot, statuses, chats, send,
+                 timeout=COMMAND_POLL_TIMEOUT,
+                 retry_delay=COMMAND_RETRY_DELAY):
+        self.bot = bot
+        self.statuses = statuses
+        self.chats = {str(chat_id) for chat_id in chats}
+        self.send = send
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.offset = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def handle(self, update):
+        """Отвечаем на команду из обновления, если она нам адресована."""
+        message = update.message
+        if message is None or not (message.text or '').strip():
+            return False
+        chat_id = message.chat_id
+        if str(chat_id) not in self.chats:
+            return False
+        command = message.text.split()[0].split('@')[0].lower()
+        text = self.statuses.reply(chat_id, command)
+        if text is None:
+            return False
+        self.send(chat_id, text)
+        return True
+
+    def poll(self):
+        """Получаем и обрабатываем одну пачку обновлений."""
+        updates = self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout,
+            allowed_updates=['message']
+        )
+        for update in updates:
+            self.offset = update.update_id + 1
+            self.handle(update)
+        return len(updates)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as error:
+                logging.error('Не удалось получить команды боту: %s', error)
+                self._stop.wait(self.retry_delay)
+
+    def start(self):
+        """Запускаем приём команд в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self._run, name='commands', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливаем приём команд после текущего запроса."""
+        self._stop.set()
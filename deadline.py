@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+
+from exceptions import DeadlineExceededError
+from metrics import REGISTRY, Counter
+
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', 60))
+WATCHDOG_INTERVAL = float(os.getenv('WATCHDOG_INTERVAL', 10))
+STAGE_SHARES = {'fetch': 0.6, 'validate': 0.1, 'send': 0.3}
+
+STUCK_CYCLES = REGISTRY.register(Counter(
+    'homework_bot_stuck_cycles_total',
+    'Циклы опроса, не уложившиеся в срок.'
+))
+
+
+class Deadline:
+    """Срок выполнения одного цикла опроса.
+
+    Срок делится между этапами по `STAGE_SHARES`: этап получает свою долю
+    от `seconds`, но не больше, чем осталось до конца цикла. Если время
+    вышло, `check()` и `timeout()` выбрасывают `DeadlineExceededError`.
+    """
+
+    def __init__(self, seconds=POLL_DEADLINE, clock=time.monotonic):
+        self.seconds = seconds
+        self.clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self):
+        """Сколько секунд осталось до конца цикла."""
+        return max(0.0, self.expires - self.clock())
+
+    def check(self, stage):
+        """Проверяем, что перед этапом `stage` время ещё осталось."""
+        remaining = self.remaining()
+        if not remaining:
+            raise DeadlineExceededError(
+                f'Цикл опроса не уложился в {self.seconds:.0f} с,'
+                f' этап "{stage}" пропущен.'
+            )
+        return remaining
+
+    def timeout(self, stage):
+        """Сколько времени можно потратить на этап `stage`."""
+        return min(self.check(stage), self.seconds * STAGE_SHARES[stage])
+
+
+class Watchdog:
+    """Фоновый поток, который сообщает о зависших циклах опроса.
+
+    Цикл регистрируется через `begin()` и снимается через `end()`. Если
+    цикл не закончился к своему сроку, watchdog пишет предупреждение в лог
+    и увеличивает `homework_bot_stuck_cycles_total` - один раз на цикл.
+    Это замечает и заблокированный цикл событий, который сам о себе
+    сообщить не может.
+    """
+
+    def __init__(self, interval=WATCHDOG_INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._cycles = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def begin(self, name, deadline):
+        """Начинаем следить за циклом `name`."""
+        with self._lock:
+            self._cycles[name] = [deadline, False]
+
+    def end(self, name):
+        """Цикл `name` закончился."""
+        with self._lock:
+            self._cycles.pop(name, None)
+
+    def check(self):
+        """Находим циклы, просрочившие срок, и сообщаем о них."""
+        now = self.clock()
+        stuck = []
+        with self._lock:
+            for name, entry in self._cycles.items():
+                deadline, reported = entry
+                if not reported and now >= deadline.expires:
+                    entry[1] = True
+                    stuck.append((name, now - deadline.expires))
+        for name, overdue in stuck:
+            STUCK_CYCLES.inc()
+            logging.warning(
+                'Цикл опроса %s завис: срок истёк %.1f с назад.', name, overdue
+            )
+        return [name for name, _ in stuck]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        """Запускаем фоновый поток."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='watchdog', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливаем фоновый поток."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
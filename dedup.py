@@ -0,0 +1,55 @@
+import os
+import re
+from collections import OrderedDict
+
+ERROR_DEDUP_WINDOW = int(os.getenv('ERROR_DEDUP_WINDOW', 60 * 60))
+ERROR_DEDUP_SIZE = int(os.getenv('ERROR_DEDUP_SIZE', 16))
+URL = re.compile(r'https?://[^\s"\'?,]+')
+
+
+def error_key(error):
+    """Ключ ошибки: класс исключения и адрес, к которому был запрос.
+
+    Текст ошибки содержит параметры запроса и время, поэтому сравнивать
+    сообщения целиком нельзя: одна и та же ошибка выглядела бы каждый раз
+    по-новому.
+    """
+    endpoint = URL.search(str(error))
+    return '{}:{}'.format(
+        type(error).__name__, endpoint.group() if endpoint else ''
+    )
+
+
+class ErrorDigest:
+    """Ограничиваем повторные сообщения об одинаковых ошибках.
+
+    О каждой ошибке сообщаем не чаще раза в `window` секунд. Повторы внутри
+    окна только подсчитываются, а их число добавляется к следующему
+    сообщению. Хранится не больше `size` последних ключей ошибок, поэтому
+    память на пользователя ограничена при любом их разнообразии.
+    """
+
+    def __init__(self, window=ERROR_DEDUP_WINDOW, size=ERROR_DEDUP_SIZE):
+        self.window = window
+        self.size = size
+        self._entries = OrderedDict()
+
+    def message(self, error, now):
+        """Текст сообщения об ошибке или `None`, если сообщать рано."""
+        key = error_key(error)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if now - entry[0] < self.window:
+                entry[1] += 1
+                return None
+        text = f'Сбой в работе программы: {error}'
+        if entry is not None and entry[1]:
+            text += (
+                f'\nС прошлого сообщения ошибка повторилась {entry[1]} раз '
+                f'за {round((now - entry[0]) / 60)} мин.'
+            )
+        self._entries[key] = [now, 0]
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return text
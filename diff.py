@@ -0,0 +1,144 @@
+_MISSING = object()
+STATUSES = ('reviewing', 'approved', 'rejected')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+def encode_status(status):
+    """Код статуса: небольшое число вместо строки из ответа API.
+
+    Неизвестный статус хранится как есть, чтобы его не потерять.
+    """
+    return STATUS_CODES.get(status, status)
+
+
+def decode_status(code):
+    """Строка статуса по его коду."""
+    return STATUSES[code] if isinstance(code, int) else code
+
+
+def compact_key(key):
+    """Ключ работы в индексе: число, если `id` числовой."""
+    if isinstance(key, int):
+        return key
+    return int(key) if key.isdigit() else key
+
+
+def homework_key(homework):
+    """Ключ домашней работы: `id`, а если его нет - название."""
+    key = homework.get('id')
+    if key is None:
+        key = homework.get('homework_name')
+    return str(key)
+
+
+def notification_key(chat_id, homework):
+    """Ключ идемпотентности уведомления о статусе работы."""
+    return '{}:{}:{}:{}'.format(
+        chat_id, homework_key(homework), homework.get('status'),
+        homework.get('date_updated', '')
+    )
+
+
+class StatusIndex:
+    """Последние известные статусы домашних работ пользователя.
+
+    API с параметром `from_date` возвращает только обновлённые работы,
+    поэтому сравнение ответа с индексом - это один поиск в словаре на
+    работу. Работы с прежним статусом не разбираются и не превращаются
+    в сообщения. Статус, уведомление о котором ещё доставляется, хранится
+    в `pending` и тоже не считается изменением. `on_commit` вызывается с
+    ключом, статусом и названием каждой подтверждённой работы, например
+    чтобы сохранить их в хранилище.
+
+    Индекс хранится компактно: числовые `id` работ - числами, статусы -
+    кодами из `STATUSES`, а словарь `pending` создаётся только на время
+    доставки. Тексты сообщений в индексе не хранятся.
+    """
+
+    __slots__ = ('_codes', '_pending', 'on_commit')
+
+    def __init__(self, statuses=None, on_commit=None):
+        self._codes = {
+            compact_key(key): encode_status(status)
+            for key, status in (statuses or {}).items()
+        }
+        self._pending = None
+        self.on_commit = on_commit
+
+    @property
+    def statuses(self):
+        """Подтверждённые статусы в виде `{ключ работы: статус}`."""
+        return {
+            str(key): decode_status(code)
+            for key, code in self._codes.items()
+        }
+
+    @property
+    def pending(self):
+        """Статусы, уведомления о которых ещё доставляются."""
+        return {
+            str(key): decode_status(code)
+            for key, code in (self._pending or {}).items()
+        }
+
+    def has_status(self, status):
+        """Есть ли работа с подтверждённым статусом `status`."""
+        return encode_status(status) in self._codes.values()
+
+    def _known(self, key):
+        if self._pending and key in self._pending:
+            return self._pending[key]
+        return self._codes.get(key, _MISSING)
+
+    def known_status(self, key):
+        """Последний известный статус работы с учётом недоставленных."""
+        code = self._known(compact_key(key))
+        return code if code is _MISSING else decode_status(code)
+
+    def changed(self, homework):
+        """Изменился ли статус работы."""
+        return self._known(_index_key(homework)) != encode_status(
+            homework.get('status')
+        )
+
+    def changes(self, homeworks):
+        """Выбираем работы, статус которых изменился, от старых к новым."""
+        return [
+            homework for homework in reversed(homeworks)
+            if self.changed(homework)
+        ]
+
+    def mark_pending(self, homework):
+        """Помечаем статус как отправляемый, но ещё не доставленный."""
+        if self._pending is None:
+            self._pending = {}
+        self._pending[_index_key(homework)] = encode_status(
+            homework.get('status')
+        )
+
+    def _unmark(self, key, code):
+        if self._pending and self._pending.get(key, _MISSING) == code:
+            del self._pending[key]
+            if not self._pending:
+                self._pending = None
+
+    def discard(self, homework):
+        """Снимаем пометку, если уведомление доставить не удалось."""
+        self._unmark(
+            _index_key(homework), encode_status(homework.get('status'))
+        )
+
+    def commit(self, homework):
+        """Запоминаем статус работы после отправки уведомления."""
+        key = _index_key(homework)
+        status = homework.get('status')
+        code = encode_status(status)
+        self._unmark(key, code)
+        self._codes[key] = code
+        if self.on_commit is not None:
+            self.on_commit(str(key), status, homework.get('homework_name'))
+
+
+def _index_key(homework):
+    key = homework.get('id')
+    return key if isinstance(key, int) else compact_key(homework_key(homework))
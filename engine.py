@@ -0,0 +1,612 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from telegram.error import RetryAfter, TelegramError
+
+import homework
+from breaker import STATE_CODES, CircuitBreaker
+from cache import NOT_MODIFIED, ResponseCache
+from commands import StatusCache
+from deadline import POLL_DEADLINE, Deadline, Watchdog
+from dedup import ErrorDigest
+from diff import StatusIndex, notification_key
+from exceptions import (CircuitOpenError, DeadlineExceededError,
+                        EmptyResponseFromAPIError, RateLimitedError)
+from hedging import HEDGE_REQUESTS, Hedger
+from http_pool import HttpPool
+from lease import LeaseKeeper
+from metrics import IN_FLIGHT, POLL_LAG_SECONDS, REGISTRY, Gauge, timed
+from outbox import TELEGRAM_GLOBAL_RATE, Outbox, TokenBucket
+from scheduler import CHANGED, DEFERRED, ERROR, IDLE, AdaptiveSchedule
+from stream import HomeworkStream, close_stream
+
+NO_NEW_STATUSES = 'Нет новых статусов.'
+OUTBOX_RETENTION = 7 * 24 * 60 * 60
+REPLY_WORKERS = 4
+
+
+def close_abandoned(future):
+    """Закрываем потоковый ответ запроса, результат которого не нужен."""
+    if not future.cancelled() and future.exception() is None:
+        close_stream(future.result())
+
+
+def log_store_error(future):
+    """Пишем в лог ошибку фоновой записи в хранилище."""
+    error = future.exception()
+    if error is not None:
+        logging.error('Не удалось сохранить состояние: %s', error)
+
+
+class Tenant:
+    """Пользователь бота: токен Практикума, чат и состояние опроса.
+
+    Пользователей могут быть сотни тысяч, поэтому у объекта нет `__dict__`,
+    а заголовки запроса собираются из токена только при опросе.
+    """
+
+    __slots__ = (
+        'practicum_token', 'chat_id', 'timestamp', 'prev_report', 'index',
+        'interval', 'due', 'loaded', 'errors', 'retry_after',
+    )
+
+    def __init__(self, practicum_token, chat_id, timestamp=0):
+        self.practicum_token = practicum_token
+        self.chat_id = chat_id
+        self.timestamp = timestamp
+        self.prev_report = ''
+        self.index = StatusIndex()
+        self.interval = 0
+        self.due = None
+        self.loaded = False
+        self.errors = None
+        self.retry_after = None
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API Практикума."""
+        return homework.make_headers(self.practicum_token)
+
+    def __repr__(self):
+        return f'Tenant(chat_id={self.chat_id!r})'
+
+
+def load_tenants(path):
+    """Читаем список пользователей из JSON-файла."""
+    with open(path, encoding='utf-8') as file:
+        records = json.load(file)
+    return [
+        Tenant(record['practicum_token'], record['chat_id'])
+        for record in records
+    ]
+
+
+class TenantPoller:
+    """Общая часть движков опроса: состояние пользователей и ошибки.
+
+    Подкласс задаёт `store` и `clock`, а также два способа доставки:
+    `_store_submit(func, *args)` выполняет запись в хранилище, а
+    `_notify(chat_id, text)` ставит сообщение в очередь отправки.
+    """
+
+    def restore_state(self, tenant):
+        """Читаем сохранённое состояние пользователя при первом опросе.
+
+        Подтверждённые статусы индекс сохраняет через `_store_submit`.
+        """
+        if self.store is not None and not tenant.loaded:
+            tenant.timestamp, tenant.prev_report = self.store.load(
+                tenant.chat_id
+            )
+            tenant.index = self.store.load_index(tenant.chat_id)
+            tenant.index.on_commit = partial(
+                self._store_submit, self.store.save_status, tenant.chat_id
+            )
+        tenant.loaded = True
+
+    def save_state(self, tenant):
+        """Сохраняем курсор и последний отправленный статус."""
+        if self.store is not None:
+            self._store_submit(
+                self.store.save, tenant.chat_id, tenant.timestamp,
+                tenant.prev_report
+            )
+
+    def report_error(self, tenant, error):
+        """Сообщаем пользователю об ошибке, если не сообщали недавно."""
+        logging.error('Сбой в работе программы: %s', error)
+        if tenant.errors is None:
+            tenant.errors = ErrorDigest()
+        message = tenant.errors.message(error, self.clock())
+        if message is not None:
+            self._notify(tenant.chat_id, message)
+            tenant.prev_report = message
+            self.save_state(tenant)
+
+
+class PollingEngine(TenantPoller):
+    """Опрашиваем API сразу для многих пользователей.
+
+    Количество одновременных запросов ограничено `max_in_flight`:
+    блокирующие вызовы `requests` и `telegram` выполняются в пуле потоков
+    того же размера, поэтому цикл событий никогда не ждёт сеть. Каждый
+    пользователь опрашивается со своим интервалом из `schedule`, а
+    уведомления уходят через `outbox` в фоне. Пока `breaker` разомкнут,
+    опросы откладываются без запросов к API. Все запросы к API проходят
+    через общий ограничитель `rate` запросов в секунду, а ответ 429 или
+    503 с `Retry-After` откладывает только опрос этого пользователя.
+    Опрос одного пользователя ограничен сроком `deadline` секунд, а
+    `watchdog` сообщает об опросах, которые его превысили. С `hedger`
+    медленный запрос к API дублируется, если позволяют лимиты. Со
+    `stream` ответы API читаются потоком, и уведомления ставятся в
+    очередь до того, как прочитан весь ответ. Новые статусы записываются
+    в `statuses`, из которого бот отвечает на команды.
+
+    `clock` и `executor` можно подменить, чтобы запускать движок в
+    виртуальном времени (см. `benchmarks/simulation.py`).
+    """
+
+    def __init__(self, bot, tenants, max_in_flight=homework.MAX_IN_FLIGHT,
+                 schedule=None, session=None, store=None, cache=None,
+                 outbox_options=None, report_period=homework.RETRY_PERIOD,
+                 clock=time.monotonic, executor=None, breaker=None,
+                 rate=homework.PRACTICUM_RATE, burst=homework.PRACTICUM_BURST,
+                 deadline=POLL_DEADLINE, watchdog=None, hedger=None,
+                 stream=homework.STREAM_RESPONSES, leases=None,
+                 statuses=None):
+        self.bot = bot
+        self.leases = leases
+        self.statuses = statuses
+        self.stream = stream
+        self.hedger = hedger
+        self.deadline = deadline
+        self.watchdog = watchdog
+        self.breaker = breaker
+        self.budget = TokenBucket(rate, burst, clock) if rate else None
+        self.clock = clock
+        self.session = session
+        self.cache = cache
+        self.store = store
+        self.tenants = list(tenants)
+        self.max_in_flight = max_in_flight
+        self.schedule = schedule or AdaptiveSchedule()
+        self.report_period = report_period
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_in_flight + (
+                0 if hedger is None
+                else max(1, math.ceil(max_in_flight * hedger.budget))
+            ),
+            thread_name_prefix='poller'
+        )
+        self.writer = None
+        if store is not None:
+            self.writer = executor or ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='store'
+            )
+        self.outbox = Outbox(
+            self.deliver, journal=store, call=self._store_call,
+            **(outbox_options or {})
+        )
+        # Ответы на команды идут отдельной очередью без аренды и журнала,
+        # но в общем лимите сообщений в Telegram.
+        self.replies = Outbox(
+            self.deliver_reply, workers=REPLY_WORKERS, clock=clock
+        )
+        self.replies.global_bucket = self.outbox.global_bucket
+        self._loop = None
+        REGISTRY.register(Gauge(
+            'homework_bot_outbox_depth',
+            'Сообщения, ожидающие отправки в Telegram.',
+            function=self.outbox.depth
+        ))
+        if breaker is not None:
+            REGISTRY.register(Gauge(
+                'homework_bot_circuit_state',
+                'Предохранитель API: 0 - замкнут, 1 - разомкнут, '
+                '2 - полуоткрыт.',
+                function=lambda: STATE_CODES[breaker.state]
+            ))
+        self._semaphore = None
+        self._confirmations = set()
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _store_call(self, func, *args):
+        """Обращаемся к хранилищу в потоке записи, не блокируя цикл."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.writer, func, *args)
+
+    def _store_submit(self, func, *args):
+        """Ставим запись в хранилище в очередь потока записи."""
+        self.writer.submit(func, *args).add_done_callback(log_store_error)
+
+    def _notify(self, chat_id, text):
+        self.outbox.put(chat_id, text)
+
+    async def flush(self):
+        """Ждём, пока поток записи сохранит всё, что ему передали."""
+        if self.writer is not None:
+            await self._store_call(lambda: None)
+
+    @timed('send_message')
+    def _send_message(self, chat_id, text, fenced=True):
+        """Отправляем сообщение, пробрасывая `RetryAfter` в очередь.
+
+        С `fenced` сообщение уходит, только пока чат за этим экземпляром.
+        """
+        if (fenced and self.leases is not None
+                and not self.leases.holds(chat_id)):
+            logging.warning(
+                'Аренда чата %s потеряна, сообщение не отправлено.', chat_id
+            )
+            return False
+        try:
+            self.bot.send_message(
+                chat_id, text, timeout=homework.SEND_TIMEOUT
+            )
+        except RetryAfter:
+            raise
+        except TelegramError as error:
+            logging.error('Cбой при отправке сообщения "%s" - %s', text, error)
+            return False
+        logging.debug('Бот отправил сообщение "%s"', text)
+        return True
+
+    async def deliver(self, chat_id, text):
+        """Отправляем сообщение в пуле потоков, не блокируя цикл событий."""
+        return await self._call(self._send_message, chat_id, text)
+
+    async def deliver_reply(self, chat_id, text):
+        """Отправляем ответ на команду: он не зависит от аренды чата."""
+        return await self._call(self._send_message, chat_id, text, False)
+
+    def post(self, chat_id, text):
+        """Ставим ответ на команду в очередь из другого потока.
+
+        Так ответы проходят те же ограничители частоты и `RetryAfter`,
+        что и уведомления. Пока движок не запущен, ответ не отправляется.
+        """
+        if self._loop is None:
+            logging.warning(
+                'Опрос ещё не запущен, ответ в чат %s не отправлен.', chat_id
+            )
+            return False
+        self._loop.call_soon_threadsafe(self.replies.put, chat_id, text)
+        return True
+
+    async def load_state(self, tenant):
+        """Читаем сохранённое состояние пользователя при первом опросе.
+
+        SQLite читается и пишется в отдельном потоке записи: ожидание
+        блокировки базы, которую держит продление аренд, не должно
+        останавливать цикл событий. Подтверждённые статусы индекс
+        сохраняет через тот же поток, не дожидаясь записи.
+        """
+        if self.store is not None and not tenant.loaded:
+            await self._store_call(self.restore_state, tenant)
+        tenant.loaded = True
+
+    def enqueue(self, tenant, changed):
+        """Ставим в очередь уведомление о новом статусе работы."""
+        tenant.index.mark_pending(changed)
+        if self.statuses is not None:
+            self.statuses.record(tenant.chat_id, changed)
+        return self.outbox.put(
+            tenant.chat_id, homework.parse_status(changed),
+            notification_key(tenant.chat_id, changed)
+        )
+
+    async def stream_changes(self, tenant, homeworks):
+        """Читаем потоковый ответ в пуле потоков.
+
+        Поток только читает и проверяет работы, а сравнивает их с индексом
+        цикл событий: индекс меняется только в нём, и работа, которая
+        встретилась в ответе дважды, уже помечена отправляемой. Уведомление
+        о каждой изменившейся работе ставится в очередь сразу, как только
+        работа прочитана. Если чтение прервалось, уже поставленные
+        уведомления всё равно подтверждаются, но курсор опроса не
+        сдвигается.
+        """
+        loop = asyncio.get_running_loop()
+        changes, deliveries = [], []
+
+        def enqueue(item):
+            if tenant.index.changed(item):
+                changes.append(item)
+                deliveries.append(self.enqueue(tenant, item))
+
+        def consume():
+            for item in homeworks:
+                loop.call_soon_threadsafe(enqueue, item)
+
+        try:
+            await self._call(consume)
+        except BaseException:
+            if changes:
+                self.track(self.confirm(tenant, changes, deliveries, None))
+            raise
+        return changes, deliveries
+
+    def track(self, coroutine):
+        """Запускаем подтверждение доставки в фоне."""
+        confirmation = asyncio.ensure_future(coroutine)
+        self._confirmations.add(confirmation)
+        confirmation.add_done_callback(self._confirmations.discard)
+
+    async def handle_response(self, tenant, response):
+        """Ставим в очередь уведомления о каждой работе с новым статусом."""
+        if response is NOT_MODIFIED:
+            logging.debug(NO_NEW_STATUSES)
+            return IDLE
+        homeworks = homework.check_response(response)
+        if isinstance(response, HomeworkStream):
+            changes, deliveries = await self.stream_changes(
+                tenant, homeworks
+            )
+        else:
+            changes = tenant.index.changes(homeworks)
+            deliveries = [
+                self.enqueue(tenant, changed) for changed in changes
+            ]
+        if not changes:
+            logging.debug(NO_NEW_STATUSES)
+            if tenant.prev_report:
+                tenant.prev_report = ''
+                self.save_state(tenant)
+            return IDLE
+        self.track(self.confirm(
+            tenant, changes, deliveries,
+            response.get('current_date', tenant.timestamp)
+        ))
+        return CHANGED
+
+    async def process(self, tenant, response, deadline):
+        """Обрабатываем ответ и закрываем его, даже если он не дочитан."""
+        try:
+            deadline.check('validate')
+            return await self.handle_response(tenant, response)
+        finally:
+            close_stream(response)
+
+    async def confirm(self, tenant, changes, deliveries, current_date):
+        """Фиксируем статусы после доставки и сдвигаем курсор опроса.
+
+        Курсор сдвигается, только если доставлены все уведомления ответа,
+        иначе следующий опрос вернёт недоставленные работы ещё раз. Без
+        `current_date` (ответ прочитан не до конца) курсор не сдвигается.
+        Запись кеша ответов при недоставке сбрасывается, чтобы такой же
+        ответ при следующем опросе разобрать и отправить заново.
+        """
+        results = await asyncio.gather(*deliveries)
+        for changed, delivered in zip(changes, results):
+            if delivered:
+                tenant.index.commit(changed)
+            else:
+                tenant.index.discard(changed)
+        if not all(results) and self.cache is not None:
+            self.cache.invalidate(tenant.headers)
+        if all(results) and current_date is not None:
+            tenant.timestamp = max(tenant.timestamp, current_date)
+            tenant.prev_report = ''
+            self.save_state(tenant)
+
+    async def throttle(self):
+        """Ждём своей очереди в общем лимите запросов к API."""
+        if self.budget is not None:
+            wait = self.budget.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+
+    async def fetch(self, tenant):
+        """Запрашиваем статусы пользователя и возвращаем ответ и срок.
+
+        Срок цикла отсчитывается, когда место в `max_in_flight` получено:
+        ожидание очереди опросом не считается, и watchdog его не видит.
+        Запрос в потоке нельзя прервать, поэтому его доля срока передаётся
+        в `requests` как таймаут: поток освободится сам. Потоковый ответ
+        запроса, который не дождались, закрывается, когда он придёт.
+        """
+        async with self._semaphore:
+            deadline = Deadline(self.deadline, self.clock)
+            if self.watchdog is not None:
+                self.watchdog.begin(tenant.chat_id, deadline)
+            if tenant.due is not None:
+                POLL_LAG_SECONDS.observe(max(0.0, self.clock() - tenant.due))
+            timeout = deadline.timeout('fetch')
+            args = (
+                tenant.headers, tenant.timestamp, self.session, self.cache,
+                self.breaker, timeout, self.stream
+            )
+            if self.hedger is None:
+                future = self.executor.submit(homework.request_api, *args)
+                request = asyncio.wrap_future(future)
+            else:
+                future = None
+                request = self.hedger.call(
+                    lambda: self.executor.submit(homework.request_api, *args),
+                    self.budget.take if self.budget is not None else None,
+                    close_abandoned
+                )
+            IN_FLIGHT.inc()
+            try:
+                return await asyncio.wait_for(request, timeout), deadline
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(
+                    f'Запрос к API не уложился в {timeout:.0f} с.'
+                )
+            finally:
+                IN_FLIGHT.dec()
+                if future is not None and request.cancelled():
+                    future.add_done_callback(close_abandoned)
+
+    def holds_lease(self, tenant):
+        """Проверяем, что пользователя не опрашивает другой экземпляр.
+
+        Без аренды опрос откладывается до её следующего продления, а
+        состояние пользователя будет прочитано из хранилища заново.
+        """
+        if self.leases is None or self.leases.holds(tenant.chat_id):
+            return True
+        logging.debug('%s опрашивает другой экземпляр бота.', tenant)
+        tenant.loaded = False
+        tenant.retry_after = self.leases.ttl / 3
+        return False
+
+    async def poll_tenant(self, tenant):
+        """Выполняем один опрос пользователя и возвращаем его итог."""
+        if not self.holds_lease(tenant):
+            return DEFERRED
+        try:
+            await self.load_state(tenant)
+            await self.throttle()
+            response, deadline = await self.fetch(tenant)
+            return await self.process(tenant, response, deadline)
+        except CircuitOpenError as error:
+            logging.debug(error)
+            return DEFERRED
+        except RateLimitedError as error:
+            if error.retry_after is None:
+                self.report_error(tenant, error)
+                return ERROR
+            logging.warning(
+                '%s Повторим через %.0f с.', error, error.retry_after
+            )
+            tenant.retry_after = error.retry_after
+            return DEFERRED
+        except EmptyResponseFromAPIError as error:
+            logging.error('Пустой ответ от API - %s', error)
+        except DeadlineExceededError as error:
+            logging.warning('%s: %s', tenant, error)
+        except Exception as error:
+            self.report_error(tenant, error)
+        finally:
+            if self.watchdog is not None:
+                self.watchdog.end(tenant.chat_id)
+        return ERROR
+
+    async def run_cycle(self):
+        """Опрашиваем всех пользователей один раз и ждём отправки."""
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        await self.outbox.start()
+        try:
+            await asyncio.gather(
+                *(self.poll_tenant(tenant) for tenant in self.tenants)
+            )
+            await self.outbox.join()
+            await asyncio.gather(*self._confirmations)
+        finally:
+            await self.outbox.stop()
+            await self.flush()
+
+    def next_delay(self, tenant, outcome):
+        """Пауза до следующего опроса пользователя.
+
+        Отложенный опрос повторяем через `Retry-After` из ответа API или,
+        если его не было, когда предохранитель снова пустит запрос.
+        """
+        if outcome != DEFERRED:
+            return self.schedule.next_interval(tenant, outcome)
+        if tenant.retry_after is not None:
+            delay, tenant.retry_after = tenant.retry_after, None
+            return delay
+        return self.breaker.retry_delay()
+
+    async def run_tenant(self, tenant):
+        """Опрашиваем пользователя с интервалом, который даёт `schedule`."""
+        delay = self.schedule.initial_delay()
+        while True:
+            tenant.due = self.clock() + delay
+            await asyncio.sleep(delay)
+            outcome = await self.poll_tenant(tenant)
+            delay = self.next_delay(tenant, outcome)
+
+    async def report(self):
+        """Периодически пишем в лог статистику соединений и очередей."""
+        while True:
+            await asyncio.sleep(self.report_period)
+            logging.info('Сообщений в очереди: %s', self.outbox.depth())
+            if self.session is not None:
+                logging.info('Соединения: %s', self.session.stats())
+            if self.cache is not None:
+                logging.info('Кеш ответов API: %s', self.cache.stats())
+
+    async def run(self):
+        """Опрашиваем всех пользователей, пока работает программа."""
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        await self.outbox.start()
+        await self.replies.start()
+        self._loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(
+                self.report(),
+                *(self.run_tenant(tenant) for tenant in self.tenants)
+            )
+        finally:
+            self._loop = None
+            await self.replies.stop()
+
+
+def run_engine(telegram_token, tenants_file,
+               max_in_flight=homework.MAX_IN_FLIGHT, store=None, owns=None,
+               share=1.0):
+    """Запускаем многопользовательский опрос API.
+
+    Если задан `owns`, опрашиваем только пользователей, чьи чаты он
+    принимает, а общие лимиты запросов к API и сообщений в Telegram
+    уменьшаем до доли `share`: так работают процессы-обработчики
+    `supervisor.Supervisor`. С хранилищем `store` пользователей опрашивает
+    только экземпляр, который держит их аренду (см. `lease.LeaseKeeper`).
+    """
+    tenants = load_tenants(tenants_file)
+    outbox_options = {}
+    if owns is not None:
+        tenants = [tenant for tenant in tenants if owns(tenant.chat_id)]
+        outbox_options = {
+            'global_rate': TELEGRAM_GLOBAL_RATE * share,
+            'chats': {tenant.chat_id for tenant in tenants},
+        }
+    logging.info('Загружено пользователей: %s.', len(tenants))
+    pool = HttpPool(per_host=max_in_flight)
+    leases = None
+    if store is not None:
+        store.prune_delivered(OUTBOX_RETENTION)
+        leases = LeaseKeeper(
+            store, [tenant.chat_id for tenant in tenants]
+        ).start()
+        outbox_options['chats'] = leases
+    bot = pool.make_bot(telegram_token)
+    statuses = StatusCache(homework.HOMEWORK_VERDICTS)
+    engine = PollingEngine(
+        bot, tenants, max_in_flight,
+        session=pool, store=store, cache=ResponseCache(),
+        outbox_options=outbox_options,
+        breaker=CircuitBreaker(), watchdog=Watchdog().start(),
+        hedger=Hedger() if HEDGE_REQUESTS else None,
+        rate=homework.PRACTICUM_RATE * share,
+        burst=max(1, round(homework.PRACTICUM_BURST * share)),
+        leases=leases, statuses=statuses
+    )
+    commands = homework.start_commands(
+        statuses, [tenant.chat_id for tenant in tenants], bot, engine.post,
+        store
+    )
+    try:
+        asyncio.run(engine.run())
+    finally:
+        engine.watchdog.stop()
+        engine.executor.shutdown(wait=False)
+        pool.close()
+        if commands is not None:
+            commands.stop()
+        if leases is not None:
+            leases.stop()
+        if store is not None:
+            engine.writer.shutdown(wait=True)
+            store.close()
@@ -4,3 +4,21 @@ class EmptyResponseFromAPIError(Exception):
 
 class InvalidResponseCodeError(Exception):
     pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CacheEntryMissingError(Exception):
+    pass
+
+
+class RateLimitedError(InvalidResponseCodeError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    pass
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY, Counter, Histogram
+
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', '0') == '1'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 0.95))
+HEDGE_BUDGET = float(os.getenv('HEDGE_BUDGET', 0.05))
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 0.2))
+HEDGE_WINDOW = 1000
+RECOMPUTE_EVERY = 50
+
+HEDGED = REGISTRY.register(Counter(
+    'homework_bot_hedged_requests_total',
+    'Повторные запросы к API, отправленные из-за медленного ответа.'
+))
+HEDGE_WINS = REGISTRY.register(Counter(
+    'homework_bot_hedge_wins_total',
+    'Повторные запросы, ответившие раньше первых.'
+))
+HEDGE_SAVED_SECONDS = REGISTRY.register(Histogram(
+    'homework_bot_hedge_saved_seconds',
+    'На сколько повторный запрос опередил первый.'
+))
+
+
+class Hedger:
+    """Повторяем медленный запрос, чтобы сократить хвост задержек.
+
+    Если запрос не ответил за время, которое укладывается в перцентиль
+    `percentile` последних задержек (но не меньше `min_delay`), отправляем
+    такой же запрос ещё раз и берём первый успешный ответ. Каждый обычный
+    запрос даёт `budget` токена, повторный запрос тратит целый токен,
+    поэтому повторы добавляют не больше `budget` доли нагрузки.
+    """
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, budget=HEDGE_BUDGET,
+                 min_delay=HEDGE_MIN_DELAY, window=HEDGE_WINDOW,
+                 clock=time.monotonic):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.clock = clock
+        self.capacity = max(1.0, budget * 100)
+        self.tokens = 0.0
+        self._latencies = deque(maxlen=window)
+        self._observed = 0
+        self._threshold = None
+        self._lock = threading.Lock()
+
+    def observe(self, latency):
+        """Запоминаем задержку ответа."""
+        with self._lock:
+            self._latencies.append(latency)
+            self._observed += 1
+            if self._threshold is None or (
+                    self._observed % RECOMPUTE_EVERY == 0):
+                ordered = sorted(self._latencies)
+                self._threshold = ordered[
+                    min(len(ordered) - 1, int(self.percentile * len(ordered)))
+                ]
+
+    def delay(self):
+        """Через сколько секунд без ответа отправлять повторный запрос."""
+        if self._threshold is None:
+            return None
+        return max(self.min_delay, self._threshold)
+
+    def _earn(self):
+        self.tokens = min(self.capacity, self.tokens + self.budget)
+
+    def _spend(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def call(self, submit, allow=None, discard=None):
+        """Выполняем запрос с возможным повтором.
+
+        `submit` отправляет запрос в пул потоков и возвращает
+        `concurrent.futures.Future`. Повтор отправляется, только если
+        `allow()` разрешает ещё один запрос. Проигравший запрос
+        отменяется, а если он уже выполняется, его ответ не используется:
+        когда future такого запроса завершится, его получит `discard`,
+        например чтобы закрыть соединение.
+        """
+        self._earn()
+        started = self.clock()
+        first = submit()
+        waiter = asyncio.wrap_future(first)
+        try:
+            done, _ = await asyncio.wait([waiter], timeout=self.delay())
+            if done or not self._spend() or (allow and not allow()):
+                result = await waiter
+                self.observe(self.clock() - started)
+                return result
+        except asyncio.CancelledError:
+            waiter.cancel()
+            if discard is not None:
+                first.add_done_callback(discard)
+            raise
+        HEDGED.inc()
+        return await self._race(first, waiter, submit(), started, discard)
+
+    async def _race(self, first, first_waiter, second, started,
+                    discard=None):
+        """Ждём первый успешный ответ из двух запросов."""
+        pending = {first_waiter: first, asyncio.wrap_future(second): second}
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for waiter in done:
+                    future = pending.pop(waiter)
+                    if waiter.exception() is not None and pending:
+                        continue
+                    finished = self.clock()
+                    self.observe(finished - started)
+                    if future is second:
+                        HEDGE_WINS.inc()
+                        first.add_done_callback(
+                            lambda future: future.cancelled()
+                            or HEDGE_SAVED_SECONDS.observe(
+                                self.clock() - finished
+                            )
+                        )
+                    return waiter.result()
+        finally:
+            for waiter, future in pending.items():
+                if waiter.done() and not waiter.cancelled():
+                    waiter.exception()
+                waiter.cancel()
+                if discard is not None:
+                    future.add_done_callback(discard)
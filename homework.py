@@ -1,182 +1,493 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import sys
 import time
+from datetime import timezone
+from functools import partial
 from http import HTTPStatus
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-import requests
-import telegram
 from dotenv import load_dotenv
 
-from exceptions import EmptyResponseFromAPIError, InvalidResponseCodeError
+from cache import NOT_MODIFIED
+from commands import StatusCache
+from deadline import Deadline, Watchdog
+from dedup import ErrorDigest
+from exceptions import (CacheEntryMissingError, CircuitOpenError,
+                        DeadlineExceededError, EmptyResponseFromAPIError,
+                        InvalidResponseCodeError, RateLimitedError)
+from lease import LeaseKeeper
+from metrics import start_metrics_server, timed
+from schema import (MISSING_KEY, compile_renderer, compile_stream_validator,
+                    compile_validator)
+from state import StateStore
+from stream import HomeworkStream, close_stream
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+STATE_DB = os.getenv('STATE_DB', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'state.sqlite3'
+))
+METRICS_PORT = os.getenv('METRICS_PORT')
 
 RETRY_PERIOD = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 100))
+WORKERS = int(os.getenv('WORKERS', 1))
+EXECUTION_MODE = os.getenv('EXECUTION_MODE', 'asyncio')
+BOT_COMMANDS = os.getenv('BOT_COMMANDS', '0') == '1'
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 30))
+SEND_TIMEOUT = float(os.getenv('SEND_TIMEOUT', 15))
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', '0') == '1'
+PRACTICUM_RATE = float(os.getenv('PRACTICUM_RATE', 10))
+PRACTICUM_BURST = int(os.getenv('PRACTICUM_BURST', 20))
+RATE_LIMIT_CODES = (
+    HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE
+)
+
+LOG_FILE = __file__ + '.log'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
 
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+validate_response = compile_validator(HOMEWORK_VERDICTS)
+validate_stream = compile_stream_validator(HOMEWORK_VERDICTS)
+render_verdict = compile_renderer(HOMEWORK_VERDICTS)
 
 
 def check_tokens():
     """Проверяем наличие обязательных переменных окружения."""
-    tokens = (
-        ('PRACTICUM_TOKEN', PRACTICUM_TOKEN),
-        ('TELEGRAM_TOKEN', TELEGRAM_TOKEN),
-        ('TELEGRAM_CHAT_ID', TELEGRAM_CHAT_ID)
-    )
+    tokens = (('TELEGRAM_TOKEN', TELEGRAM_TOKEN),)
+    if not TENANTS_FILE:
+        tokens += (
+            ('PRACTICUM_TOKEN', PRACTICUM_TOKEN),
+            ('TELEGRAM_CHAT_ID', TELEGRAM_CHAT_ID)
+        )
     available = True
     for name, value in tokens:
         if not value:
             available = False
             logging.critical(
-                f'Отсутствует обязательная переменная окружения: {name}.'
+                'Отсутствует обязательная переменная окружения: %s.', name
             )
     if not available:
         raise ValueError('Программа принудительно остановлена.')
 
 
+def check_tenants(path):
+    """Проверяем файл пользователей и возвращаем их число."""
+    with open(path, encoding='utf-8') as file:
+        records = json.load(file)
+    if not isinstance(records, list):
+        raise ValueError(f'{path}: ожидается список пользователей.')
+    for number, record in enumerate(records):
+        if not isinstance(record, dict) or not (
+                {'practicum_token', 'chat_id'} <= record.keys()):
+            raise ValueError(
+                f'{path}: у пользователя {number} нет practicum_token '
+                'или chat_id.'
+            )
+    return len(records)
+
+
+def check_config():
+    """Проверяем настройки, не загружая Telegram и requests.
+
+    Возвращаем код завершения: 0, если бота можно запускать.
+    """
+    try:
+        check_tokens()
+        if EXECUTION_MODE not in ('asyncio', 'threads'):
+            raise ValueError(
+                f'Неизвестный режим EXECUTION_MODE: {EXECUTION_MODE}.'
+            )
+        if TENANTS_FILE:
+            logging.info(
+                'Пользователей в %s: %s.', TENANTS_FILE,
+                check_tenants(TENANTS_FILE)
+            )
+    except (OSError, ValueError) as error:
+        logging.critical(error)
+        return 1
+    logging.info('Настройки в порядке.')
+    return 0
+
+
 def send_message(bot, message):
     """Отправляем сообщение в Telegram чат."""
+    return send_message_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+@timed('send_message')
+def send_message_to_chat(bot, chat_id, message, timeout=SEND_TIMEOUT):
+    """Отправляем сообщение в указанный Telegram чат."""
+    from telegram.error import TelegramError
+
     logging.debug(
         'Начинаем отправлять сообщение в чат.'
     )
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
-    except telegram.error.TelegramError as error:
-        logging.error(f'Cбой при отправке сообщения "{message}" - {error}')
+        bot.send_message(chat_id, message, timeout=timeout)
+    except TelegramError as error:
+        logging.error('Cбой при отправке сообщения "%s" - %s', message, error)
         return False
     else:
         logging.debug(
-            f'Бот отправил сообщение "{message}"'
+            'Бот отправил сообщение "%s"', message
         )
         return True
 
 
 def get_api_answer(timestamp):
     """Отправляем запрос к эндпоинту API-сервиса."""
+    return request_api(HEADERS, timestamp, stream=STREAM_RESPONSES)
+
+
+def make_headers(practicum_token):
+    """Формируем заголовки запроса для токена Практикума."""
+    return {'Authorization': f'OAuth {practicum_token}'}
+
+
+def parse_retry_after(value, now=None):
+    """Переводим заголовок `Retry-After` в секунды ожидания.
+
+    Заголовок содержит либо число секунд, либо дату в формате HTTP.
+    Если его нет или он некорректен, возвращаем `None`.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    now = time.time() if now is None else now
+    return max(0.0, moment.timestamp() - now)
+
+
+@timed('get_api_answer')
+def request_api(headers, timestamp, session=None, cache=None, breaker=None,
+                timeout=REQUEST_TIMEOUT, stream=False):
+    """Отправляем запрос к API-сервису с заданными заголовками.
+
+    Через `session` можно передать общий пул соединений, по умолчанию
+    запрос отправляется через `requests.get`. Если передан `cache` и ответ
+    не изменился с прошлого запроса, возвращаем `NOT_MODIFIED`. Если
+    передан `breaker` и он разомкнут, запрос не отправляется. На ответы
+    429 и 503 выбрасываем `RateLimitedError` с паузой из `Retry-After`.
+    Соединение и чтение ответа ограничены `timeout` секундами. С
+    `stream` тело не загружается целиком: возвращаем `HomeworkStream`,
+    который отдаёт домашние работы по мере чтения.
+    """
+    # requests и telegram импортируются при первом использовании: их
+    # загрузка занимает большую часть запуска, а `--check` они не нужны.
+    import requests
+
     params_for_get_api = {
         'url': ENDPOINT,
-        'headers': HEADERS,
+        'headers': (
+            headers if cache is None else cache.prepare(headers, timestamp)
+        ),
         'params': {'from_date': timestamp}
     }
     logging.debug(
-        'Начинаем отправлять запрос к эндпоинту API-сервиса: {url}.'
-        ' С параметрами: {headers}, {params}.'.format(**params_for_get_api)
+        'Начинаем отправлять запрос к эндпоинту API-сервиса: %s.'
+        ' С параметрами: %s.', ENDPOINT, params_for_get_api['params']
     )
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(
+            f'Эндпоинт {ENDPOINT} недоступен, запросы приостановлены.'
+        )
     try:
-        response = requests.get(
+        response = (session or requests).get(
             params_for_get_api.get('url'),
             headers=params_for_get_api.get('headers'),
-            params=params_for_get_api.get('params')
+            params=params_for_get_api.get('params'),
+            timeout=timeout, **({'stream': True} if stream else {})
+        )
+        if breaker is not None:
+            breaker.record(response.status_code)
+        if check_status_code(response, headers, timestamp, cache, stream):
+            return NOT_MODIFIED
+    except CacheEntryMissingError as error:
+        logging.debug('%s Запрашиваем ответ целиком.', error)
+        return request_api(
+            headers, timestamp, session, cache, breaker, timeout, stream
+        )
+    except requests.exceptions.RequestException as error:
+        if breaker is not None:
+            breaker.record(None)
+        # Заголовки с токеном в сообщение не попадают: оно уходит в лог
+        # и в чат пользователя.
+        raise ConnectionError(
+            f'Эндпоинт {ENDPOINT} c параметрами: '
+            f'{params_for_get_api["params"]} - недоступен. - {error}'
         )
+    if stream:
+        return HomeworkStream(response)
+    return response.json()
+
+
+def check_status_code(response, headers, timestamp, cache=None,
+                      stream=False):
+    """Проверяем код ответа API; True, если ответ не изменился.
+
+    Потоковый (`stream`) ответ, тело которого читать не придётся - он не
+    изменился или пришёл с ошибкой, - сразу закрывается.
+    """
+    keep_open = False
+    try:
+        if cache is not None and cache.unchanged(
+                headers, timestamp, response, stream):
+            return True
+        if response.status_code in RATE_LIMIT_CODES:
+            raise RateLimitedError(
+                f'Эндпоинт "{response.url}" ограничил запросы.'
+                f' Код ответа API: {response.status_code}.',
+                parse_retry_after(response.headers.get('Retry-After'))
+            )
         if response.status_code != HTTPStatus.OK:
             raise InvalidResponseCodeError(
                 f'Эндпоинт "{response.url}" недоступен - {response.json}'
                 f' Код ответа API: {response.status_code}.'
             )
-    except requests.exceptions.RequestException as error:
-        raise ConnectionError(
-            ('Эндпоинт {url} c параметрами: {headers}, {params}'
-             ).format(**params_for_get_api) + f' - недоступен. - {error}'
-        )
-    return response.json()
+        keep_open = True
+        return False
+    finally:
+        if stream and not keep_open:
+            response.close()
 
 
+@timed('check_response')
 def check_response(response):
-    """Проверяем ответ API на наличие ключа 'homeworks'."""
+    """Проверяем ответ API и все домашние работы в нём.
+
+    Работы из `HomeworkStream` проверяются по одной по мере чтения.
+    """
     logging.debug(
         'Проверяем ответ API на наличие ключа "homeworks".'
     )
-    if not isinstance(response, dict):
-        raise TypeError('Ответ API ожидается в формате словаря.')
-    if 'homeworks' not in response:
-        raise EmptyResponseFromAPIError(
-            'Отсутствует ожидаемый ключ "homeworks" в ответе API.'
-        )
-    homeworks = response.get('homeworks')
-    if not isinstance(homeworks, list):
-        raise TypeError(
-            'Под ключом "homeworks" ожидается список.'
-        )
-    return homeworks
+    if isinstance(response, HomeworkStream):
+        return validate_stream(response)
+    return validate_response(response)
 
 
+@timed('parse_status')
 def parse_status(homework):
     """Получаем статус домашней работы."""
-    logging.debug(
-        'Получаем статус домашней работы.'
+    try:
+        return render_verdict(homework['homework_name'], homework['status'])
+    except KeyError as error:
+        raise KeyError(MISSING_KEY.format(error.args[0])) from None
+
+
+def send_changes(bot, index, homeworks, deadline=None, statuses=None):
+    """Отправляем сообщения обо всех изменившихся статусах.
+
+    Если срок цикла `deadline` истёк, оставшиеся уведомления не
+    отправляются. Работы из потокового ответа отправляются сразу по мере
+    чтения, в порядке ответа. Новые статусы записываются в кэш команд
+    `statuses`. Возвращаем True, если все уведомления доставлены.
+    """
+    if isinstance(homeworks, list):
+        changes = index.changes(homeworks)
+    else:
+        changes = filter(index.changed, homeworks)
+    delivered = True
+    sent = 0
+    for sent, homework in enumerate(changes, 1):
+        if statuses is not None:
+            statuses.record(TELEGRAM_CHAT_ID, homework)
+        if deadline is not None:
+            deadline.check('send')
+        if send_message(bot, parse_status(homework)):
+            index.commit(homework)
+        else:
+            delivered = False
+    if not sent:
+        logging.debug('Нет новых статусов.')
+    return delivered
+
+
+def start_commands(statuses, chats, bot=None, send=None, store=None):
+    """Запускаем приём команд /status и /history, если BOT_COMMANDS=1.
+
+    Команды читает один процесс: при WORKERS > 1 обработчики мешали бы
+    друг другу получать обновления. Последние статусы работ чатов
+    восстанавливаются из `store`. Ответы отправляет `send(chat_id, text)`,
+    по умолчанию - сразу через `bot`.
+    """
+    if not BOT_COMMANDS:
+        return None
+    if WORKERS > 1:
+        logging.warning('Команды боту не работают при WORKERS > 1.')
+        return None
+    from commands import CommandReceiver
+
+    if store is not None:
+        statuses.restore(store.load_statuses(chats))
+    if bot is None:
+        import telegram
+
+        bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    return CommandReceiver(
+        bot, statuses, chats, send or partial(send_message_to_chat, bot)
+    ).start()
+
+
+def standby(leases, chat_id):
+    """Проверяем, не опрашивает ли чат другой экземпляр бота."""
+    if leases.holds(chat_id):
+        return False
+    logging.info('Чат %s опрашивает другой экземпляр бота.', chat_id)
+    return True
+
+
+def report_error(bot, store, errors, error, timestamp):
+    """Сообщаем в чат об ошибке, если не сообщали о ней недавно.
+
+    Отправленное сообщение сохраняется вместе с курсором `timestamp`;
+    если курсор ещё не прочитан из хранилища, не сохраняем ничего.
+    """
+    logging.error('Сбой в работе программы: %s', error)
+    message = errors.message(error, time.monotonic())
+    if message is None:
+        return
+    send_message(bot, message)
+    if timestamp is not None:
+        store.save(TELEGRAM_CHAT_ID, timestamp, message)
+
+
+class LazyQueueHandler(QueueHandler):
+    """Передаём запись в очередь, не форматируя её в потоке опроса."""
+
+    def prepare(self, record):
+        """Сообщение соберёт поток `QueueListener`."""
+        return record
+
+
+def configure_logging(log_file=None):
+    """Настраиваем логирование через очередь в консоль и файл.
+
+    Форматирование и запись на диск выполняет отдельный поток
+    `QueueListener`, файл лога (по умолчанию `LOG_FILE`) ротируется по
+    размеру.
+    """
+    formatter = logging.Formatter(
+        '%(asctime)s  [%(levelname)s] - (%(funcName)s(%(lineno)d)'
+        ' -  %(message)s'
+    )
+    handler_term = logging.StreamHandler()
+    handler_file = RotatingFileHandler(
+        log_file or LOG_FILE, maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    for handler in (handler_term, handler_file):
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue, handler_term, handler_file, respect_handler_level=True
+    )
+    logging.basicConfig(
+        level=logging.INFO, handlers=[LazyQueueHandler(log_queue)]
     )
-    if 'homework_name' not in homework:
-        raise KeyError(
-            'Отсутствует ожидаемый ключ "homework_name" в ответе API.'
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def run_tenants():
+    """Опрос пользователей из TENANTS_FILE.
+
+    Пользователи опрашиваются в цикле событий asyncio, в пуле потоков
+    (EXECUTION_MODE=threads) или в WORKERS процессах.
+    """
+    if WORKERS > 1:
+        from supervisor import run_supervisor
+        return run_supervisor(
+            TELEGRAM_TOKEN, TENANTS_FILE, MAX_IN_FLIGHT, STATE_DB, WORKERS,
+            METRICS_PORT
         )
-    homework_name = homework.get('homework_name')
-    if 'status' not in homework:
-        raise KeyError(
-            'Отсутствует ожидаемый ключ "status" в ответе API.'
+    if EXECUTION_MODE == 'threads':
+        from threaded import run_threaded
+        return run_threaded(
+            TELEGRAM_TOKEN, TENANTS_FILE, MAX_IN_FLIGHT, StateStore(STATE_DB)
         )
-    status = homework.get('status')
-    if status not in HOMEWORK_VERDICTS:
-        raise ValueError('Неопознанный статус - {status}')
-    verdict = HOMEWORK_VERDICTS.get(status)
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    from engine import run_engine
+    return run_engine(
+        TELEGRAM_TOKEN, TENANTS_FILE, MAX_IN_FLIGHT, StateStore(STATE_DB)
+    )
 
 
 def main():
     """Основная логика работы бота."""
     check_tokens()
+    start_metrics_server(METRICS_PORT)
+    if TENANTS_FILE:
+        return run_tenants()
+    import telegram
+
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = 0
-    prev_report = ''
-    current_report = ''
+    store = StateStore(STATE_DB)
+    errors = ErrorDigest()
+    watchdog = Watchdog().start()
+    leases = LeaseKeeper(store, [TELEGRAM_CHAT_ID]).start()
+    statuses = StatusCache(HOMEWORK_VERDICTS)
+    start_commands(statuses, [TELEGRAM_CHAT_ID], store=store)
     while True:
+        deadline = Deadline()
+        watchdog.begin('main', deadline)
+        response = timestamp = None
         try:
+            if standby(leases, TELEGRAM_CHAT_ID):
+                continue
+            # Между циклами чат мог опрашивать другой экземпляр бота,
+            # поэтому курсор и статусы каждый раз читаются из хранилища.
+            timestamp, prev_report = store.load(TELEGRAM_CHAT_ID)
+            index = store.load_index(TELEGRAM_CHAT_ID)
             response = get_api_answer(timestamp)
+            deadline.check('validate')
             homeworks = check_response(response)
-            if homeworks:
-                homework = homeworks[0]
-                status = parse_status(homework)
-                current_report = status
-            else:
-                current_report = 'Нет новых статусов.'
-            if current_report != prev_report:
-                if send_message(bot, status):
-                    prev_report = current_report
-                    timestamp = response.get('current_date', timestamp)
-            else:
-                logging.debug(
-                    'Нет новых статусов.'
-                )
-
+            if send_changes(bot, index, homeworks, deadline, statuses):
+                timestamp = response.get('current_date', timestamp)
+                prev_report = ''
+                store.save(TELEGRAM_CHAT_ID, timestamp, prev_report)
         except EmptyResponseFromAPIError as error:
-            logging.error(f'Пустой ответ от API - {error}')
+            logging.error('Пустой ответ от API - %s', error)
+        except DeadlineExceededError as error:
+            logging.warning(error)
         except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            current_report = message
-            logging.error(message)
-            if current_report != prev_report:
-                send_message(bot, current_report)
-                prev_report = current_report
+            report_error(bot, store, errors, error, timestamp)
         finally:
+            close_stream(response)
+            watchdog.end('main')
             time.sleep(RETRY_PERIOD)
 
 
 if __name__ == '__main__':
-    handler_term = logging.StreamHandler()
-    handler_file = logging.FileHandler(__file__ + '.log', encoding='utf-8')
-    logging.basicConfig(
-        format=('%(asctime)s  [%(levelname)s] - (%(funcName)s(%(lineno)d)'
-                ' -  %(message)s'),
-        level=logging.INFO,
-        handlers=[handler_term, handler_file]
-    )
+    if '--check' in sys.argv[1:]:
+        logging.basicConfig(
+            level=logging.INFO, format='[%(levelname)s] %(message)s'
+        )
+        sys.exit(check_config())
+    configure_logging()
     main()
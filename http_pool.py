@@ -0,0 +1,120 @@
+import os
+import threading
+
+import requests
+import telegram
+from requests.adapters import HTTPAdapter
+from telegram.utils.request import Request
+
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 10))
+HTTP_POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', 100))
+HTTP_KEEP_ALIVE = os.getenv('HTTP_KEEP_ALIVE', '1') != '0'
+
+
+class ConnectionStats:
+    """Потокобезопасные счётчики запросов и новых подключений."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.handshakes = 0
+
+    def add(self, requests_count=0, handshakes=0):
+        """Увеличиваем счётчики."""
+        with self._lock:
+            self.requests += requests_count
+            self.handshakes += handshakes
+
+
+def _install_counters(manager, stats):
+    """Подменяем классы пулов urllib3, чтобы считать подключения.
+
+    Считаем каждый вызов `connect()`: так учитываются и переподключения
+    после того, как сервер закрыл keep-alive соединение.
+    """
+    def counting_connection(connection_cls):
+        def connect(self):
+            stats.add(handshakes=1)
+            return connection_cls.connect(self)
+        return type(connection_cls.__name__, (connection_cls,),
+                    {'connect': connect})
+
+    def counting_pool(pool_cls):
+        def urlopen(self, *args, **kwargs):
+            stats.add(requests_count=1)
+            return pool_cls.urlopen(self, *args, **kwargs)
+        return type(pool_cls.__name__, (pool_cls,), {
+            'ConnectionCls': counting_connection(pool_cls.ConnectionCls),
+            'urlopen': urlopen,
+        })
+
+    manager.pool_classes_by_scheme = {
+        scheme: counting_pool(pool_cls)
+        for scheme, pool_cls in manager.pool_classes_by_scheme.items()
+    }
+
+
+class HttpPool:
+    """Общий пул keep-alive соединений для API Практикума и Telegram.
+
+    `hosts` - сколько пулов (по одному на хост) держать одновременно,
+    `per_host` - сколько соединений хранить для одного хоста. Запросы к
+    Практикуму идут через `requests.Session`, сообщения в Telegram - через
+    `telegram.utils.request.Request` с пулом на `per_host` соединений.
+    `hosts` и `keep_alive` к Telegram не относятся: бот ходит на один
+    хост, а `Request` всегда держит соединения открытыми.
+    """
+
+    def __init__(self, hosts=HTTP_POOL_HOSTS, per_host=HTTP_POOL_PER_HOST,
+                 keep_alive=HTTP_KEEP_ALIVE):
+        self.keep_alive = keep_alive
+        self.practicum_stats = ConnectionStats()
+        self.telegram_stats = ConnectionStats()
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=hosts, pool_maxsize=per_host
+        )
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self.telegram_request = Request(con_pool_size=per_host)
+        _install_counters(self.adapter.poolmanager, self.practicum_stats)
+        _install_counters(
+            self.telegram_request._con_pool, self.telegram_stats
+        )
+
+    def get(self, url, **kwargs):
+        """Отправляем GET-запрос через общий пул."""
+        return self.session.get(url, **kwargs)
+
+    def make_bot(self, token, base_url=None):
+        """Создаём бота, который отправляет сообщения через общий пул.
+
+        Соединения с Telegram держатся открытыми и при `keep_alive=False`:
+        `Request` сам выставляет `Connection: keep-alive`.
+        """
+        return telegram.Bot(
+            token=token, base_url=base_url, request=self.telegram_request
+        )
+
+    def stats(self):
+        """Статистика переиспользования соединений."""
+        requests_total = (
+            self.practicum_stats.requests + self.telegram_stats.requests
+        )
+        handshakes = (
+            self.practicum_stats.handshakes + self.telegram_stats.handshakes
+        )
+        reused = max(requests_total - handshakes, 0)
+        return {
+            'requests': requests_total,
+            'new_connections': handshakes,
+            'reused_connections': reused,
+            'reuse_ratio': reused / requests_total if requests_total else 0.0,
+        }
+
+    def close(self):
+        """Закрываем все соединения пула."""
+        self.session.close()
+        self.telegram_request.stop()
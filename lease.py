@@ -0,0 +1,97 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+LEASE_TTL = float(os.getenv('LEASE_TTL', 30))
+LEASE_MARGIN = 0.2
+
+
+def instance_id():
+    """Уникальное имя экземпляра бота: хост, процесс и случайный суффикс."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaseKeeper:
+    """Аренды пользователей в общем хранилище `store`.
+
+    Пользователя опрашивает только экземпляр, который держит его аренду.
+    Фоновый поток раз в треть `ttl` одной транзакцией продлевает свои
+    аренды и забирает истёкшие. Если экземпляр остановился или завис,
+    другой подхватит его пользователей не позже чем через `ttl` с
+    небольшим. Аренда считается своей только до `ttl` после последнего
+    успешного продления за вычетом запаса `margin`, поэтому экземпляр,
+    потерявший связь с хранилищем, перестаёт отправлять сообщения раньше,
+    чем аренду сможет забрать другой.
+
+    Экземпляр поддерживает оператор `in`: `key in leases` истинно, пока
+    аренда действует.
+    """
+
+    def __init__(self, store, keys=(), ttl=LEASE_TTL, owner=None,
+                 clock=time.time, margin=LEASE_MARGIN):
+        self.store = store
+        self.keys = {str(key) for key in keys}
+        self.ttl = ttl
+        self.margin = margin
+        self.owner = owner or instance_id()
+        self.clock = clock
+        self.valid_until = 0.0
+        self._held = frozenset()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def renew(self):
+        """Продлеваем свои аренды и забираем свободные."""
+        now = self.clock()
+        try:
+            held = self.store.renew_leases(
+                self.owner, self.keys - self._held, now, now + self.ttl
+            )
+        except Exception as error:
+            logging.error('Не удалось продлить аренды: %s', error)
+            return
+        lost = self._held - held
+        if lost:
+            logging.warning(
+                'Пользователей забрал другой экземпляр: %s.', len(lost)
+            )
+        gained = held - self._held
+        if gained:
+            logging.info('Получены аренды пользователей: %s.', len(gained))
+        self._held = frozenset(held)
+        self.valid_until = now + self.ttl * (1 - self.margin)
+
+    def holds(self, key):
+        """Действует ли аренда пользователя `key`."""
+        return self.clock() < self.valid_until and str(key) in self._held
+
+    def __contains__(self, key):
+        return self.holds(key)
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            self.renew()
+
+    def start(self):
+        """Берём аренды и запускаем их продление в фоне."""
+        self.renew()
+        self._thread = threading.Thread(
+            target=self._run, name='leases', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливаем продление и освобождаем аренды."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._held = frozenset()
+        self.valid_until = 0.0
+        try:
+            self.store.release_leases(self.owner)
+        except Exception as error:
+            logging.error('Не удалось освободить аренды: %s', error)
@@ -0,0 +1,272 @@
+import logging
+import threading
+import time
+from functools import lru_cache, wraps
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+    float('inf')
+)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('"', '\\"'))
+        for name, value in pairs
+    ) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Метрика с метками в текстовом формате Prometheus."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Строки со значениями метрики."""
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} '
+            f'{_format_value(value)}'
+            for key, value in sorted(values.items())
+        ]
+
+    def render(self):
+        """Метрика целиком: описание, тип и значения."""
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ] + self.samples()
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Увеличиваем счётчик."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Текущее значение счётчика."""
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Значение, которое может как расти, так и уменьшаться.
+
+    Вместо явной установки значения можно передать `function`: она будет
+    вызываться при каждом чтении метрики.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        """Устанавливаем значение."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        """Увеличиваем значение."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """Уменьшаем значение."""
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        """Строки со значениями метрики."""
+        if self.function is not None:
+            return [f'{self.name} {_format_value(self.function())}']
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """Учитываем одно наблюдение."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * len(self.buckets), 0.0)
+            )
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        """Количество наблюдений."""
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def samples(self):
+        """Строки с корзинами, суммой и количеством наблюдений."""
+        with self._lock:
+            values = {
+                key: (list(counts), total)
+                for key, (counts, total) in self._values.items()
+            }
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(
+                    self.labelnames, key, [('le', _format_value(bound))]
+                )
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class Registry:
+    """Набор метрик, который отдаётся по `/metrics`."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Добавляем метрику; повторная регистрация заменяет прежнюю."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'homework_bot_stage_seconds',
+    'Длительность этапов опроса.', ('stage',)
+))
+ERRORS = REGISTRY.register(Counter(
+    'homework_bot_errors_total',
+    'Исключения, возникшие на этапах опроса.', ('stage', 'exception')
+))
+POLL_LAG_SECONDS = REGISTRY.register(Histogram(
+    'homework_bot_poll_lag_seconds',
+    'Опоздание начала опроса относительно расписания.'
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    'homework_bot_in_flight_requests',
+    'Запросы к API, выполняющиеся прямо сейчас.'
+))
+
+
+def timed(stage):
+    """Измеряем длительность функции и считаем её исключения."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                ERRORS.inc(stage=stage, exception=type(error).__name__)
+                raise
+            finally:
+                STAGE_SECONDS.observe(
+                    time.perf_counter() - started, stage=stage
+                )
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def metrics_handler():
+    """Класс обработчика запросов к `/metrics`.
+
+    `http.server` тянет за собой разбор почтовых заголовков и заметно
+    замедляет запуск, поэтому класс создаётся при первом обращении.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Отдаём метрики по `GET /metrics`."""
+
+        registry = REGISTRY
+
+        def do_GET(self):
+            """Обрабатываем запрос к `/metrics`."""
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = self.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header(
+                'Content-Type', 'text/plain; version=0.0.4; charset=utf-8'
+            )
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Не пишем каждый запрос к метрикам в лог."""
+
+    return MetricsHandler
+
+
+def __getattr__(name):
+    if name == 'MetricsHandler':
+        return metrics_handler()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Запускаем HTTP-сервер метрик в фоновом потоке.
+
+    Если порт не задан, сервер не запускается.
+    """
+    if not port:
+        return None
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, int(port)), metrics_handler())
+    thread = threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    )
+    thread.start()
+    logging.info('Метрики доступны на http://%s:%s/metrics', host, port)
+    return server
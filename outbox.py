@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 30))
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = '\n\n'
+PRUNE_EVERY = 1000
+
+
+class TokenBucket:
+    """Ограничитель частоты: `rate` токенов в секунду, не больше `capacity`.
+
+    `reserve()` сразу забирает токен и возвращает, сколько секунд нужно
+    подождать, пока он станет действительным.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def reserve(self):
+        """Забираем токен и возвращаем время ожидания."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def take(self):
+        """Забираем токен, только если он доступен прямо сейчас."""
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def block(self, seconds):
+        """Запрещаем выдачу токенов на `seconds` секунд."""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def full(self):
+        """Проверяем, накопился ли полный запас токенов."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class Outbox:
+    """Очередь исходящих сообщений с ограничением частоты отправки.
+
+    `put()` не блокирует вызывающего и возвращает future с результатом
+    доставки. Сообщения, накопившиеся для одного чата, пока он ждёт своей
+    очереди, объединяются в одно. Отправка ограничена общим ограничителем
+    и ограничителем на каждый чат, а ответ Telegram `RetryAfter`
+    откладывает только тот чат, который его получил.
+
+    Сообщения с ключом `key` записываются в `journal` до отправки и
+    отмечаются доставленными после неё. При запуске недоставленные
+    сообщения из журнала отправляются заново, а повторный `put()` с ключом
+    уже доставленного сообщения ничего не отправляет. Дубль возможен,
+    только если процесс упал между ответом Telegram и записью в журнал.
+    Если задан `chats`, заново отправляются только сообщения в эти чаты:
+    журнал общий для нескольких процессов. Журнал - база SQLite, поэтому
+    обращения к нему выполняет `call(func, *args)` вне цикла событий, по
+    умолчанию в пуле потоков цикла; сообщения пачки записываются разом
+    перед отправкой.
+    """
+
+    def __init__(self, send, global_rate=TELEGRAM_GLOBAL_RATE,
+                 chat_rate=TELEGRAM_CHAT_RATE, workers=OUTBOX_WORKERS,
+                 clock=time.monotonic, sleep=asyncio.sleep, journal=None,
+                 chats=None, call=None):
+        self.send = send
+        self.journal = journal
+        self.call = call
+        self.chats = chats
+        self.chat_rate = chat_rate
+        self.workers = workers
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self._chat_buckets = {}
+        self._pending = {}
+        self._keys = {}
+        self._queue = None
+        self._tasks = []
+        self._sent = 0
+
+    def depth(self):
+        """Количество сообщений, ожидающих отправки."""
+        return sum(len(messages) for messages in self._pending.values())
+
+    def put(self, chat_id, text, key=None):
+        """Ставим сообщение в очередь и возвращаем future доставки."""
+        if key in self._keys:
+            return self._keys[key]
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._keys[key] = future
+            future.add_done_callback(lambda _: self._keys.pop(key, None))
+        messages = self._pending.get(chat_id)
+        if messages is None:
+            self._pending[chat_id] = deque([(text, future, key)])
+            self._queue.put_nowait(chat_id)
+        else:
+            messages.append((text, future, key))
+        return future
+
+    async def _call(self, func, *args):
+        if self.call is not None:
+            return await self.call(func, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def replay(self):
+        """Ставим в очередь недоставленные сообщения из журнала."""
+        messages = [
+            (key, chat_id, text)
+            for key, chat_id, text in await self._call(
+                self.journal.undelivered_messages
+            )
+            if self.chats is None or chat_id in self.chats
+        ]
+        if messages:
+            logging.info(
+                'Повторно отправляем сообщений из журнала: %s.', len(messages)
+            )
+        for key, chat_id, text in messages:
+            self.put(chat_id, text, key)
+
+    async def start(self):
+        """Запускаем фоновые обработчики очереди."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for chat_id in self._pending:
+            self._queue.put_nowait(chat_id)
+        if self.journal is not None:
+            await self.replay()
+        self._tasks = [
+            asyncio.ensure_future(self._worker())
+            for _ in range(self.workers)
+        ]
+
+    async def join(self):
+        """Ждём, пока очередь опустеет."""
+        await self._queue.join()
+
+    async def stop(self):
+        """Останавливаем обработчики очереди."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, 1, self.clock)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self):
+        """Удаляем ограничители чатов, которым нечего отправлять."""
+        for chat_id in list(self._chat_buckets):
+            if (chat_id not in self._pending
+                    and self._chat_buckets[chat_id].full()):
+                del self._chat_buckets[chat_id]
+
+    def _take_batch(self, chat_id):
+        """Забираем сообщения чата, которые поместятся в одно."""
+        messages = self._pending[chat_id]
+        batch = [messages.popleft()]
+        length = len(batch[0][0])
+        while messages:
+            length += len(SEPARATOR) + len(messages[0][0])
+            if length > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(messages.popleft())
+        if messages:
+            self._queue.put_nowait(chat_id)
+        else:
+            del self._pending[chat_id]
+        return batch
+
+    def _return_batch(self, chat_id, batch):
+        """Возвращаем сообщения в начало очереди чата."""
+        messages = self._pending.get(chat_id)
+        if messages is None:
+            messages = self._pending[chat_id] = deque()
+            self._queue.put_nowait(chat_id)
+        messages.extendleft(reversed(batch))
+
+    async def _journal_batch(self, chat_id, batch):
+        """Записываем пачку в журнал и убираем уже доставленные."""
+        rows = [
+            (key, chat_id, text) for text, _, key in batch if key is not None
+        ]
+        if not rows or self.journal is None:
+            return batch
+        try:
+            delivered = await self._call(self.journal.journal_messages, rows)
+        except Exception as error:
+            logging.error('Не удалось записать сообщения в журнал: %s', error)
+            return batch
+        remaining = []
+        for text, future, key in batch:
+            if key in delivered:
+                if not future.done():
+                    future.set_result(True)
+            else:
+                remaining.append((text, future, key))
+        return remaining
+
+    async def _mark_delivered(self, batch):
+        """Отмечаем сообщения пачки доставленными в журнале."""
+        keys = [key for _, _, key in batch if key is not None]
+        if not keys or self.journal is None:
+            return
+        try:
+            await self._call(self.journal.mark_delivered, keys)
+        except Exception as error:
+            logging.error('Не удалось отметить доставку в журнале: %s', error)
+
+    async def _deliver(self, chat_id):
+        delay = max(
+            self._chat_bucket(chat_id).reserve(),
+            self.global_bucket.reserve()
+        )
+        if delay:
+            await self.sleep(delay)
+        batch = self._take_batch(chat_id)
+        batch = await self._journal_batch(chat_id, batch)
+        if not batch:
+            return
+        try:
+            delivered = await self.send(
+                chat_id, SEPARATOR.join(text for text, _, _ in batch)
+            )
+        except RetryAfter as error:
+            logging.warning(
+                'Telegram просит подождать %s с перед отправкой в чат %s.',
+                error.retry_after, chat_id
+            )
+            self._chat_bucket(chat_id).block(error.retry_after)
+            self._return_batch(chat_id, batch)
+            return
+        except Exception as error:
+            logging.error('Сбой при отправке сообщения в чат: %s', error)
+            delivered = False
+        if delivered:
+            await self._mark_delivered(batch)
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_result(bool(delivered))
+        self._sent += 1
+        if self._sent % PRUNE_EVERY == 0:
+            self._prune()
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._queue.get()
+            try:
+                await self._deliver(chat_id)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,54 @@
+import os
+import random
+
+POLL_BASE_PERIOD = int(os.getenv('POLL_BASE_PERIOD', 600))
+POLL_REVIEWING_PERIOD = int(os.getenv('POLL_REVIEWING_PERIOD', 120))
+POLL_MAX_PERIOD = int(os.getenv('POLL_MAX_PERIOD', 3600))
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.1))
+
+CHANGED = 'changed'
+IDLE = 'idle'
+ERROR = 'error'
+DEFERRED = 'deferred'
+
+
+class AdaptiveSchedule:
+    """Подбираем интервал опроса для каждого пользователя.
+
+    Пока работа на проверке, опрашиваем раз в `reviewing` секунд. После
+    нового статуса возвращаемся к `base`, а при ошибках и без изменений
+    увеличиваем интервал в `factor` раз, но не больше `maximum`. К каждому
+    интервалу добавляется случайный разброс `jitter`, чтобы тысячи
+    пользователей не обращались к API в одну и ту же секунду.
+    """
+
+    def __init__(self, base=POLL_BASE_PERIOD, reviewing=POLL_REVIEWING_PERIOD,
+                 maximum=POLL_MAX_PERIOD, factor=2, jitter=POLL_JITTER,
+                 rng=random.random):
+        self.base = base
+        self.reviewing = reviewing
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.rng = rng
+
+    def initial_delay(self):
+        """Задержка первого опроса, чтобы размазать старт по времени."""
+        return self.rng() * self.base * self.jitter
+
+    def backoff(self, interval):
+        """Увеличиваем интервал, начиная не меньше чем с `base`."""
+        return min(self.maximum, max(interval, self.base) * self.factor)
+
+    def next_interval(self, tenant, outcome):
+        """Вычисляем интервал до следующего опроса пользователя."""
+        if outcome == ERROR:
+            interval = self.backoff(tenant.interval)
+        elif tenant.index.has_status('reviewing'):
+            interval = self.reviewing
+        elif outcome == CHANGED:
+            interval = self.base
+        else:
+            interval = self.backoff(tenant.interval)
+        tenant.interval = interval
+        return interval * (1 + self.jitter * (2 * self.rng() - 1))
@@ -0,0 +1,103 @@
+import os
+from functools import lru_cache
+
+from exceptions import EmptyResponseFromAPIError
+
+VERDICT_CACHE_SIZE = int(os.getenv('VERDICT_CACHE_SIZE', 4096))
+MISSING_KEY = 'Отсутствует ожидаемый ключ "{}" в ответе API.'
+NOT_A_DICT = 'Ответ API ожидается в формате словаря.'
+NOT_A_LIST = 'Под ключом "homeworks" ожидается список.'
+
+
+def response_homeworks(response):
+    """Список работ из ответа API с проверкой его структуры."""
+    if not isinstance(response, dict):
+        raise TypeError(NOT_A_DICT)
+    try:
+        homeworks = response['homeworks']
+    except KeyError:
+        raise EmptyResponseFromAPIError(
+            MISSING_KEY.format('homeworks')
+        ) from None
+    if not isinstance(homeworks, list):
+        raise TypeError(NOT_A_LIST)
+    return homeworks
+
+
+def homework_error(homework):
+    """Исключение, объясняющее, чем плоха домашняя работа."""
+    if not isinstance(homework, dict):
+        return TypeError('Домашняя работа ожидается в формате словаря.')
+    for key in ('homework_name', 'status'):
+        if key not in homework:
+            return KeyError(MISSING_KEY.format(key))
+    return ValueError(f'Неопознанный статус - {homework["status"]}')
+
+
+def compile_validator(verdicts):
+    """Собираем проверку всего ответа API за один проход.
+
+    Известные статусы связываются с функцией один раз, а каждая работа
+    проверяется двумя обращениями по ключу без `in` и `.get`. Разбор, что
+    именно не так, выполняется только для некорректной работы.
+    Возвращаем список работ из ответа: после проверки у каждой есть
+    название и статус из `verdicts`.
+    """
+    statuses = frozenset(verdicts)
+
+    def validate(response):
+        homeworks = response_homeworks(response)
+        for homework in homeworks:
+            try:
+                homework['homework_name']
+                if homework['status'] in statuses:
+                    continue
+            except (KeyError, TypeError):
+                pass
+            raise homework_error(homework)
+        return homeworks
+
+    return validate
+
+
+def compile_stream_validator(verdicts):
+    """Та же проверка для работ, которые читаются из ответа по одной.
+
+    Каждая работа проверяется и отдаётся дальше сразу после разбора, а
+    структуру самого ответа проверяет `stream.HomeworkStream`.
+    """
+    statuses = frozenset(verdicts)
+
+    def valid(homework):
+        try:
+            homework['homework_name']
+            return homework['status'] in statuses
+        except (KeyError, TypeError):
+            return False
+
+    def validate(homeworks):
+        for homework in homeworks:
+            if not valid(homework):
+                raise homework_error(homework)
+            yield homework
+
+    return validate
+
+
+def compile_renderer(verdicts, size=VERDICT_CACHE_SIZE):
+    """Готовим сообщения о статусах с кэшем по (название работы, статус).
+
+    Сообщение собирается один раз для каждой пары, повторные уведомления
+    о той же работе берут готовую строку из кэша.
+    """
+    verdicts = dict(verdicts)
+
+    @lru_cache(maxsize=size)
+    def render(name, status):
+        try:
+            verdict = verdicts[status]
+        except KeyError:
+            raise ValueError(f'Неопознанный статус - {status}') from None
+        return f'Изменился статус проверки работы "{name}". {verdict}'
+
+    return render
@@ -0,0 +1,236 @@
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from diff import StatusIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenant_state (
+    tenant_key TEXT PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    prev_report TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS homework_status (
+    tenant_key TEXT NOT NULL,
+    homework_key TEXT NOT NULL,
+    status TEXT,
+    homework_name TEXT,
+    PRIMARY KEY (tenant_key, homework_key)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    message_key TEXT PRIMARY KEY,
+    chat_id NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_undelivered ON outbox (delivered);
+CREATE TABLE IF NOT EXISTS lease (
+    tenant_key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lease_owner ON lease (owner)
+"""
+
+
+class StateStore:
+    """Хранилище состояния опроса и журнала исходящих сообщений.
+
+    Данные лежат в SQLite в режиме WAL: запись не блокирует чтение, а
+    `synchronous=NORMAL` не вызывает fsync на каждый коммит. Соединение
+    открывается при первом обращении, состояние пользователя читается
+    только тогда, когда оно понадобилось.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """Открываем базу при первом обращении."""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            columns = {
+                row[1] for row in connection.execute(
+                    'PRAGMA table_info(homework_status)'
+                )
+            }
+            if 'homework_name' not in columns:
+                connection.execute(
+                    'ALTER TABLE homework_status ADD COLUMN homework_name TEXT'
+                )
+            self._connection = connection
+        return self._connection
+
+    def load(self, tenant_key):
+        """Получаем сохранённые `timestamp` и `prev_report`."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT timestamp, prev_report FROM tenant_state '
+                'WHERE tenant_key = ?', (str(tenant_key),)
+            ).fetchone()
+        if row is None:
+            return 0, ''
+        return row
+
+    def save(self, tenant_key, timestamp, prev_report):
+        """Сохраняем курсор и последний отправленный статус."""
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO tenant_state '
+                '(tenant_key, timestamp, prev_report) VALUES (?, ?, ?)',
+                (str(tenant_key), timestamp, prev_report)
+            )
+
+    def load_index(self, tenant_key):
+        """Получаем индекс статусов, который сохраняет изменения в базу."""
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT homework_key, status FROM homework_status '
+                'WHERE tenant_key = ?', (str(tenant_key),)
+            ).fetchall()
+        return StatusIndex(
+            dict(rows), on_commit=partial(self.save_status, tenant_key)
+        )
+
+    def save_status(self, tenant_key, homework_key, status,
+                    homework_name=None):
+        """Сохраняем последний известный статус домашней работы."""
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO homework_status '
+                '(tenant_key, homework_key, status, homework_name) '
+                'VALUES (?, ?, ?, ?)',
+                (str(tenant_key), homework_key, status, homework_name)
+            )
+
+    def load_statuses(self, tenant_keys):
+        """Получаем `(чат, название работы, статус)` для чатов `tenant_keys`.
+
+        Работы, сохранённые без названия, пропускаются.
+        """
+        tenant_keys = {str(key) for key in tenant_keys}
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT tenant_key, homework_name, status '
+                'FROM homework_status WHERE homework_name IS NOT NULL '
+                'ORDER BY rowid'
+            ).fetchall()
+        return [row for row in rows if row[0] in tenant_keys]
+
+    def journal_message(self, message_key, chat_id, text):
+        """Записываем сообщение в журнал до отправки.
+
+        Возвращаем True, если сообщение с таким ключом уже доставлено.
+        """
+        return message_key in self.journal_messages(
+            [(message_key, chat_id, text)]
+        )
+
+    def journal_messages(self, messages):
+        """Записываем пачку `(ключ, чат, текст)` в журнал одной транзакцией.
+
+        Возвращаем ключи сообщений, которые уже доставлены.
+        """
+        created = time.time()
+        keys = [key for key, _, _ in messages]
+        with self._lock:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(
+                    'INSERT OR IGNORE INTO outbox '
+                    '(message_key, chat_id, text, created) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(key, chat_id, text, created)
+                     for key, chat_id, text in messages]
+                )
+                rows = connection.execute(
+                    'SELECT message_key FROM outbox WHERE delivered = 1 '
+                    'AND message_key IN ({})'.format(
+                        ', '.join('?' * len(keys))
+                    ), keys
+                ).fetchall()
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        return {key for key, in rows}
+
+    def mark_delivered(self, message_keys):
+        """Отмечаем сообщения журнала доставленными."""
+        with self._lock:
+            self.connection.executemany(
+                'UPDATE outbox SET delivered = 1 WHERE message_key = ?',
+                [(key,) for key in message_keys]
+            )
+
+    def undelivered_messages(self):
+        """Получаем недоставленные сообщения в порядке записи."""
+        with self._lock:
+            return self.connection.execute(
+                'SELECT message_key, chat_id, text FROM outbox '
+                'WHERE delivered = 0 ORDER BY rowid'
+            ).fetchall()
+
+    def prune_delivered(self, older_than):
+        """Удаляем доставленные сообщения старше `older_than` секунд."""
+        with self._lock:
+            self.connection.execute(
+                'DELETE FROM outbox WHERE delivered = 1 AND created < ?',
+                (time.time() - older_than,)
+            )
+
+    def renew_leases(self, owner, tenant_keys, now, expires):
+        """Продлеваем аренды `owner` и берём свободные из `tenant_keys`.
+
+        Аренда свободна, если её нет или срок истёк. Всё выполняется в
+        одной транзакции, так что два экземпляра не могут взять одного
+        пользователя одновременно. Возвращаем ключи всех аренд `owner`.
+        """
+        with self._lock:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute(
+                    'UPDATE lease SET expires = ? WHERE owner = ?',
+                    (expires, owner)
+                )
+                connection.executemany(
+                    'INSERT INTO lease (tenant_key, owner, expires) '
+                    'VALUES (?, ?, ?) ON CONFLICT (tenant_key) DO UPDATE '
+                    'SET owner = excluded.owner, expires = excluded.expires '
+                    'WHERE lease.expires <= ?',
+                    [(str(key), owner, expires, now) for key in tenant_keys]
+                )
+                rows = connection.execute(
+                    'SELECT tenant_key FROM lease WHERE owner = ?', (owner,)
+                ).fetchall()
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        return {key for key, in rows}
+
+    def release_leases(self, owner):
+        """Освобождаем все аренды `owner`."""
+        with self._lock:
+            self.connection.execute(
+                'DELETE FROM lease WHERE owner = ?', (owner,)
+            )
+
+    def close(self):
+        """Закрываем соединение с базой."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,168 @@
+import codecs
+import json
+
+from exceptions import EmptyResponseFromAPIError
+from schema import MISSING_KEY, NOT_A_DICT, NOT_A_LIST
+
+STREAM_CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+NUMBER_CHARS = frozenset('0123456789.eE+-')
+DECODER = json.JSONDecoder()
+
+
+class JsonReader:
+    """Читаем JSON из последовательности фрагментов тела ответа.
+
+    В памяти держится только ещё не разобранный хвост текста. Значение,
+    которое не уместилось в прочитанные фрагменты, разбирается заново
+    после чтения следующего фрагмента, поэтому выгодны фрагменты больше
+    одного элемента списка.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder('utf-8')().decode
+        self.text = ''
+        self.position = 0
+        self.eof = False
+
+    def _more(self):
+        """Дочитываем фрагмент, False - если тело уже закончилось."""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            text = self._decode(chunk)
+            if text:
+                break
+        else:
+            text = self._decode(b'', True)
+            self.eof = True
+        self.text = self.text[self.position:] + text
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Следующий значимый символ или пустая строка в конце тела."""
+        while True:
+            while (self.position < len(self.text)
+                   and self.text[self.position] in WHITESPACE):
+                self.position += 1
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if not self._more():
+                return ''
+
+    def expect(self, chars):
+        """Пропускаем один из символов `chars` и возвращаем его."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f'Ожидался один из символов {chars!r}', self.text,
+                self.position
+            )
+        self.position += 1
+        return char
+
+    def _unfinished_number(self, value, end):
+        """Проверяем, может ли число `value` продолжиться после `end`."""
+        return (
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            and all(char in NUMBER_CHARS for char in self.text[end:])
+        )
+
+    def value(self):
+        """Разбираем одно значение JSON целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.text, self.position)
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+                continue
+            # Число, обрезанное на границе фрагментов (`1.`, `2e`), JSON
+            # разбирает до точки или экспоненты: дочитываем, пока за ним
+            # в буфере нет ничего, кроме символов числа.
+            if self._unfinished_number(value, end) and self._more():
+                continue
+            self.position = end
+            return value
+
+
+def iter_array(chunks, key, fields):
+    """Отдаём элементы списка `key` из JSON-объекта по одному.
+
+    Остальные поля объекта складываются в `fields`: поля после списка
+    появятся там, только когда список будет прочитан до конца.
+    """
+    reader = JsonReader(chunks)
+    if reader.peek() != '{':
+        raise TypeError(NOT_A_DICT)
+    reader.position += 1
+    found = False
+    while reader.peek() != '}':
+        name = reader.value()
+        reader.expect(':')
+        if name != key:
+            fields[name] = reader.value()
+        elif reader.peek() != '[':
+            raise TypeError(NOT_A_LIST)
+        else:
+            found = True
+            reader.position += 1
+            if reader.peek() != ']':
+                yield reader.value()
+                while reader.expect(',]') == ',':
+                    yield reader.value()
+            else:
+                reader.position += 1
+        if reader.expect(',}') == '}':
+            break
+    if not found:
+        raise EmptyResponseFromAPIError(MISSING_KEY.format(key))
+
+
+class HomeworkStream:
+    """Ответ API, домашние работы из которого читаются по мере разбора.
+
+    Вместо словаря из `response.json()` отдаём работы по одной, не
+    дожидаясь конца тела, так что память не зависит от размера истории.
+    Поля вроде `current_date` доступны через `get` после того, как
+    работы прочитаны. Соединение закрывается, когда чтение закончено.
+    """
+
+    def __init__(self, response, chunk_size=STREAM_CHUNK_SIZE):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.fields = {}
+        self._started = False
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError('Ответ API уже прочитан.')
+        self._started = True
+        try:
+            yield from iter_array(
+                self.response.iter_content(self.chunk_size), 'homeworks',
+                self.fields
+            )
+        finally:
+            self.response.close()
+
+    def get(self, key, default=None):
+        """Поле ответа, прочитанное к этому моменту."""
+        return self.fields.get(key, default)
+
+    def close(self):
+        """Закрываем соединение, не дочитывая ответ."""
+        self.response.close()
+
+
+def close_stream(response):
+    """Закрываем потоковый ответ, если он уже не будет прочитан.
+
+    Повторное закрытие ничего не делает, поэтому вызывать можно и после
+    того, как ответ прочитан до конца.
+    """
+    if isinstance(response, HomeworkStream):
+        response.close()
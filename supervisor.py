@@ -0,0 +1,239 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+RING_REPLICAS = int(os.getenv('RING_REPLICAS', 128))
+RESTART_DELAY = float(os.getenv('RESTART_DELAY', 1))
+RESTART_MAX_DELAY = float(os.getenv('RESTART_MAX_DELAY', 60))
+SUPERVISOR_INTERVAL = 1.0
+STOP_TIMEOUT = 10
+
+
+def ring_hash(key):
+    """Положение ключа на кольце: 64-битный хеш его строкового вида."""
+    return int.from_bytes(
+        hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(),
+        'big'
+    )
+
+
+class HashRing:
+    """Консистентное хеширование пользователей по обработчикам.
+
+    Каждый обработчик занимает на кольце `replicas` точек, а пользователь
+    достаётся обработчику с ближайшей точкой по часовой стрелке. Когда
+    обработчик добавляется или убирается, к другому обработчику переходят
+    только пользователи соседних с его точками участков: в среднем
+    `1 / (N + 1)` всех пользователей, а не почти все, как при делении
+    по модулю.
+    """
+
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self.nodes = []
+        self._hashes = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавляем обработчик на кольцо."""
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            position = bisect.bisect(self._hashes, point)
+            self._hashes.insert(position, point)
+            self._owners.insert(position, node)
+
+    def remove(self, node):
+        """Убираем обработчик с кольца."""
+        self.nodes.remove(node)
+        points = [
+            (point, owner)
+            for point, owner in zip(self._hashes, self._owners)
+            if owner != node
+        ]
+        self._hashes = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+
+    def node_for(self, key):
+        """Обработчик, которому достаётся ключ."""
+        if not self._hashes:
+            raise LookupError('На кольце нет ни одного обработчика.')
+        position = bisect.bisect(self._hashes, ring_hash(key))
+        return self._owners[position % len(self._owners)]
+
+
+def run_worker(node, nodes, telegram_token, tenants_file, max_in_flight,
+               state_db, metrics_port=None):
+    """Точка входа процесса-обработчика.
+
+    Обработчик опрашивает только пользователей своего участка кольца, а
+    общие лимиты запросов к API и сообщений в Telegram делятся между
+    обработчиками поровну.
+    """
+    import homework
+    from engine import run_engine
+    from metrics import start_metrics_server
+    from state import StateStore
+
+    # У каждого процесса свой файл: ротация одного файла из нескольких
+    # процессов теряла бы записи.
+    homework.configure_logging(f'{homework.__file__}.{node}.log')
+    if metrics_port:
+        start_metrics_server(int(metrics_port) + 1 + nodes.index(node))
+    ring = HashRing(nodes)
+    return run_engine(
+        telegram_token, tenants_file, max_in_flight, StateStore(state_db),
+        owns=lambda chat_id: ring.node_for(chat_id) == node,
+        share=1 / len(nodes)
+    )
+
+
+class Supervisor:
+    """Запускаем `workers` процессов-обработчиков и следим за ними.
+
+    Каждый процесс получает имя своего узла и состав кольца и сам выбирает
+    своих пользователей. Упавший обработчик перезапускается под тем же
+    именем, так что его пользователи никуда не переходят; если он падает
+    сразу после запуска, пауза перед перезапуском удваивается до
+    `max_restart_delay`. При изменении числа обработчиков все они
+    перезапускаются с новым составом кольца: курсоры опроса лежат в общем
+    хранилище, поэтому пользователи продолжают с того же места, а сменить
+    обработчик приходится лишь небольшой их доле.
+    """
+
+    def __init__(self, target, args=(), workers=1, replicas=RING_REPLICAS,
+                 restart_delay=RESTART_DELAY,
+                 max_restart_delay=RESTART_MAX_DELAY, clock=time.monotonic,
+                 context=None):
+        self.target = target
+        self.args = tuple(args)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.clock = clock
+        self.context = context or multiprocessing.get_context('spawn')
+        self.ring = HashRing(replicas=replicas)
+        self.processes = {}
+        self._started = {}
+        self._delays = {}
+        self._restart_at = {}
+        self._resize_to = None
+        self._stopping = False
+        self.resize(workers)
+
+    def _spawn(self, node):
+        process = self.context.Process(
+            target=self.target, name=node,
+            args=(node, tuple(self.ring.nodes)) + self.args
+        )
+        process.start()
+        self.processes[node] = process
+        self._started[node] = self.clock()
+        logging.info('Запущен обработчик %s, pid %s.', node, process.pid)
+
+    def _terminate(self):
+        processes = list(self.processes.values())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.processes.clear()
+        self._restart_at.clear()
+
+    def start(self):
+        """Запускаем обработчики всех узлов кольца."""
+        for node in self.ring.nodes:
+            if node not in self.processes:
+                self._spawn(node)
+
+    def resize(self, workers):
+        """Меняем число обработчиков и перезапускаем их с новым кольцом."""
+        workers = max(1, workers)
+        if workers == len(self.ring.nodes):
+            return
+        running = bool(self.processes)
+        self._terminate()
+        while len(self.ring.nodes) < workers:
+            self.ring.add(f'worker-{len(self.ring.nodes)}')
+        while len(self.ring.nodes) > workers:
+            self.ring.remove(self.ring.nodes[-1])
+        logging.info('Обработчиков: %s.', workers)
+        if running:
+            self.start()
+
+    def _restart_delay(self, node):
+        """Пауза перед перезапуском: растёт, если процесс падает сразу."""
+        lifetime = self.clock() - self._started[node]
+        if lifetime >= self.max_restart_delay or node not in self._delays:
+            delay = self.restart_delay
+        else:
+            delay = min(self.max_restart_delay, self._delays[node] * 2)
+        self._delays[node] = delay
+        return delay
+
+    def check(self):
+        """Перезапускаем завершившиеся обработчики."""
+        now = self.clock()
+        for node, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            if node not in self._restart_at:
+                delay = self._restart_delay(node)
+                logging.error(
+                    'Обработчик %s завершился с кодом %s, перезапуск '
+                    'через %.0f с.', node, process.exitcode, delay
+                )
+                self._restart_at[node] = now + delay
+            elif now >= self._restart_at[node]:
+                del self._restart_at[node]
+                self._spawn(node)
+
+    def _signal(self, signum, frame):
+        if signum == signal.SIGTTIN:
+            self._resize_to = len(self.ring.nodes) + 1
+        elif signum == signal.SIGTTOU:
+            self._resize_to = len(self.ring.nodes) - 1
+        else:
+            self._stopping = True
+
+    def run(self, interval=SUPERVISOR_INTERVAL):
+        """Работаем, пока не придёт SIGTERM или SIGINT.
+
+        SIGTTIN добавляет обработчик, SIGTTOU убирает один.
+        """
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGTTIN,
+                       signal.SIGTTOU):
+            signal.signal(signum, self._signal)
+        self.start()
+        try:
+            while not self._stopping:
+                if self._resize_to is not None:
+                    workers, self._resize_to = self._resize_to, None
+                    self.resize(workers)
+                self.check()
+                time.sleep(interval)
+        finally:
+            self._terminate()
+
+
+def run_supervisor(telegram_token, tenants_file, max_in_flight, state_db,
+                   workers, metrics_port=None):
+    """Запускаем многопроцессный опрос API."""
+    supervisor = Supervisor(
+        run_worker, (
+            telegram_token, tenants_file, max_in_flight, state_db,
+            metrics_port
+        ), workers=workers
+    )
+    supervisor.run()
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import engine
+from benchmarks.fake_servers import FakeServers, ServerConfig
+from benchmarks import streaming, threads, validation
+from benchmarks.memory import measure
+from http_pool import HttpPool
+
+
+@pytest.fixture
+def fake_servers():
+    servers = FakeServers(ServerConfig(change_every=60)).start()
+    yield servers
+    servers.stop()
+
+
+class TestFakeServers:
+    @pytest.mark.timeout(2)
+    def test_engine_against_fake_servers(self, fake_servers, monkeypatch,
+                                         homework_module):
+        monkeypatch.setattr(
+            homework_module, 'ENDPOINT', fake_servers.practicum_url
+        )
+        pool = HttpPool(per_host=4)
+        tenants = [engine.Tenant(f'token{number}', number)
+                   for number in range(3)]
+        polling = engine.PollingEngine(
+            pool.make_bot('123:test', base_url=fake_servers.telegram_url),
+            tenants, 4, session=pool
+        )
+        try:
+            asyncio.run(polling.run_cycle())
+        finally:
+            polling.executor.shutdown(wait=True)
+            pool.close()
+        assert fake_servers.practicum.requests == 3
+        assert fake_servers.telegram.messages == 3, (
+            'Каждый пользователь должен получить уведомление о статусе.'
+        )
+        assert len(fake_servers.telegram.latencies) == 3
+
+
+class TestMemory:
+    def test_tenant_state_is_compact(self):
+        result = measure(500, 5)
+        assert result['state_bytes_per_tenant'] < 1000, (
+            'Состояние пользователя с пятью работами должно занимать '
+            'меньше килобайта.'
+        )
+        assert not hasattr(engine.Tenant('token', 1), '__dict__')
+
+
+class TestValidation:
+    def test_compiled_cycle_matches_legacy(self):
+        result = validation.measure(50, repeat=1)
+        assert result['compiled_cycle_us'] > 0
+
+
+class TestStreaming:
+    def test_stream_memory_is_flat(self):
+        loaded = streaming.measure(streaming.loaded, 2000, 100)
+        streamed = streaming.measure(streaming.streamed, 2000, 100)
+        assert streamed['peak_kib'] * 2 < loaded['peak_kib'], (
+            'Потоковый разбор не должен держать ответ в памяти целиком.'
+        )
+
+
+class TestThreads:
+    @pytest.mark.timeout(2)
+    def test_threaded_cycle_matches_sequential(self, fake_servers,
+                                               monkeypatch, homework_module):
+        monkeypatch.setattr(
+            homework_module, 'ENDPOINT', homework_module.ENDPOINT
+        )
+        results = threads.compare(
+            4, [2], 2, fake_servers.practicum_url, fake_servers.telegram_url
+        )
+        assert [result['notified'] for result in results] == [4, 4], (
+            'Оба режима должны уведомить каждого пользователя.'
+        )
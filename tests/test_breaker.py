@@ -0,0 +1,89 @@
+import pytest
+
+from benchmarks.simulation import HOUR, simulate
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exceptions import CircuitOpenError
+from tests.utils import FakeClock
+
+
+def make_breaker(clock):
+    return CircuitBreaker(
+        failures=3, reset=10, max_reset=40, stagger=5, clock=clock,
+        rng=lambda: 0.5
+    )
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(2):
+            breaker.record(None)
+        breaker.record(200)
+        for _ in range(2):
+            breaker.record(503)
+        assert breaker.state == CLOSED, (
+            'Успешный ответ должен сбрасывать счётчик сбоев.'
+        )
+        breaker.record(503)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.retry_delay() == 10 + 2.5
+
+    def test_client_errors_do_not_open(self):
+        breaker = make_breaker(FakeClock())
+        for _ in range(5):
+            breaker.record(401)
+        assert breaker.state == CLOSED, (
+            'Ошибка одного пользователя не должна останавливать всех.'
+        )
+
+    def test_half_open_probe(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record(None)
+        clock.now = 10
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow(), 'Полуоткрытый предохранитель пускает пробу.'
+        assert not breaker.allow(), 'Пробный запрос должен быть один.'
+        breaker.record(500)
+        assert breaker.state == OPEN
+        clock.now = 29
+        assert breaker.state == OPEN, (
+            'После неудачной пробы пауза должна удваиваться.'
+        )
+        clock.now = 30
+        assert breaker.allow()
+        breaker.record(200)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_request_api_skips_request_when_open(self, homework_module):
+        breaker = make_breaker(FakeClock())
+        for _ in range(3):
+            breaker.record(None)
+
+        class Session:
+            def get(self, *args, **kwargs):
+                raise AssertionError('Запрос не должен отправляться.')
+
+        with pytest.raises(CircuitOpenError):
+            homework_module.request_api(
+                {'Authorization': 'OAuth token'}, 0, Session(),
+                breaker=breaker
+            )
+
+    @pytest.mark.timeout(2)
+    def test_outage_sends_almost_no_requests(self):
+        options = dict(
+            tenants=20, duration=6 * HOUR, strategy='fixed',
+            outages=[(HOUR, 3 * HOUR)]
+        )
+        protected = simulate(**options)['requests_during_outages']
+        unprotected = simulate(breaker=False, **options)[
+            'requests_during_outages'
+        ]
+        assert protected * 10 < unprotected, (
+            'Во время сбоя API запросы должны почти прекращаться.'
+        )
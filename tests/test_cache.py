@@ -0,0 +1,129 @@
+import asyncio
+from http import HTTPStatus
+
+import engine
+from cache import NOT_MODIFIED, ResponseCache
+from tests.utils import FakeResponse, FakeSession
+
+HEADERS = {'Authorization': 'OAuth token'}
+
+
+class TestResponseCache:
+    def test_same_body_is_a_hit(self):
+        cache = ResponseCache()
+        first = FakeResponse({'homeworks': [], 'current_date': 1})
+        second = FakeResponse({'homeworks': [], 'current_date': 2})
+        assert not cache.unchanged(HEADERS, 0, first)
+        assert cache.unchanged(HEADERS, 0, second), (
+            'Ответы, различающиеся только `current_date`, должны '
+            'считаться одинаковыми.'
+        )
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    def test_other_from_date_is_a_miss(self):
+        cache = ResponseCache()
+        response = FakeResponse({'homeworks': []})
+        cache.unchanged(HEADERS, 0, response)
+        assert not cache.unchanged(HEADERS, 100, response)
+
+    def test_conditional_headers(self):
+        cache = ResponseCache()
+        cache.unchanged(HEADERS, 0, FakeResponse(
+            {'homeworks': []},
+            headers={'ETag': '"abc"', 'Last-Modified': 'yesterday'}
+        ))
+        assert cache.prepare(HEADERS, 0) == {
+            'Authorization': 'OAuth token',
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'yesterday',
+        }
+        assert cache.prepare(HEADERS, 100) == HEADERS
+        assert cache.unchanged(
+            HEADERS, 0, FakeResponse(status_code=HTTPStatus.NOT_MODIFIED)
+        )
+
+    def test_request_api_skips_decoding(self, homework_module):
+        cache = ResponseCache()
+        body = {'homeworks': [], 'current_date': 1}
+        session = FakeSession([FakeResponse(body), FakeResponse(body)])
+        assert homework_module.request_api(HEADERS, 0, session, cache) == body
+        assert homework_module.request_api(
+            HEADERS, 0, session, cache
+        ) is NOT_MODIFIED
+
+    def test_not_modified_after_invalidate_is_requested_again(
+            self, homework_module):
+        cache = ResponseCache()
+        body = {'homeworks': [], 'current_date': 1}
+        session = FakeSession([
+            FakeResponse(body, headers={'ETag': '"abc"'}),
+            FakeResponse(status_code=HTTPStatus.NOT_MODIFIED),
+            FakeResponse(body, headers={'ETag': '"abc"'}),
+        ])
+        homework_module.request_api(HEADERS, 0, session, cache)
+        prepare = cache.prepare
+
+        def invalidate_in_flight(headers, from_date):
+            conditional = prepare(headers, from_date)
+            cache.invalidate(headers)
+            return conditional
+
+        cache.prepare = invalidate_in_flight
+        assert homework_module.request_api(
+            HEADERS, 0, session, cache
+        ) == body, (
+            'Ответ 304 без записи кеша - промах: ответ нужно запросить '
+            'заново.'
+        )
+        assert 'If-None-Match' in session.sent_headers[1]
+        assert session.sent_headers[2] == HEADERS, (
+            'Повторный запрос отправляется без условий.'
+        )
+
+    def test_engine_skips_check_response(self, monkeypatch,
+                                         homework_module):
+        checked = []
+        monkeypatch.setattr(
+            homework_module, 'request_api',
+            lambda *args: NOT_MODIFIED
+        )
+        monkeypatch.setattr(
+            homework_module, 'check_response', checked.append
+        )
+        polling = engine.PollingEngine(None, [engine.Tenant('token', 1)])
+        asyncio.run(polling.run_cycle())
+        assert checked == [], (
+            'Неизменившийся ответ не должен проверяться повторно.'
+        )
+
+    def test_failed_delivery_is_sent_again(self, homework_module):
+        from telegram.error import TelegramError
+
+        class FlakyBot:
+            def __init__(self):
+                self.calls = 0
+                self.sent = []
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                self.calls += 1
+                if self.calls == 1:
+                    raise TelegramError('Telegram недоступен.')
+                self.sent.append((chat_id, text))
+
+        body = {
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 1
+        }
+        bot = FlakyBot()
+        polling = engine.PollingEngine(
+            bot, [engine.Tenant('token', 1)], rate=None,
+            session=FakeSession([FakeResponse(body), FakeResponse(body)]),
+            cache=ResponseCache()
+        )
+        asyncio.run(polling.run_cycle())
+        assert bot.sent == []
+        asyncio.run(polling.run_cycle())
+        assert [chat_id for chat_id, _ in bot.sent] == [1], (
+            'Уведомление, которое не удалось доставить, должно уйти при '
+            'следующем опросе, даже если ответ API не изменился.'
+        )
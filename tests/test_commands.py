@@ -0,0 +1,218 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+from commands import NO_STATUSES, CommandReceiver, StatusCache
+from diff import StatusIndex
+from state import StateStore
+from tests.utils import FakeBot, make_request_api
+
+VERDICTS = {
+    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    'reviewing': 'Работа взята на проверку ревьюером.',
+}
+
+
+def homework(name, status, updated=''):
+    return {'homework_name': name, 'status': status, 'date_updated': updated}
+
+
+def update(update_id, chat_id, text):
+    return SimpleNamespace(
+        update_id=update_id,
+        message=SimpleNamespace(chat_id=chat_id, text=text)
+    )
+
+
+class FakeUpdatesBot:
+    def __init__(self, updates):
+        self.updates = updates
+        self.sent = []
+        self.answered = threading.Event()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+        self.answered.set()
+
+    def get_updates(self, offset=None, **kwargs):
+        return [item for item in self.updates
+                if offset is None or item.update_id >= offset]
+
+
+class TestStatusCache:
+    def test_unknown_chat(self):
+        cache = StatusCache(VERDICTS)
+        assert cache.reply(1, '/status') == NO_STATUSES
+        assert cache.reply(1, '/history') == NO_STATUSES
+        assert cache.reply(1, '/start') is None
+
+    def test_reply_is_cached_until_new_status(self):
+        cache = StatusCache(VERDICTS)
+        cache.record(1, homework('hw1', 'reviewing', '2024-01-01'))
+        first = cache.reply(1, '/status')
+        assert 'hw1: ' + VERDICTS['reviewing'] in first
+        assert cache.reply(1, '/status') is first, (
+            'Повторная команда должна отвечать готовым текстом.'
+        )
+        cache.record(1, homework('hw1', 'reviewing', '2024-01-01'))
+        assert cache.reply(1, '/status') is first, (
+            'Тот же статус не должен сбрасывать готовый ответ.'
+        )
+        cache.record(1, homework('hw1', 'approved', '2024-01-02'))
+        assert 'hw1: ' + VERDICTS['approved'] in cache.reply(1, '/status'), (
+            'Новый статус должен сбрасывать готовый ответ.'
+        )
+
+    def test_history_newest_first_and_bounded(self):
+        cache = StatusCache(VERDICTS, history_size=2)
+        cache.record(1, homework('hw1', 'reviewing', '2024-01-01'))
+        cache.record(1, homework('hw1', 'approved', '2024-01-02'))
+        cache.record(1, homework('hw2', 'reviewing', '2024-01-03'))
+        lines = cache.reply(1, '/history').splitlines()[1:]
+        assert lines == [
+            '2024-01-03 hw2: ' + VERDICTS['reviewing'],
+            '2024-01-02 hw1: ' + VERDICTS['approved'],
+        ]
+        assert cache.reply(2, '/history') == NO_STATUSES, (
+            'Чаты не должны видеть чужие работы.'
+        )
+
+    def test_concurrent_commands_render_once(self, monkeypatch):
+        cache = StatusCache(VERDICTS)
+        cache.record(1, homework('hw1', 'approved'))
+        renders = []
+        render = cache._render
+        monkeypatch.setattr(
+            cache, '_render',
+            lambda *args: renders.append(args) or render(*args)
+        )
+        threads = [
+            threading.Thread(target=cache.reply, args=(1, '/status'))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(renders) == 1
+
+    def test_statuses_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        store.load_index(1).commit({'id': 7, **homework('hw1', 'approved')})
+        store.close()
+        cache = StatusCache(VERDICTS)
+        restarted = StateStore(path)
+        cache.restore(restarted.load_statuses([1, 2]))
+        restarted.close()
+        assert 'hw1: ' + VERDICTS['approved'] in cache.reply(1, '/status'), (
+            'После перезапуска /status должен отвечать статусами из базы.'
+        )
+        assert cache.reply(2, '/status') == NO_STATUSES
+
+
+class TestCommandReceiver:
+    def test_replies_only_to_known_chats(self, monkeypatch,
+                                         homework_module):
+        def request_api(*args):
+            raise AssertionError('Команды не должны обращаться к API.')
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        cache = StatusCache(VERDICTS)
+        cache.record(1, homework('hw1', 'approved'))
+        bot = FakeUpdatesBot([
+            update(10, 1, '/status@homework_bot'),
+            update(11, 2, '/status'),
+            update(12, 1, 'привет'),
+            update(13, 1, '   '),
+            update(14, 1, '/history'),
+        ])
+        receiver = CommandReceiver(bot, cache, [1], bot.send_message)
+        assert receiver.poll() == 5
+        assert [chat_id for chat_id, _ in bot.sent] == [1, 1]
+        assert 'hw1' in bot.sent[0][1]
+        assert receiver.offset == 15
+        assert receiver.poll() == 0, (
+            'Обработанные обновления не должны приходить повторно.'
+        )
+
+
+class TestStartCommands:
+    def test_disabled_by_default(self, homework_module):
+        cache = StatusCache(VERDICTS)
+        assert homework_module.start_commands(cache, [1]) is None
+
+    @pytest.mark.timeout(2)
+    def test_receiver_answers_from_cache(self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'BOT_COMMANDS', True)
+        cache = StatusCache(VERDICTS)
+        cache.record(1, homework('hw1', 'approved'))
+        bot = FakeUpdatesBot([update(1, 1, '/status')])
+        receiver = homework_module.start_commands(cache, [1], bot)
+        try:
+            assert bot.answered.wait(1)
+        finally:
+            receiver.stop()
+        assert bot.sent[0][0] == 1 and 'hw1' in bot.sent[0][1]
+
+    @pytest.mark.timeout(2)
+    def test_engine_replies_through_outbox(self, homework_module):
+        bot = FakeBot()
+        leases = SimpleNamespace(holds=lambda chat_id: False, ttl=30)
+        polling = engine.PollingEngine(bot, [], rate=None, leases=leases)
+
+        async def scenario():
+            running = asyncio.ensure_future(polling.run())
+            while polling._loop is None:
+                await asyncio.sleep(0)
+            posted = await asyncio.get_running_loop().run_in_executor(
+                None, polling.post, 1, 'ответ'
+            )
+            await polling.replies.join()
+            running.cancel()
+            return posted
+
+        assert asyncio.run(scenario())
+        assert bot.sent == [(1, 'ответ')], (
+            'Ответ на команду должен уходить через очередь отправки и '
+            'не зависеть от аренды чата.'
+        )
+
+    def test_not_started_with_workers(self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'BOT_COMMANDS', True)
+        monkeypatch.setattr(homework_module, 'WORKERS', 2)
+        cache = StatusCache(VERDICTS)
+        assert homework_module.start_commands(cache, [1]) is None
+
+
+class TestPollerRecordsStatuses:
+    @pytest.mark.timeout(2)
+    def test_engine_records_new_statuses(self, monkeypatch,
+                                         homework_module):
+        monkeypatch.setattr(
+            homework_module, 'request_api', make_request_api({
+                'token': {'homeworks': [homework('hw1', 'approved')],
+                          'current_date': 5}
+            })
+        )
+        cache = StatusCache(homework_module.HOMEWORK_VERDICTS)
+        polling = engine.PollingEngine(
+            FakeBot(), [engine.Tenant('token', 1)], rate=None,
+            statuses=cache
+        )
+        asyncio.run(polling.run_cycle())
+        assert 'hw1' in cache.reply(1, '/status')
+
+    def test_send_changes_records_new_statuses(self, homework_module):
+        cache = StatusCache(homework_module.HOMEWORK_VERDICTS)
+        index = StatusIndex()
+        homework_module.send_changes(
+            FakeBot(), index, [homework('hw1', 'reviewing')],
+            statuses=cache
+        )
+        assert 'hw1' in cache.reply(
+            homework_module.TELEGRAM_CHAT_ID, '/status'
+        )
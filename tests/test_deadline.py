@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+
+import engine
+from deadline import STUCK_CYCLES, Deadline, Watchdog
+from exceptions import DeadlineExceededError
+from tests.utils import FakeBot, FakeClock
+
+
+class TestDeadline:
+    def test_stage_share_and_expiry(self):
+        clock = FakeClock()
+        deadline = Deadline(10, clock)
+        assert deadline.timeout('fetch') == 6
+        clock.now = 8
+        assert deadline.timeout('send') == 2, (
+            'Этап не может длиться дольше, чем осталось до конца цикла.'
+        )
+        clock.now = 10
+        with pytest.raises(DeadlineExceededError):
+            deadline.check('send')
+
+    def test_watchdog_reports_stuck_cycle_once(self):
+        clock = FakeClock()
+        watchdog = Watchdog(clock=clock)
+        before = STUCK_CYCLES.value()
+        watchdog.begin('main', Deadline(5, clock))
+        watchdog.begin('other', Deadline(50, clock))
+        clock.now = 6
+        assert watchdog.check() == ['main']
+        assert watchdog.check() == [], 'О зависшем цикле сообщаем один раз.'
+        watchdog.end('main')
+        assert STUCK_CYCLES.value() == before + 1
+
+    def test_request_api_passes_timeout(self, homework_module):
+        calls = []
+
+        class Session:
+            def get(self, url, **kwargs):
+                calls.append(kwargs['timeout'])
+                raise requests.exceptions.Timeout('timeout')
+
+        with pytest.raises(ConnectionError):
+            homework_module.request_api(
+                {'Authorization': 'OAuth token'}, 0, Session(), timeout=3
+            )
+        assert calls == [3]
+
+    @pytest.mark.timeout(2)
+    def test_hung_request_does_not_block_others(self, monkeypatch,
+                                                homework_module):
+        release = threading.Event()
+
+        def request_api(headers, timestamp, session, cache, breaker,
+                        timeout, stream):
+            if headers['Authorization'] == 'OAuth hung':
+                release.wait(timeout)
+                return {'homeworks': [], 'current_date': 1}
+            return {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': 1
+            }
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        bot = FakeBot()
+        tenants = [engine.Tenant('hung', 1), engine.Tenant('ok', 2)]
+        polling = engine.PollingEngine(
+            bot, tenants, max_in_flight=2, deadline=0.3
+        )
+        try:
+            asyncio.run(polling.run_cycle())
+        finally:
+            release.set()
+            polling.executor.shutdown(wait=True)
+        assert [chat for chat, _ in bot.sent] == [2], (
+            'Зависший запрос не должен задерживать других пользователей.'
+        )
+        assert tenants[0].timestamp == 0
+
+    @pytest.mark.timeout(2)
+    def test_deadline_starts_after_queue(self, monkeypatch, homework_module):
+        clock = FakeClock()
+        begun = {}
+
+        class RecordingWatchdog(Watchdog):
+            def begin(self, name, deadline):
+                begun[name] = deadline.expires
+                super().begin(name, deadline)
+
+        queued = threading.Event()
+        throttled = []
+
+        async def throttle():
+            throttled.append(True)
+            if len(throttled) == 2:
+                # Срабатывает, когда второй опрос уже ждёт своей очереди.
+                asyncio.get_running_loop().call_soon(queued.set)
+
+        def request_api(headers, timestamp, session, cache, breaker,
+                        timeout, stream):
+            queued.wait(1)
+            clock.now += 50
+            return {'homeworks': [], 'current_date': 1}
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        tenants = [engine.Tenant('first', 1), engine.Tenant('second', 2)]
+        polling = engine.PollingEngine(
+            FakeBot(), tenants, max_in_flight=1, rate=None, deadline=60,
+            clock=clock, watchdog=RecordingWatchdog(clock=clock)
+        )
+        polling.throttle = throttle
+        asyncio.run(polling.run_cycle())
+        assert begun == {1: 60, 2: 110}, (
+            'Срок цикла отсчитывается после ожидания места в '
+            '`max_in_flight`.'
+        )
@@ -0,0 +1,49 @@
+from dedup import ErrorDigest, error_key
+from exceptions import InvalidResponseCodeError
+
+ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+
+
+def make_error(timestamp):
+    return ConnectionError(
+        f'Эндпоинт {ENDPOINT} c параметрами: '
+        f"{{'from_date': {timestamp}}} - недоступен."
+    )
+
+
+class TestErrorDigest:
+    def test_key_ignores_request_details(self):
+        assert error_key(make_error(1)) == error_key(make_error(2)), (
+            'Ключ ошибки не должен зависеть от параметров запроса.'
+        )
+        assert error_key(make_error(1)) != error_key(
+            InvalidResponseCodeError(f'Эндпоинт "{ENDPOINT}" недоступен')
+        )
+
+    def test_alternating_errors_are_suppressed(self):
+        digest = ErrorDigest(window=3600)
+        first = InvalidResponseCodeError('Код ответа API: 500.')
+        messages = [
+            digest.message(error, now)
+            for now, error in enumerate([make_error(1), first] * 5)
+        ]
+        assert len([text for text in messages if text]) == 2, (
+            'Чередующиеся ошибки должны отправляться по одному разу.'
+        )
+
+    def test_repeated_error_is_summarized_after_window(self):
+        digest = ErrorDigest(window=3600)
+        assert digest.message(make_error(0), 0)
+        for now in range(600, 3600, 600):
+            assert digest.message(make_error(now), now) is None
+        summary = digest.message(make_error(3600), 3600)
+        assert summary is not None, (
+            'После окна ошибку нужно отправить снова.'
+        )
+        assert 'повторилась 5 раз' in summary
+
+    def test_memory_is_bounded(self):
+        digest = ErrorDigest(size=4)
+        for number in range(100):
+            digest.message(type(f'Error{number}', (Exception,), {})(), 0)
+        assert len(digest._entries) == 4
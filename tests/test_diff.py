@@ -0,0 +1,109 @@
+import telegram
+
+from diff import StatusIndex, homework_key
+
+
+class RecordingBot:
+    def __init__(self, fail_on=()):
+        self.sent = []
+        self.fail_on = fail_on
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if any(name in text for name in self.fail_on):
+            raise telegram.error.TelegramError('Something wrong')
+        self.sent.append(text)
+
+
+class TestStatusIndex:
+    def test_homework_key(self):
+        assert homework_key({'id': 7, 'homework_name': 'hw'}) == '7'
+        assert homework_key({'homework_name': 'hw'}) == 'hw'
+
+    def test_only_changed_homeworks(self):
+        index = StatusIndex({'1': 'reviewing', '2': 'approved'})
+        homeworks = [
+            {'id': 3, 'homework_name': 'new', 'status': 'reviewing'},
+            {'id': 2, 'homework_name': 'same', 'status': 'approved'},
+            {'id': 1, 'homework_name': 'changed', 'status': 'rejected'},
+        ]
+        changes = index.changes(homeworks)
+        assert [homework['id'] for homework in changes] == [1, 3], (
+            'Должны возвращаться все изменившиеся работы от старых к новым.'
+        )
+
+    def test_homework_without_status_is_not_skipped(self):
+        assert StatusIndex().changes([{'homework_name': 'hw'}])
+
+    def test_commit_calls_hook(self):
+        saved = []
+        index = StatusIndex(on_commit=lambda *args: saved.append(args))
+        index.commit({'id': 1, 'homework_name': 'hw', 'status': 'approved'})
+        assert index.statuses == {'1': 'approved'}
+        assert saved == [('1', 'approved', 'hw')]
+
+    def test_compact_representation(self):
+        index = StatusIndex({'1': 'approved', 'hw': 'reviewing'})
+        index.commit({'id': 2, 'status': 'on_hold'})
+        assert index._codes == {1: 1, 'hw': 0, 2: 'on_hold'}, (
+            'Числовые `id` должны храниться числами, а известные '
+            'статусы - кодами.'
+        )
+        assert index.statuses == {
+            '1': 'approved', 'hw': 'reviewing', '2': 'on_hold'
+        }
+        assert index.has_status('reviewing')
+        assert not index.has_status('rejected')
+
+    def test_pending_is_released(self):
+        index = StatusIndex()
+        homework = {'id': 1, 'status': 'approved'}
+        index.mark_pending(homework)
+        assert index.pending == {'1': 'approved'}
+        assert not index.changes([homework])
+        index.commit(homework)
+        assert index._pending is None, (
+            'После доставки словарь недоставленных статусов не нужен.'
+        )
+
+
+class TestSendChanges:
+    HOMEWORKS = [
+        {'homework_name': 'first', 'status': 'approved'},
+        {'homework_name': 'second', 'status': 'reviewing'},
+    ]
+
+    def test_every_transition_is_sent(self, monkeypatch, homework_module):
+        parsed = []
+        parse_status = homework_module.parse_status
+
+        def counting_parse_status(homework):
+            parsed.append(homework['homework_name'])
+            return parse_status(homework)
+
+        monkeypatch.setattr(
+            homework_module, 'parse_status', counting_parse_status
+        )
+        bot = RecordingBot()
+        index = StatusIndex()
+        assert homework_module.send_changes(bot, index, self.HOMEWORKS)
+        assert len(bot.sent) == 2, (
+            'Бот должен сообщать о каждой изменившейся работе, '
+            'а не только о первой.'
+        )
+
+        parsed.clear()
+        assert homework_module.send_changes(bot, index, self.HOMEWORKS)
+        assert parsed == [], (
+            'Работы с прежним статусом не должны разбираться повторно.'
+        )
+        assert len(bot.sent) == 2
+
+    def test_failed_delivery_is_retried(self, homework_module):
+        index = StatusIndex()
+        bot = RecordingBot(fail_on=('second',))
+        assert not homework_module.send_changes(bot, index, self.HOMEWORKS)
+        assert index.statuses == {'first': 'approved'}
+
+        bot.fail_on = ()
+        assert homework_module.send_changes(bot, index, self.HOMEWORKS)
+        assert len(bot.sent) == 2
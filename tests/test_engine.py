@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import sqlite3
+
+import pytest
+import requests
+
+import engine
+from benchmarks.simulation import InlineExecutor, VirtualClock, VirtualTimeLoop
+from exceptions import RateLimitedError
+from outbox import TokenBucket
+from scheduler import AdaptiveSchedule
+from state import StateStore
+from tests.utils import FakeBot, FakeResponse, make_request_api
+
+
+class TestPollingEngine:
+    @pytest.mark.timeout(2)
+    def test_each_tenant_notified(self, monkeypatch, homework_module):
+        responses = {
+            f'token{i}': {
+                'homeworks': [{'homework_name': f'hw{i}',
+                               'status': 'approved'}],
+                'current_date': 100 + i
+            }
+            for i in range(50)
+        }
+        monkeypatch.setattr(
+            homework_module, 'request_api', make_request_api(responses)
+        )
+        bot = FakeBot()
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(50)]
+        polling = engine.PollingEngine(
+            bot, tenants, max_in_flight=5, rate=None
+        )
+        polling.outbox.global_bucket = TokenBucket(10 ** 6, 10 ** 6)
+        asyncio.run(polling.run_cycle())
+        assert sorted(chat for chat, _ in bot.sent) == list(range(50)), (
+            'Каждый пользователь должен получить уведомление.'
+        )
+        assert all(
+            tenant.timestamp == 100 + tenant.chat_id for tenant in tenants
+        ), 'После отправки сообщения должна обновляться метка времени.'
+
+        asyncio.run(polling.run_cycle())
+        assert len(bot.sent) == 50, (
+            'Неизменившийся статус не должен отправляться повторно.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_in_flight_limit(self, monkeypatch, homework_module):
+        counter = {'active': 0, 'peak': 0}
+        responses = {
+            f'token{i}': {'homeworks': [], 'current_date': 1}
+            for i in range(40)
+        }
+        monkeypatch.setattr(
+            homework_module, 'request_api',
+            make_request_api(responses, counter)
+        )
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(40)]
+        polling = engine.PollingEngine(
+            FakeBot(), tenants, max_in_flight=3, rate=None
+        )
+        asyncio.run(polling.run_cycle())
+        assert counter['peak'] <= 3, (
+            'Количество одновременных запросов не должно превышать '
+            '`max_in_flight`.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_error_is_isolated_per_tenant(self, monkeypatch,
+                                          homework_module):
+        responses = {
+            'good': {'homeworks': [{'homework_name': 'hw',
+                                    'status': 'reviewing'}],
+                     'current_date': 5},
+            'bad': ['not', 'a', 'dict'],
+        }
+        monkeypatch.setattr(
+            homework_module, 'request_api', make_request_api(responses)
+        )
+        bot = FakeBot()
+        tenants = [engine.Tenant('good', 1), engine.Tenant('bad', 2)]
+        polling = engine.PollingEngine(bot, tenants, max_in_flight=2)
+        asyncio.run(polling.run_cycle())
+        messages = dict(bot.sent)
+        assert 'Сбой в работе программы' in messages[2]
+        assert homework_module.HOMEWORK_VERDICTS['reviewing'] in messages[1]
+
+    @pytest.mark.timeout(2)
+    def test_store_error_is_isolated_per_tenant(self, monkeypatch,
+                                                homework_module):
+        class LockedStore(StateStore):
+            def load(self, chat_id):
+                if chat_id == 2:
+                    raise sqlite3.OperationalError('database is locked')
+                return super().load(chat_id)
+
+        responses = {
+            f'token{i}': {'homeworks': [{'homework_name': f'hw{i}',
+                                         'status': 'approved'}],
+                          'current_date': 10}
+            for i in range(1, 4)
+        }
+        monkeypatch.setattr(
+            homework_module, 'request_api', make_request_api(responses)
+        )
+        bot = FakeBot()
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(1, 4)]
+        polling = engine.PollingEngine(
+            bot, tenants, store=LockedStore(), rate=None
+        )
+        asyncio.run(polling.run_cycle())
+        messages = dict(bot.sent)
+        assert 'database is locked' in messages[2], (
+            'Об ошибке хранилища нужно сообщить пользователю.'
+        )
+        verdict = homework_module.HOMEWORK_VERDICTS['approved']
+        assert verdict in messages[1] and verdict in messages[3], (
+            'Ошибка хранилища одного пользователя не должна останавливать '
+            'опрос остальных.'
+        )
+        assert not tenants[1].loaded
+
+    @pytest.mark.timeout(2)
+    def test_token_is_not_reported(self, caplog):
+        class Session:
+            def get(self, url, **kwargs):
+                raise requests.exceptions.ConnectionError('reset by peer')
+
+        bot = FakeBot()
+        polling = engine.PollingEngine(
+            bot, [engine.Tenant('secret-token', 1)], session=Session(),
+            rate=None, stream=False
+        )
+        with caplog.at_level(logging.DEBUG):
+            asyncio.run(polling.run_cycle())
+        assert 'недоступен' in bot.sent[0][1]
+        assert 'secret-token' not in bot.sent[0][1], (
+            'Токен Практикума не должен попадать в сообщение об ошибке.'
+        )
+        assert 'secret-token' not in caplog.text, (
+            'Токен Практикума не должен попадать в лог.'
+        )
+
+    def test_load_tenants(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'practicum_token': 'a', 'chat_id': 1},
+            {'practicum_token': 'b', 'chat_id': 2},
+        ]))
+        tenants = engine.load_tenants(path)
+        assert [tenant.chat_id for tenant in tenants] == [1, 2]
+        assert tenants[0].headers == {'Authorization': 'OAuth a'}
+
+
+class TestRateLimits:
+    def test_parse_retry_after(self, homework_module):
+        assert homework_module.parse_retry_after('120') == 120
+        assert homework_module.parse_retry_after(
+            'Thu, 01 Jan 1970 00:01:40 GMT', now=40
+        ) == 60
+        assert homework_module.parse_retry_after('завтра') is None
+        assert homework_module.parse_retry_after(None) is None
+
+    def test_request_api_raises_rate_limited(self, homework_module):
+        class Session:
+            def get(self, *args, **kwargs):
+                return FakeResponse(
+                    status_code=429, headers={'Retry-After': '30'}
+                )
+
+        with pytest.raises(RateLimitedError) as error:
+            homework_module.request_api(
+                {'Authorization': 'OAuth token'}, 0, Session()
+            )
+        assert error.value.retry_after == 30
+
+    def test_retry_after_delays_only_tenant(self, monkeypatch,
+                                            homework_module):
+        def request_api(headers, timestamp, *args):
+            if headers['Authorization'] == 'OAuth limited':
+                raise RateLimitedError('Код ответа API: 429.', 45)
+            return {'homeworks': [], 'current_date': 1}
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        tenants = [engine.Tenant('limited', 1), engine.Tenant('ok', 2)]
+        polling = engine.PollingEngine(
+            FakeBot(), tenants, schedule=AdaptiveSchedule(
+                base=600, reviewing=600, maximum=600, jitter=0
+            )
+        )
+
+        async def poll_all():
+            polling._semaphore = asyncio.Semaphore(2)
+            return await asyncio.gather(
+                *(polling.poll_tenant(tenant) for tenant in tenants)
+            )
+
+        outcomes = asyncio.run(poll_all())
+        assert [
+            polling.next_delay(tenant, outcome)
+            for tenant, outcome in zip(tenants, outcomes)
+        ] == [45, 600], (
+            'Retry-After должен откладывать только опрос этого пользователя.'
+        )
+
+    def test_global_budget(self, monkeypatch, homework_module):
+        clock = VirtualClock()
+        requested = []
+
+        def request_api(headers, timestamp, *args):
+            requested.append(clock())
+            return {'homeworks': [], 'current_date': 1}
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        polling = engine.PollingEngine(
+            FakeBot(), [engine.Tenant(f'token{i}', i) for i in range(10)],
+            clock=clock, executor=InlineExecutor(), rate=2, burst=1
+        )
+        loop = VirtualTimeLoop(clock)
+        try:
+            loop.run_until_complete(polling.run_cycle())
+        finally:
+            loop.close()
+        assert requested[-1] == pytest.approx(4.5), (
+            'Запросы к API должны укладываться в общий лимит частоты.'
+        )
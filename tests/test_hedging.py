@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hedging import HEDGE_WINS, HEDGED, Hedger
+
+
+def make_submit(executor, delays, release):
+    calls = []
+
+    def request(number):
+        if delays[number] is None:
+            release.wait(1)
+        return number
+
+    def submit():
+        calls.append(len(calls))
+        return executor.submit(request, calls[-1])
+
+    return submit, calls
+
+
+class TestHedger:
+    @pytest.mark.timeout(2)
+    def test_slow_request_is_hedged(self):
+        hedger = Hedger(budget=1, min_delay=0)
+        hedger.observe(0)
+        release = threading.Event()
+        hedged, wins = HEDGED.value(), HEDGE_WINS.value()
+        with ThreadPoolExecutor(2) as executor:
+            submit, calls = make_submit(executor, [None, 0], release)
+            result = asyncio.run(hedger.call(submit))
+            release.set()
+        assert result == 1, 'Нужно взять ответ того запроса, что быстрее.'
+        assert calls == [0, 1]
+        assert HEDGED.value() == hedged + 1
+        assert HEDGE_WINS.value() == wins + 1
+
+    @pytest.mark.timeout(2)
+    def test_loser_result_is_discarded(self):
+        hedger = Hedger(budget=1, min_delay=0)
+        hedger.observe(0)
+        release = threading.Event()
+        discarded = []
+        with ThreadPoolExecutor(2) as executor:
+            submit, _ = make_submit(executor, [None, 0], release)
+            result = asyncio.run(hedger.call(
+                submit, discard=lambda future: discarded.append(
+                    future.result()
+                )
+            ))
+            release.set()
+        assert result == 1
+        assert discarded == [0], (
+            'Ответ проигравшего запроса нужно отдать `discard`, чтобы '
+            'закрыть соединение.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_fast_request_is_not_hedged(self):
+        hedger = Hedger(budget=1, min_delay=5)
+        hedger.observe(5)
+        with ThreadPoolExecutor(2) as executor:
+            submit, calls = make_submit(executor, [0], threading.Event())
+            assert asyncio.run(hedger.call(submit)) == 0
+        assert calls == [0]
+
+    @pytest.mark.timeout(2)
+    def test_budget_limits_hedges(self, monkeypatch):
+        hedger = Hedger(budget=0.5, min_delay=0)
+        hedger.observe(0)
+        spend = hedger._spend
+        hedges = 0
+        with ThreadPoolExecutor(4) as executor:
+            for _ in range(4):
+                release = threading.Event()
+
+                def spend_or_release(release=release):
+                    # Без повтора первый запрос отвечает сам.
+                    if spend():
+                        return True
+                    release.set()
+                    return False
+
+                monkeypatch.setattr(hedger, '_spend', spend_or_release)
+                submit, calls = make_submit(executor, [None, 0], release)
+                asyncio.run(hedger.call(submit))
+                release.set()
+                hedges += len(calls) - 1
+        assert hedges == 2, (
+            'Повторов не должно быть больше доли `budget` от запросов.'
+        )
+
+    def test_threshold_follows_percentile(self):
+        hedger = Hedger(percentile=0.9, min_delay=0)
+        for latency in range(100):
+            hedger.observe(latency / 100)
+        assert hedger.delay() == pytest.approx(0.9, abs=0.02)
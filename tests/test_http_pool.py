@@ -0,0 +1,65 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_pool import HttpPool
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), JSONHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpPool:
+    def test_connections_are_reused(self, local_server):
+        pool = HttpPool(hosts=1, per_host=2)
+        for _ in range(5):
+            assert pool.get(local_server).json()['homeworks'] == []
+        stats = pool.stats()
+        pool.close()
+        assert stats['requests'] == 5
+        assert stats['new_connections'] == 1, (
+            'Keep-alive соединение должно переиспользоваться.'
+        )
+        assert stats['reused_connections'] == 4
+
+    def test_keep_alive_disabled(self, local_server):
+        pool = HttpPool(hosts=1, per_host=2, keep_alive=False)
+        for _ in range(3):
+            pool.get(local_server)
+        stats = pool.stats()
+        pool.close()
+        assert stats['new_connections'] == 3
+        assert stats['reuse_ratio'] == 0.0
+
+    def test_request_api_uses_session(self, local_server, monkeypatch,
+                                      homework_module):
+        monkeypatch.setattr(homework_module, 'ENDPOINT', local_server)
+        pool = HttpPool(hosts=1, per_host=1)
+        response = homework_module.request_api(
+            homework_module.make_headers('token'), 0, pool
+        )
+        pool.close()
+        assert response == {'homeworks': [], 'current_date': 1}
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+import engine
+from lease import LeaseKeeper
+from scheduler import DEFERRED
+from state import StateStore
+from tests.utils import FakeBot, FakeClock
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / 'state.sqlite3')
+    first, second = StateStore(path), StateStore(path)
+    yield first, second
+    first.close()
+    second.close()
+
+
+class TestLeaseKeeper:
+    def test_only_one_instance_holds_tenant(self, stores):
+        clock = FakeClock(1000.0)
+        first = LeaseKeeper(stores[0], [1, 2], ttl=30, owner='a', clock=clock)
+        second = LeaseKeeper(stores[1], [2, 3], ttl=30, owner='b',
+                             clock=clock)
+        first.renew()
+        second.renew()
+        assert 1 in first and 2 in first
+        assert 2 not in second, (
+            'Пользователя должен опрашивать только один экземпляр.'
+        )
+        assert 3 in second
+
+    def test_expired_lease_is_taken_over(self, stores):
+        clock = FakeClock(1000.0)
+        first = LeaseKeeper(stores[0], [1], ttl=30, owner='a', clock=clock)
+        second = LeaseKeeper(stores[1], [1], ttl=30, owner='b', clock=clock)
+        first.renew()
+        clock.now += 20
+        second.renew()
+        assert 1 not in second, 'Действующую аренду забирать нельзя.'
+        clock.now += 15
+        assert 1 not in first, (
+            'Без продления аренда должна перестать действовать раньше, '
+            'чем её заберёт другой экземпляр.'
+        )
+        second.renew()
+        assert 1 in second, (
+            'Аренду остановившегося экземпляра должен забрать другой.'
+        )
+        first.renew()
+        assert 1 not in first
+
+    def test_heartbeat_keeps_lease(self, stores):
+        clock = FakeClock(1000.0)
+        first = LeaseKeeper(stores[0], [1], ttl=30, owner='a', clock=clock)
+        second = LeaseKeeper(stores[1], [1], ttl=30, owner='b', clock=clock)
+        for _ in range(10):
+            first.renew()
+            clock.now += 10
+            second.renew()
+        assert 1 in first and 1 not in second
+
+    def test_stop_releases_leases(self, stores):
+        first = LeaseKeeper(stores[0], [1], ttl=30, owner='a').start()
+        first.stop()
+        second = LeaseKeeper(stores[1], [1], ttl=30, owner='b')
+        second.renew()
+        assert 1 not in first
+        assert 1 in second, (
+            'После остановки аренды должны сразу освобождаться.'
+        )
+
+
+class TestEngineLeases:
+    @pytest.mark.timeout(2)
+    def test_tenant_without_lease_is_not_polled(self, monkeypatch, stores,
+                                                homework_module):
+        calls = []
+
+        def request_api(*args):
+            calls.append(args)
+            return {'homeworks': [{'homework_name': 'hw',
+                                   'status': 'approved'}],
+                    'current_date': 5}
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        LeaseKeeper(stores[0], [1], ttl=30, owner='a').renew()
+        leases = LeaseKeeper(stores[1], [1], ttl=30, owner='b')
+        leases.renew()
+        bot = FakeBot()
+        tenant = engine.Tenant('token', 1)
+        polling = engine.PollingEngine(
+            bot, [tenant], store=stores[1], rate=None, leases=leases
+        )
+        outcome = asyncio.run(polling.poll_tenant(tenant))
+        assert outcome == DEFERRED
+        assert not calls and not bot.sent, (
+            'Пользователя без аренды опрашивать нельзя.'
+        )
+        assert tenant.retry_after == 10
+
+    def test_send_without_lease_is_fenced(self, stores):
+        leases = LeaseKeeper(stores[0], [1], ttl=30, owner='a')
+        bot = FakeBot()
+        polling = engine.PollingEngine(bot, [], leases=leases)
+        assert polling._send_message(1, 'text') is False
+        leases.renew()
+        assert polling._send_message(1, 'text') is True
+        assert bot.sent == [(1, 'text')]
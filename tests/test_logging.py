@@ -0,0 +1,26 @@
+import atexit
+import logging
+
+
+class TestLogging:
+    def test_queue_logging_writes_file(self, tmp_path, monkeypatch,
+                                       homework_module):
+        log_file = tmp_path / 'homework.py.log'
+        monkeypatch.setattr(homework_module, 'LOG_FILE', str(log_file))
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        root.handlers = []
+        try:
+            listener = homework_module.configure_logging()
+            logging.info('Проверка %s', 'логирования')
+            assert isinstance(
+                root.handlers[0], homework_module.LazyQueueHandler
+            ), 'Логирование должно идти через очередь.'
+            atexit.unregister(listener.stop)
+            listener.stop()
+        finally:
+            root.handlers = saved_handlers
+            root.setLevel(saved_level)
+        content = log_file.read_text(encoding='utf-8')
+        assert '[INFO]' in content
+        assert 'Проверка логирования' in content
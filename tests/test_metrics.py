@@ -0,0 +1,74 @@
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import metrics
+from diff import StatusIndex
+from exceptions import EmptyResponseFromAPIError
+from tests.utils import FakeBot
+
+
+class TestMetrics:
+    def test_histogram_render(self):
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест.', ('stage',), buckets=(0.1, 1, float('inf'))
+        )
+        histogram.observe(0.05, stage='fetch')
+        histogram.observe(0.5, stage='fetch')
+        lines = histogram.render()
+        assert 'test_seconds_bucket{stage="fetch",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="fetch",le="+Inf"} 2' in lines
+        assert 'test_seconds_count{stage="fetch"} 2' in lines
+
+    def test_timed_counts_exceptions(self, homework_module):
+        before = metrics.ERRORS.value(
+            stage='check_response', exception='EmptyResponseFromAPIError'
+        )
+        calls = metrics.STAGE_SECONDS.count(stage='check_response')
+        with pytest.raises(EmptyResponseFromAPIError):
+            homework_module.check_response({'current_date': 1})
+        assert metrics.ERRORS.value(
+            stage='check_response', exception='EmptyResponseFromAPIError'
+        ) == before + 1, 'Исключения этапов должны учитываться в счётчике.'
+        assert metrics.STAGE_SECONDS.count(
+            stage='check_response'
+        ) == calls + 1
+
+    def test_parse_status_stage_is_observed(self, homework_module):
+        calls = metrics.STAGE_SECONDS.count(stage='parse_status')
+        homework_module.send_changes(
+            FakeBot(), StatusIndex(),
+            [{'homework_name': 'hw', 'status': 'approved'}]
+        )
+        assert metrics.STAGE_SECONDS.count(
+            stage='parse_status'
+        ) == calls + 1, 'Сборка сообщения должна попадать в этап parse_status.'
+
+    def test_gauge_function(self):
+        gauge = metrics.Gauge('test_depth', 'Тест.', function=lambda: 3)
+        assert gauge.samples() == ['test_depth 3.0']
+
+    @pytest.mark.timeout(2)
+    def test_metrics_endpoint(self, homework_module):
+        homework_module.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}
+        )
+        server = metrics.start_metrics_server(0)
+        assert server is None, 'Без порта сервер метрик не запускается.'
+        server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), metrics.MetricsHandler
+        )
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with urllib.request.urlopen(
+                f'http://127.0.0.1:{port}/metrics'
+            ) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert '# TYPE homework_bot_stage_seconds histogram' in body
+        assert 'homework_bot_stage_seconds_count{stage="parse_status"}' in body
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from outbox import MAX_MESSAGE_LENGTH, Outbox, TokenBucket
+from state import StateStore
+from tests.utils import FakeClock
+
+
+class Recorder:
+    def __init__(self, retry_after_once=()):
+        self.sent = []
+        self.retry_after_once = set(retry_after_once)
+
+    async def __call__(self, chat_id, text):
+        if chat_id in self.retry_after_once:
+            self.retry_after_once.discard(chat_id)
+            raise RetryAfter(5)
+        self.sent.append((chat_id, text))
+        return True
+
+
+async def deliver_all(outbox, messages):
+    await outbox.start()
+    futures = [outbox.put(chat_id, text) for chat_id, text in messages]
+    await outbox.join()
+    await outbox.stop()
+    return [future.result() for future in futures]
+
+
+class TestTokenBucket:
+    def test_reserve_waits_for_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1.0]
+        clock.now = 10
+        assert bucket.full()
+
+    def test_block(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+        bucket.block(5)
+        assert bucket.reserve() == 5
+
+
+class TestOutbox:
+    @pytest.mark.timeout(2)
+    def test_messages_for_one_chat_are_merged(self):
+        clock = FakeClock()
+        recorder = Recorder()
+        outbox = Outbox(recorder, workers=1, clock=clock, sleep=clock.sleep)
+        results = asyncio.run(deliver_all(
+            outbox, [(1, 'first'), (1, 'second'), (2, 'other')]
+        ))
+        assert results == [True, True, True]
+        assert recorder.sent == [(1, 'first\n\nsecond'), (2, 'other')], (
+            'Сообщения для одного чата должны объединяться в одно.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_long_messages_are_split(self):
+        recorder = Recorder()
+        clock = FakeClock()
+        outbox = Outbox(recorder, workers=1, clock=clock, sleep=clock.sleep)
+        text = 'x' * (MAX_MESSAGE_LENGTH // 2)
+        asyncio.run(deliver_all(outbox, [(1, text)] * 3))
+        assert all(
+            len(sent) <= MAX_MESSAGE_LENGTH for _, sent in recorder.sent
+        )
+        assert len(recorder.sent) == 3
+
+    @pytest.mark.timeout(2)
+    def test_chat_rate_limit(self):
+        clock = FakeClock()
+        recorder = Recorder()
+        outbox = Outbox(recorder, chat_rate=0.5, workers=2,
+                        clock=clock, sleep=clock.sleep)
+
+        async def scenario():
+            await outbox.start()
+            outbox.put(1, 'first')
+            await asyncio.sleep(0)
+            outbox.put(1, 'second')
+            await outbox.join()
+            await outbox.stop()
+
+        asyncio.run(scenario())
+        assert len(recorder.sent) == 2
+        assert clock.now == pytest.approx(2.0), (
+            'Сообщения в один чат должны отправляться не чаще `chat_rate`.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_retry_after_delays_only_that_chat(self):
+        clock = FakeClock()
+        recorder = Recorder(retry_after_once={1})
+        outbox = Outbox(recorder, workers=1, clock=clock, sleep=clock.sleep)
+        results = asyncio.run(deliver_all(outbox, [(1, 'slow'), (2, 'fast')]))
+        assert results == [True, True]
+        assert recorder.sent == [(2, 'fast'), (1, 'slow')], (
+            'После `RetryAfter` сообщение должно быть отправлено повторно, '
+            'не задерживая другие чаты.'
+        )
+
+
+class TestDurableOutbox:
+    @pytest.mark.timeout(2)
+    def test_undelivered_messages_are_replayed(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+
+        async def crash(chat_id, text):
+            raise ConnectionError('Процесс упал во время отправки')
+
+        store = StateStore(path)
+
+        async def first_run():
+            outbox = Outbox(crash, journal=store)
+            await outbox.start()
+            outbox.put(1, 'hw approved', key='1:hw:approved')
+            await outbox.join()
+            await outbox.stop()
+
+        asyncio.run(first_run())
+        store.close()
+
+        recorder = Recorder()
+        restarted = StateStore(path)
+
+        async def restart():
+            outbox = Outbox(recorder, journal=restarted)
+            await outbox.start()
+            await outbox.join()
+            await outbox.stop()
+
+        asyncio.run(restart())
+        assert recorder.sent == [(1, 'hw approved')], (
+            'После перезапуска недоставленные сообщения должны '
+            'отправляться из журнала.'
+        )
+        assert restarted.undelivered_messages() == []
+
+    @pytest.mark.timeout(2)
+    def test_delivered_key_is_not_sent_again(self):
+        store = StateStore()
+        recorder = Recorder()
+
+        async def scenario():
+            outbox = Outbox(recorder, journal=store)
+            await outbox.start()
+            first = outbox.put(1, 'text', key='1:hw:approved')
+            duplicate = outbox.put(1, 'text', key='1:hw:approved')
+            await outbox.join()
+            again = outbox.put(1, 'text', key='1:hw:approved')
+            await outbox.join()
+            await outbox.stop()
+            return first is duplicate, again.result()
+
+        same_future, delivered = asyncio.run(scenario())
+        assert same_future
+        assert delivered
+        assert recorder.sent == [(1, 'text')], (
+            'Сообщение с одним ключом должно отправляться один раз.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_replay_only_own_chats(self):
+        store = StateStore()
+        store.journal_message('1:hw:approved', 1, 'first')
+        store.journal_message('2:hw:approved', 2, 'second')
+        recorder = Recorder()
+
+        async def restart():
+            outbox = Outbox(recorder, journal=store, chats={2})
+            await outbox.start()
+            await outbox.join()
+            await outbox.stop()
+
+        asyncio.run(restart())
+        assert recorder.sent == [(2, 'second')], (
+            'Обработчик должен отправлять из общего журнала только '
+            'сообщения своих чатов.'
+        )
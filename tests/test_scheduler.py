@@ -0,0 +1,49 @@
+import engine
+from diff import StatusIndex
+from scheduler import CHANGED, ERROR, IDLE, AdaptiveSchedule
+
+
+def make_tenant(statuses=None):
+    tenant = engine.Tenant('token', 1)
+    tenant.index = StatusIndex(statuses)
+    return tenant
+
+
+def make_schedule(rng=lambda: 0.5):
+    return AdaptiveSchedule(
+        base=600, reviewing=60, maximum=4800, factor=2, jitter=0.1, rng=rng
+    )
+
+
+class TestAdaptiveSchedule:
+    def test_reviewing_is_polled_faster(self):
+        tenant = make_tenant({'1': 'reviewing'})
+        assert make_schedule().next_interval(tenant, CHANGED) == 60, (
+            'Пока работа на проверке, интервал опроса должен сокращаться.'
+        )
+
+    def test_idle_backs_off_exponentially(self):
+        schedule = make_schedule()
+        tenant = make_tenant({'1': 'approved'})
+        intervals = [schedule.next_interval(tenant, IDLE) for _ in range(5)]
+        assert intervals == [1200, 2400, 4800, 4800, 4800]
+
+    def test_error_backs_off_even_when_reviewing(self):
+        schedule = make_schedule()
+        tenant = make_tenant({'1': 'reviewing'})
+        schedule.next_interval(tenant, CHANGED)
+        assert schedule.next_interval(tenant, ERROR) == 1200
+
+    def test_change_resets_interval(self):
+        schedule = make_schedule()
+        tenant = make_tenant({'1': 'approved'})
+        schedule.next_interval(tenant, IDLE)
+        assert schedule.next_interval(tenant, CHANGED) == 600
+
+    def test_jitter_bounds(self):
+        tenant = make_tenant()
+        low = make_schedule(rng=lambda: 0.0).next_interval(tenant, CHANGED)
+        high = make_schedule(rng=lambda: 1.0).next_interval(tenant, CHANGED)
+        assert (low, high) == (540, 660), (
+            'Разброс интервала должен быть в пределах `jitter`.'
+        )
@@ -0,0 +1,53 @@
+import pytest
+
+from exceptions import EmptyResponseFromAPIError
+from schema import compile_renderer, compile_validator
+
+VERDICTS = {'approved': 'Ура!', 'rejected': 'Есть замечания.'}
+
+
+class TestValidator:
+    validate = staticmethod(compile_validator(VERDICTS))
+
+    def test_valid_response(self):
+        homeworks = [{'homework_name': 'hw', 'status': 'approved'}]
+        assert self.validate({'homeworks': homeworks}) is homeworks
+
+    @pytest.mark.parametrize('response, error', [
+        ([], TypeError),
+        ({}, EmptyResponseFromAPIError),
+        ({'homeworks': {}}, TypeError),
+        ({'homeworks': ['hw']}, TypeError),
+        ({'homeworks': [{'status': 'approved'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': 'new'}]},
+         ValueError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': []}]},
+         ValueError),
+    ])
+    def test_invalid_response(self, response, error):
+        with pytest.raises(error):
+            self.validate(response)
+
+    def test_every_homework_is_checked(self):
+        homeworks = [
+            {'homework_name': 'first', 'status': 'approved'},
+            {'homework_name': 'second', 'status': 'unknown'},
+        ]
+        with pytest.raises(ValueError, match='unknown'):
+            self.validate({'homeworks': homeworks})
+
+
+class TestRenderer:
+    def test_message_is_cached(self):
+        render = compile_renderer(VERDICTS)
+        message = render('hw', 'approved')
+        assert message == 'Изменился статус проверки работы "hw". Ура!'
+        assert render('hw', 'approved') is message, (
+            'Сообщение для той же работы и статуса должно браться из кэша.'
+        )
+        assert render.cache_info().hits == 1
+
+    def test_unknown_status(self):
+        with pytest.raises(ValueError, match='new'):
+            compile_renderer(VERDICTS)('hw', 'new')
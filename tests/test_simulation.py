@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.simulation import (HOUR, VirtualClock, VirtualTimeLoop,
+                                   simulate)
+
+
+class TestSimulation:
+    def test_virtual_sleep_does_not_wait(self):
+        clock = VirtualClock()
+        loop = VirtualTimeLoop(clock)
+        started = time.perf_counter()
+        try:
+            loop.run_until_complete(asyncio.sleep(HOUR))
+        finally:
+            loop.close()
+        assert clock() >= HOUR, 'Виртуальные часы должны уйти вперёд.'
+        assert time.perf_counter() - started < 1
+
+    @pytest.mark.timeout(2)
+    def test_day_of_polling_in_virtual_time(self):
+        result = simulate(tenants=20, duration=24 * HOUR, strategy='fixed')
+        assert result['virtual_hours'] == 24
+        assert result['notifications'] > 0
+        assert result['notifications'] <= result['status_changes']
+        assert result['latency_p99'] <= 2 * 600, (
+            'При фиксированном интервале уведомление приходит не позже '
+            'следующего опроса.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_simulation_is_reproducible(self):
+        first = simulate(tenants=10, duration=6 * HOUR, seed=1)
+        second = simulate(tenants=10, duration=6 * HOUR, seed=1)
+        first.pop('wall_seconds')
+        second.pop('wall_seconds')
+        assert first == second
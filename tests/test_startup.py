@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from benchmarks.startup import CHECK_ENV, import_profile, measure_import
+
+
+class TestCheckConfig:
+    def test_valid_config(self, homework_module):
+        assert homework_module.check_config() == 0
+
+    def test_missing_token(self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'TELEGRAM_TOKEN', None)
+        assert homework_module.check_config() == 1
+
+    def test_unknown_execution_mode(self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'EXECUTION_MODE', 'fibers')
+        assert homework_module.check_config() == 1
+
+    def test_tenants_file(self, tmp_path, monkeypatch, homework_module):
+        path = tmp_path / 'tenants.json'
+        monkeypatch.setattr(homework_module, 'TENANTS_FILE', str(path))
+        assert homework_module.check_config() == 1, (
+            'Отсутствующий файл пользователей - ошибка настроек.'
+        )
+        path.write_text(json.dumps([{'chat_id': 1}]))
+        assert homework_module.check_config() == 1
+        path.write_text(json.dumps(
+            [{'practicum_token': 'token', 'chat_id': 1}]
+        ))
+        assert homework_module.check_config() == 0
+
+
+class TestStartup:
+    @pytest.mark.timeout(5)
+    def test_import_does_not_load_network_stack(self):
+        result = measure_import(runs=1)
+        assert result['heavy_modules'] == [], (
+            'Импорт homework не должен загружать telegram и requests.'
+        )
+
+    @pytest.mark.timeout(5)
+    def test_check_does_not_load_network_stack(self):
+        modules = {
+            name for name, _, _, _ in import_profile(
+                ['homework.py', '--check'], CHECK_ENV
+            )
+        }
+        assert 'telegram' not in modules and 'requests' not in modules, (
+            '`--check` должен работать без загрузки telegram и requests.'
+        )
+        assert 'dotenv' in modules
@@ -0,0 +1,122 @@
+import asyncio
+import sqlite3
+import threading
+
+import engine
+from state import StateStore
+from tests.utils import FakeBot
+
+
+class TestStateStore:
+    def test_unknown_tenant_starts_from_zero(self):
+        store = StateStore()
+        assert store.load('12345') == (0, '')
+
+    def test_state_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        store.save('12345', 1000198000, 'report')
+        store.close()
+
+        restarted = StateStore(path)
+        assert restarted.load('12345') == (1000198000, 'report'), (
+            'Состояние должно восстанавливаться после перезапуска.'
+        )
+        journal_mode = restarted.connection.execute(
+            'PRAGMA journal_mode'
+        ).fetchone()[0]
+        restarted.close()
+        assert journal_mode == 'wal'
+
+    def test_old_database_gets_homework_name(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE homework_status (tenant_key TEXT NOT NULL, '
+            'homework_key TEXT NOT NULL, status TEXT, '
+            'PRIMARY KEY (tenant_key, homework_key))'
+        )
+        connection.execute(
+            "INSERT INTO homework_status VALUES ('1', 'old', 'approved')"
+        )
+        connection.commit()
+        connection.close()
+        store = StateStore(path)
+        store.save_status(1, 'new', 'reviewing', 'hw')
+        assert store.load_statuses([1]) == [('1', 'hw', 'reviewing')], (
+            'Старая база должна дополняться столбцом с названием работы.'
+        )
+        store.close()
+
+    def test_connection_is_lazy(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        StateStore(str(path))
+        assert not path.exists(), (
+            'База должна открываться только при первом обращении.'
+        )
+
+    def test_engine_does_not_repeat_notification(self, tmp_path,
+                                                 monkeypatch,
+                                                 homework_module):
+        response = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 1000198000
+        }
+        requested = []
+
+        def request_api(headers, timestamp, session=None, cache=None,
+                        breaker=None, timeout=None, stream=False):
+            requested.append(timestamp)
+            return response
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        path = str(tmp_path / 'state.sqlite3')
+        for _ in range(2):
+            bot = FakeBot()
+            store = StateStore(path)
+            polling = engine.PollingEngine(
+                bot, [engine.Tenant('token', 1)], store=store
+            )
+            asyncio.run(polling.run_cycle())
+            store.close()
+        assert requested == [0, 1000198000], (
+            'После перезапуска опрос должен продолжаться с сохранённой '
+            'метки времени.'
+        )
+        assert bot.sent == [], (
+            'После перезапуска не должно быть повторных уведомлений.'
+        )
+
+    def test_engine_does_not_touch_store_on_loop(self, monkeypatch,
+                                                 homework_module):
+        calls = []
+
+        class RecordingStore(StateStore):
+            def __getattribute__(self, name):
+                attribute = super().__getattribute__(name)
+                if name in ('load', 'load_index', 'save', 'save_status',
+                            'journal_messages', 'mark_delivered'):
+                    def call(*args):
+                        calls.append(
+                            (name, threading.current_thread().name)
+                        )
+                        return attribute(*args)
+                    return call
+                return attribute
+
+        monkeypatch.setattr(homework_module, 'request_api', lambda *args: {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 1
+        })
+        store = RecordingStore()
+        polling = engine.PollingEngine(
+            FakeBot(), [engine.Tenant('token', 1)], store=store, rate=None
+        )
+        asyncio.run(polling.run_cycle())
+        assert {name for name, _ in calls} == {
+            'load', 'load_index', 'save', 'save_status',
+            'journal_messages', 'mark_delivered'
+        }
+        assert all(thread.startswith('store') for _, thread in calls), (
+            'Обращения к SQLite не должны блокировать цикл событий.'
+        )
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import engine
+from cache import NOT_MODIFIED, ResponseCache
+from diff import StatusIndex
+from exceptions import (EmptyResponseFromAPIError, InvalidResponseCodeError,
+                        RateLimitedError)
+from outbox import TokenBucket
+from stream import HomeworkStream, iter_array
+from tests.test_diff import RecordingBot
+from tests.utils import FakeBot
+
+BODY = {
+    'homeworks': [
+        {'id': 2, 'homework_name': 'второй', 'status': 'approved'},
+        {'id': 1, 'homework_name': 'первый', 'status': 'rejected'},
+    ],
+    'current_date': 1700000000,
+}
+
+
+def chunked(data, size=1):
+    content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    return [content[start:start + size]
+            for start in range(0, len(content), size)]
+
+
+class StreamResponse:
+    status_code = 200
+    url = 'https://practicum.example/'
+    headers = {}
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def json(self):
+        return json.loads(b''.join(self.chunks))
+
+    def close(self):
+        self.closed = True
+
+
+class TestIterArray:
+    @pytest.mark.parametrize('size', [1, 3, 7, 1024])
+    def test_items_and_fields(self, size):
+        fields = {}
+        items = list(iter_array(chunked(BODY, size), 'homeworks', fields))
+        assert items == BODY['homeworks']
+        assert fields == {'current_date': 1700000000}, (
+            'Число на границе фрагментов должно читаться целиком.'
+        )
+
+    @pytest.mark.parametrize('size', [1, 2, 4, 8])
+    def test_float_on_chunk_boundary(self, size):
+        fields = {}
+        body = b'{"a": 1.5, "b": -2.5e+3, "c": 4E2, "homeworks": []}'
+        chunks = [body[start:start + size]
+                  for start in range(0, len(body), size)]
+        assert list(iter_array(chunks, 'homeworks', fields)) == []
+        assert fields == {'a': 1.5, 'b': -2500.0, 'c': 400.0}, (
+            'Дробное число и экспонента на границе фрагментов должны '
+            'читаться целиком.'
+        )
+
+    def test_float_items_on_chunk_boundary(self):
+        data = {'homeworks': [1.5, 2, 3e-2], 'current_date': 1.25}
+        fields = {}
+        assert list(iter_array(chunked(data), 'homeworks', fields)) == [
+            1.5, 2, 0.03
+        ]
+        assert fields == {'current_date': 1.25}
+
+    def test_items_are_yielded_before_body_ends(self):
+        response = StreamResponse(chunked(BODY, 8))
+        first = next(iter(HomeworkStream(response)))
+        assert first == BODY['homeworks'][0]
+        assert response.read < len(response.chunks), (
+            'Первая работа должна отдаваться до конца тела ответа.'
+        )
+
+    @pytest.mark.parametrize('data, error', [
+        ([], TypeError),
+        ({'current_date': 1}, EmptyResponseFromAPIError),
+        ({'homeworks': {}}, TypeError),
+        ({}, EmptyResponseFromAPIError),
+    ])
+    def test_invalid_structure(self, data, error):
+        with pytest.raises(error):
+            list(iter_array(chunked(data, 4), 'homeworks', {}))
+
+    def test_broken_json(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_array([b'{"homeworks": [{"id": 1}'], 'homeworks', {}))
+
+    def test_connection_is_closed(self):
+        response = StreamResponse(chunked(BODY, 16))
+        stream = HomeworkStream(response)
+        assert len(list(stream)) == 2
+        assert stream.get('current_date') == 1700000000
+        assert response.closed
+
+
+class TestStreamingMode:
+    def test_request_api_returns_stream(self, homework_module):
+        class Session:
+            def get(self, url, headers=None, params=None, timeout=None,
+                    stream=False):
+                assert stream, 'Тело ответа должно читаться потоком.'
+                return StreamResponse(chunked(BODY, 16))
+
+        response = homework_module.request_api(
+            {'Authorization': 'OAuth token'}, 0, Session(), stream=True
+        )
+        assert isinstance(response, HomeworkStream)
+        bot = RecordingBot()
+        index = StatusIndex()
+        homeworks = homework_module.check_response(response)
+        assert homework_module.send_changes(bot, index, homeworks)
+        assert len(bot.sent) == 2
+        assert index.statuses == {'1': 'rejected', '2': 'approved'}
+        assert response.get('current_date') == 1700000000
+
+    @pytest.mark.parametrize('status_code', [304, 429, 500, 503])
+    def test_request_api_closes_unused_stream(self, status_code,
+                                              homework_module):
+        response = StreamResponse(chunked(BODY, 16))
+        response.status_code = status_code
+        response.headers = {'ETag': '"abc"'}
+
+        class Session:
+            def get(self, url, headers=None, params=None, timeout=None,
+                    stream=False):
+                return response
+
+        cache = ResponseCache()
+        headers = {'Authorization': 'OAuth token'}
+        cache.unchanged(headers, 0, StreamResponse([]), True)
+        if status_code == 304:
+            assert homework_module.request_api(
+                headers, 0, Session(), cache, stream=True
+            ) is NOT_MODIFIED
+        else:
+            with pytest.raises((RateLimitedError, InvalidResponseCodeError)):
+                homework_module.request_api(
+                    headers, 0, Session(), cache, stream=True
+                )
+        assert response.closed, (
+            'Потоковый ответ, который не будет прочитан, нужно закрыть.'
+        )
+
+    def test_invalid_homework_is_reported(self, homework_module):
+        body = {'homeworks': [{'homework_name': 'hw', 'status': 'new'}]}
+        homeworks = homework_module.check_response(
+            HomeworkStream(StreamResponse(chunked(body, 16)))
+        )
+        with pytest.raises(ValueError):
+            list(homeworks)
+
+    @pytest.mark.timeout(2)
+    def test_engine_notifies_from_stream(self, monkeypatch,
+                                         homework_module):
+        def request_api(headers, timestamp, session=None, cache=None,
+                        breaker=None, timeout=None, stream=False):
+            assert stream
+            return HomeworkStream(StreamResponse(chunked(BODY, 16)))
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        bot = FakeBot()
+        tenant = engine.Tenant('token', 1)
+        polling = engine.PollingEngine(bot, [tenant], rate=None, stream=True)
+        polling.outbox.global_bucket = TokenBucket(10 ** 6, 10 ** 6)
+        asyncio.run(polling.run_cycle())
+        sent = ''.join(text for _, text in bot.sent)
+        assert sent.count('Изменился статус') == 2
+        assert tenant.timestamp == 1700000000
+
+    @pytest.mark.timeout(2)
+    def test_engine_keeps_cursor_on_broken_stream(self, monkeypatch,
+                                                  homework_module):
+        body = chunked(BODY, 16)
+        body[-1] = b'!'
+
+        def request_api(*args):
+            return HomeworkStream(StreamResponse(body))
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        bot = FakeBot()
+        tenant = engine.Tenant('token', 1)
+        polling = engine.PollingEngine(bot, [tenant], rate=None)
+        polling.outbox.global_bucket = TokenBucket(10 ** 6, 10 ** 6)
+        asyncio.run(polling.run_cycle())
+        sent = ''.join(text for _, text in bot.sent)
+        assert sent.count('Изменился статус') == 2, (
+            'Прочитанные до сбоя работы должны быть отправлены.'
+        )
+        assert tenant.timestamp == 0, (
+            'Курсор не должен сдвигаться, если ответ прочитан не до конца.'
+        )
+        assert tenant.index.statuses == {'1': 'rejected', '2': 'approved'}
+
+    @pytest.mark.timeout(2)
+    def test_engine_compares_on_loop_once(self, monkeypatch,
+                                          homework_module):
+        body = {
+            'homeworks': BODY['homeworks'] + BODY['homeworks'][:1],
+            'current_date': BODY['current_date'],
+        }
+        threads = []
+
+        class RecordingIndex(StatusIndex):
+            def changed(self, homework):
+                threads.append(threading.current_thread())
+                return super().changed(homework)
+
+        def request_api(*args):
+            return HomeworkStream(StreamResponse(chunked(body, 16)))
+
+        monkeypatch.setattr(homework_module, 'request_api', request_api)
+        tenant = engine.Tenant('token', 1)
+        tenant.index = RecordingIndex()
+        polling = engine.PollingEngine(
+            FakeBot(), [tenant], rate=None, stream=True
+        )
+        polling.outbox.global_bucket = TokenBucket(10 ** 6, 10 ** 6)
+        enqueued = []
+        enqueue = polling.enqueue
+        monkeypatch.setattr(
+            polling, 'enqueue',
+            lambda tenant, item: enqueued.append(item['id'])
+            or enqueue(tenant, item)
+        )
+        asyncio.run(polling.run_cycle())
+        assert threads and set(threads) == {threading.main_thread()}, (
+            'Индекс должен сравниваться только в цикле событий.'
+        )
+        assert enqueued == [2, 1], (
+            'Работа, повторённая в ответе, должна ставиться в очередь '
+            'один раз.'
+        )
@@ -0,0 +1,149 @@
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+from supervisor import HashRing, Supervisor
+from tests.utils import FakeClock
+
+KEYS = range(10000)
+FORK = multiprocessing.get_context('fork')
+
+
+def exit_at_once(node, nodes):
+    raise SystemExit(1)
+
+
+def sleep_forever(node, nodes):
+    time.sleep(60)
+
+
+def owners(ring):
+    return {key: ring.node_for(key) for key in KEYS}
+
+
+class TestHashRing:
+    def test_balanced(self):
+        ring = HashRing(f'worker-{number}' for number in range(4))
+        counts = {}
+        for node in owners(ring).values():
+            counts[node] = counts.get(node, 0) + 1
+        assert len(counts) == 4
+        assert max(counts.values()) < 1.25 * len(KEYS) / 4, (
+            'Пользователи должны распределяться по обработчикам равномерно.'
+        )
+
+    def test_only_new_node_takes_keys(self):
+        ring = HashRing(f'worker-{number}' for number in range(4))
+        before = owners(ring)
+        ring.add('worker-4')
+        after = owners(ring)
+        moved = [key for key in KEYS if before[key] != after[key]]
+        assert all(after[key] == 'worker-4' for key in moved), (
+            'При добавлении обработчика пользователи должны переходить '
+            'только к нему.'
+        )
+        assert len(moved) < 1.5 * len(KEYS) / 5
+
+    def test_removed_node_keys_are_spread(self):
+        ring = HashRing(f'worker-{number}' for number in range(4))
+        before = owners(ring)
+        ring.remove('worker-1')
+        after = owners(ring)
+        assert all(
+            before[key] == after[key]
+            for key in KEYS if before[key] != 'worker-1'
+        ), 'Пользователи остальных обработчиков не должны переезжать.'
+        assert len({after[key] for key in KEYS
+                    if before[key] == 'worker-1'}) == 3
+
+    def test_empty_ring(self):
+        with pytest.raises(LookupError):
+            HashRing().node_for(1)
+
+
+class TestSupervisor:
+    @pytest.mark.timeout(5)
+    def test_crashed_worker_is_restarted_with_backoff(self):
+        clock = FakeClock()
+        supervisor = Supervisor(
+            exit_at_once, workers=2, restart_delay=1, max_restart_delay=8,
+            clock=clock, context=FORK
+        )
+        supervisor.start()
+        try:
+            first = supervisor.processes['worker-0']
+            first.join()
+            supervisor.processes['worker-1'].join()
+            supervisor.check()
+            assert supervisor.processes['worker-0'] is first, (
+                'Перезапуск должен ждать паузу.'
+            )
+            clock.now = 1
+            supervisor.check()
+            second = supervisor.processes['worker-0']
+            assert second is not first
+            second.join()
+            supervisor.check()
+            assert supervisor._restart_at['worker-0'] == 3, (
+                'Пауза перед перезапуском должна удваиваться, если '
+                'обработчик падает сразу.'
+            )
+        finally:
+            supervisor._terminate()
+
+    @pytest.mark.timeout(5)
+    def test_resize_restarts_with_new_ring(self):
+        supervisor = Supervisor(sleep_forever, workers=2, context=FORK)
+        supervisor.start()
+        try:
+            before = dict(supervisor.processes)
+            supervisor.resize(3)
+            assert supervisor.ring.nodes == [
+                'worker-0', 'worker-1', 'worker-2'
+            ]
+            assert all(process.is_alive()
+                       for process in supervisor.processes.values())
+            assert not any(process.is_alive()
+                           for process in before.values())
+            supervisor.resize(1)
+            assert list(supervisor.processes) == ['worker-0']
+        finally:
+            supervisor._terminate()
+
+
+class TestShardedEngine:
+    def test_worker_polls_only_own_tenants(self, monkeypatch, tmp_path):
+        tenants_file = tmp_path / 'tenants.json'
+        tenants_file.write_text(
+            '[' + ','.join(
+                f'{{"practicum_token": "t{number}", "chat_id": {number}}}'
+                for number in range(20)
+            ) + ']'
+        )
+        created = []
+
+        class RecordingEngine:
+            def __init__(self, bot, tenants, max_in_flight, **kwargs):
+                created.append((tenants, kwargs))
+                self.watchdog = kwargs['watchdog']
+                self.executor = SimpleNamespace(shutdown=lambda wait: None)
+                self.post = None
+
+            async def run(self):
+                pass
+
+        monkeypatch.setattr(engine, 'PollingEngine', RecordingEngine)
+        monkeypatch.setattr(engine.homework, 'PRACTICUM_RATE', 10)
+        engine.run_engine(
+            '123:token', tenants_file, 4,
+            owns=lambda chat_id: chat_id % 2 == 0, share=0.5
+        )
+        tenants, options = created[0]
+        assert [tenant.chat_id for tenant in tenants] == list(range(0, 20, 2))
+        assert options['rate'] == 5, (
+            'Общий лимит запросов должен делиться между обработчиками.'
+        )
+        assert options['outbox_options']['chats'] == set(range(0, 20, 2))
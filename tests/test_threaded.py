@@ -0,0 +1,156 @@
+import sqlite3
+
+import pytest
+from telegram.error import RetryAfter
+
+import engine
+import threaded
+from cache import ResponseCache
+from scheduler import CHANGED, ERROR, IDLE
+from state import StateStore
+from tests.utils import FakeBot, FakeResponse, FakeSession, make_request_api
+from threaded import ThreadedPoller
+
+
+def approved(number):
+    return {
+        'homeworks': [{'homework_name': f'hw{number}', 'status': 'approved'}],
+        'current_date': 100 + number
+    }
+
+
+def make_poller(bot, tenants, **kwargs):
+    return ThreadedPoller(
+        bot, tenants, max_in_flight=4, rate=None, telegram_rate=None,
+        stream=False, **kwargs
+    ).start()
+
+
+class TestThreadedPoller:
+    @pytest.mark.timeout(2)
+    def test_each_tenant_notified_once(self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'request_api', make_request_api(
+            {f'token{i}': approved(i) for i in range(30)}
+        ))
+        bot = FakeBot()
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(30)]
+        poller = make_poller(bot, tenants, queue_size=2)
+        try:
+            assert set(poller.run_cycle()) == {CHANGED}
+            assert sorted(chat for chat, _ in bot.sent) == list(range(30)), (
+                'Каждый пользователь должен получить уведомление, даже '
+                'если очередь отправки меньше числа пользователей.'
+            )
+            assert all(
+                tenant.timestamp == 100 + tenant.chat_id
+                for tenant in tenants
+            ), 'После отправки сообщения должна обновляться метка времени.'
+            assert set(poller.run_cycle()) == {IDLE}
+        finally:
+            poller.stop()
+        assert len(bot.sent) == 30, (
+            'Неизменившийся статус не должен отправляться повторно.'
+        )
+
+    @pytest.mark.timeout(2)
+    def test_failed_send_keeps_cursor(self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'request_api', make_request_api(
+            {'token': approved(1)}
+        ))
+        tenant = engine.Tenant('token', 1)
+        poller = make_poller(FakeBot(fail_chats=(1,)), [tenant])
+        try:
+            poller.run_cycle()
+        finally:
+            poller.stop()
+        assert tenant.timestamp == 0, (
+            'Курсор не должен сдвигаться, если уведомление не доставлено.'
+        )
+        assert tenant.index.changed(approved(1)['homeworks'][0])
+
+    @pytest.mark.timeout(2)
+    def test_error_is_isolated_per_tenant(self, monkeypatch,
+                                          homework_module):
+        monkeypatch.setattr(homework_module, 'request_api', make_request_api(
+            {'good': approved(1), 'bad': ['not', 'a', 'dict']}
+        ))
+        bot = FakeBot()
+        tenants = [engine.Tenant('good', 1), engine.Tenant('bad', 2)]
+        poller = make_poller(bot, tenants)
+        try:
+            assert poller.run_cycle() == [CHANGED, ERROR]
+        finally:
+            poller.stop()
+        messages = dict(bot.sent)
+        assert 'Сбой в работе программы' in messages[2]
+        assert homework_module.HOMEWORK_VERDICTS['approved'] in messages[1]
+
+    @pytest.mark.timeout(2)
+    def test_failed_send_is_retried_on_same_response(self):
+        body = approved(1)
+        bot = FakeBot(fail_chats=(1,))
+        tenant = engine.Tenant('token', 1)
+        poller = make_poller(
+            bot, [tenant], cache=ResponseCache(),
+            session=FakeSession([FakeResponse(body), FakeResponse(body)])
+        )
+        try:
+            poller.run_cycle()
+            bot.fail_chats = ()
+            assert poller.run_cycle() == [CHANGED], (
+                'Такой же ответ после неудачной отправки нужно разобрать '
+                'заново, а не считать попаданием в кеш.'
+            )
+        finally:
+            poller.stop()
+        assert [chat_id for chat_id, _ in bot.sent] == [1]
+
+    @pytest.mark.timeout(2)
+    def test_store_error_is_isolated_per_tenant(self, monkeypatch,
+                                                homework_module):
+        class LockedStore(StateStore):
+            def load(self, chat_id):
+                if chat_id == 2:
+                    raise sqlite3.OperationalError('database is locked')
+                return super().load(chat_id)
+
+        monkeypatch.setattr(homework_module, 'request_api', make_request_api(
+            {f'token{i}': approved(i) for i in range(1, 4)}
+        ))
+        bot = FakeBot()
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(1, 4)]
+        poller = make_poller(bot, tenants, store=LockedStore())
+        try:
+            assert poller.run_cycle() == [CHANGED, ERROR, CHANGED], (
+                'Ошибка хранилища одного пользователя не должна '
+                'останавливать опрос остальных.'
+            )
+        finally:
+            poller.stop()
+        assert 'database is locked' in dict(bot.sent)[2]
+
+    @pytest.mark.timeout(2)
+    def test_retry_after_is_waited_out(self, monkeypatch, homework_module):
+        class FloodBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                if not self.sent and not sleeps:
+                    raise RetryAfter(3)
+                super().send_message(chat_id, text, **kwargs)
+
+        sleeps = []
+        monkeypatch.setattr(threaded.time, 'sleep', sleeps.append)
+        monkeypatch.setattr(homework_module, 'request_api', make_request_api(
+            {'token': approved(1)}
+        ))
+        bot = FloodBot()
+        tenant = engine.Tenant('token', 1)
+        poller = make_poller(bot, [tenant], senders=1)
+        try:
+            assert poller.run_cycle() == [CHANGED]
+        finally:
+            poller.stop()
+        assert sleeps == [3], 'Нужно выждать паузу из `RetryAfter`.'
+        assert len(bot.sent) == 1 and tenant.timestamp == 101, (
+            '`RetryAfter` не считается сбоем: сообщение отправляется '
+            'повторно, а курсор сдвигается.'
+        )
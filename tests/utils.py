@@ -1,6 +1,9 @@
+import asyncio
+import json
 import logging
 import signal
 import re
+import threading
 from collections import namedtuple
 from contextlib import contextmanager
 from functools import wraps
@@ -165,3 +168,80 @@ def with_timeout(f):
             )
 
     return inner
+
+
+class FakeBot:
+    """Бот, который запоминает сообщения вместо отправки.
+
+    В чаты из `fail_chats` сообщения не отправляются.
+    """
+
+    def __init__(self, fail_chats=()):
+        self.sent = []
+        self.fail_chats = fail_chats
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if chat_id in self.fail_chats:
+            raise RuntimeError('Telegram недоступен.')
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+
+class FakeClock:
+    """Часы, которые идут, только когда тест сдвигает `now`."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def make_request_api(responses, counter=None):
+    """Подмена `request_api`, отвечающая `responses[токен]`.
+
+    В `counter` считается наибольшее число одновременных запросов.
+    """
+    lock = threading.Lock()
+
+    def request_api(headers, timestamp, session=None, cache=None,
+                    breaker=None, timeout=None, stream=False):
+        if counter is not None:
+            with lock:
+                counter['active'] += 1
+                counter['peak'] = max(counter['peak'], counter['active'])
+        try:
+            token = headers['Authorization'].split()[1]
+            return responses[token]
+        finally:
+            if counter is not None:
+                with lock:
+                    counter['active'] -= 1
+
+    return request_api
+
+
+class FakeResponse:
+    def __init__(self, data=None, status_code=HTTPStatus.OK, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(data or {}).encode()
+        self.headers = headers or {}
+        self.url = 'https://practicum.yandex.ru/'
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = iter(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.sent_headers.append(headers)
+        return next(self.responses)
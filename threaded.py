@@ -0,0 +1,291 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telegram.error import RetryAfter, TelegramError
+
+import homework
+from cache import NOT_MODIFIED, ResponseCache
+from commands import StatusCache
+from engine import NO_NEW_STATUSES, TenantPoller, load_tenants
+from exceptions import EmptyResponseFromAPIError, RateLimitedError
+from http_pool import HttpPool
+from lease import LeaseKeeper
+from outbox import TELEGRAM_GLOBAL_RATE, TokenBucket
+from scheduler import CHANGED, DEFERRED, ERROR, IDLE
+from stream import close_stream
+
+SEND_THREADS = int(os.getenv('SEND_THREADS', 4))
+SEND_QUEUE_SIZE = int(os.getenv('SEND_QUEUE_SIZE', 1000))
+STOP = object()
+
+
+class ThreadedPoller(TenantPoller):
+    """Опрос пользователей в пуле потоков, без asyncio.
+
+    Опрос пользователя - конвейер: поток из пула на `max_in_flight`
+    потоков запрашивает и проверяет его статусы и кладёт уведомления в
+    очередь на `queue_size` сообщений, а `senders` потоков отправляют их
+    в Telegram. Если отправка не успевает, очередь заполняется и
+    опрашивающие потоки ждут, так что память под уведомления ограничена.
+    Курсор опроса сдвигается, только когда доставлены все уведомления
+    ответа. Общие лимиты `rate` запросов к API и `telegram_rate`
+    сообщений в секунду делятся между всеми потоками. Если Telegram
+    отвечает `RetryAfter`, поток отправки выжидает паузу и отправляет
+    сообщение снова. Новые статусы записываются в `statuses` для команд
+    бота.
+    """
+
+    def __init__(self, bot, tenants, max_in_flight=homework.MAX_IN_FLIGHT,
+                 senders=SEND_THREADS, queue_size=SEND_QUEUE_SIZE,
+                 session=None, store=None, cache=None,
+                 rate=homework.PRACTICUM_RATE, burst=homework.PRACTICUM_BURST,
+                 telegram_rate=TELEGRAM_GLOBAL_RATE,
+                 retry_period=homework.RETRY_PERIOD, clock=time.monotonic,
+                 stream=homework.STREAM_RESPONSES, leases=None,
+                 statuses=None):
+        self.bot = bot
+        self.statuses = statuses
+        self.tenants = list(tenants)
+        self.session = session
+        self.store = store
+        self.cache = cache
+        self.stream = stream
+        self.leases = leases
+        self.clock = clock
+        self.retry_period = retry_period
+        self.budget = TokenBucket(rate, burst, clock) if rate else None
+        self.telegram_budget = (
+            TokenBucket(telegram_rate, telegram_rate, clock)
+            if telegram_rate else None
+        )
+        self._budget_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix='poller'
+        )
+        self.outgoing = queue.Queue(queue_size)
+        self.senders = [
+            threading.Thread(
+                target=self._send_loop, name=f'sender-{number}', daemon=True
+            )
+            for number in range(senders)
+        ]
+
+    def start(self):
+        """Запускаем потоки отправки сообщений."""
+        for sender in self.senders:
+            sender.start()
+        return self
+
+    def stop(self):
+        """Дожидаемся отправки очереди и останавливаем все потоки."""
+        self.executor.shutdown(wait=True)
+        for _ in self.senders:
+            self.outgoing.put(STOP)
+        for sender in self.senders:
+            sender.join()
+
+    def _wait_for(self, bucket):
+        """Ждём своей очереди в общем лимите `bucket`."""
+        if bucket is None:
+            return
+        with self._budget_lock:
+            wait = bucket.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def _send_loop(self):
+        while True:
+            item = self.outgoing.get()
+            if item is STOP:
+                return
+            chat_id, text, future = item
+            try:
+                future.set_result(self._send_message(chat_id, text))
+            except Exception as error:
+                logging.error('Cбой при отправке сообщения "%s" - %s',
+                              text, error)
+                future.set_result(False)
+
+    def _send_message(self, chat_id, text, fenced=True):
+        """Отправляем сообщение в общем лимите сообщений в Telegram.
+
+        На `RetryAfter` ждём указанную паузу и пробуем снова. С `fenced`
+        сообщение уходит, только пока чат за этим экземпляром.
+        """
+        while True:
+            if (fenced and self.leases is not None
+                    and not self.leases.holds(chat_id)):
+                logging.warning(
+                    'Аренда чата %s потеряна, сообщение не отправлено.',
+                    chat_id
+                )
+                return False
+            self._wait_for(self.telegram_budget)
+            try:
+                self.bot.send_message(
+                    chat_id, text, timeout=homework.SEND_TIMEOUT
+                )
+            except RetryAfter as error:
+                logging.warning(
+                    'Telegram просит подождать %s с перед отправкой в чат %s.',
+                    error.retry_after, chat_id
+                )
+                time.sleep(error.retry_after)
+                continue
+            except TelegramError as error:
+                logging.error(
+                    'Cбой при отправке сообщения "%s" - %s', text, error
+                )
+                return False
+            logging.debug('Бот отправил сообщение "%s"', text)
+            return True
+
+    def reply(self, chat_id, text):
+        """Отвечаем на команду в общем лимите сообщений в Telegram.
+
+        Ответ не зависит от аренды чата и не ждёт очереди уведомлений.
+        """
+        return self._send_message(chat_id, text, fenced=False)
+
+    def send(self, chat_id, text):
+        """Ставим сообщение в очередь отправки, ожидая места в ней."""
+        future = Future()
+        self.outgoing.put((chat_id, text, future))
+        return future
+
+    def _store_submit(self, func, *args):
+        """Пишем в хранилище сразу, в потоке опроса."""
+        func(*args)
+
+    def _notify(self, chat_id, text):
+        self.send(chat_id, text)
+
+    def handle_response(self, tenant, response):
+        """Отправляем уведомления о новых статусах и сдвигаем курсор.
+
+        Уведомления о работах из потокового ответа встают в очередь
+        по мере чтения. Если чтение прервалось, уже отправленные
+        уведомления всё равно фиксируются, но курсор не сдвигается.
+        """
+        if response is NOT_MODIFIED:
+            logging.debug(NO_NEW_STATUSES)
+            return IDLE
+        homeworks = homework.check_response(response)
+        if isinstance(homeworks, list):
+            changes = tenant.index.changes(homeworks)
+        else:
+            changes = filter(tenant.index.changed, homeworks)
+        deliveries = []
+        try:
+            for changed in changes:
+                if self.statuses is not None:
+                    self.statuses.record(tenant.chat_id, changed)
+                deliveries.append((changed, self.send(
+                    tenant.chat_id, homework.parse_status(changed)
+                )))
+        finally:
+            delivered = self.confirm(tenant, deliveries)
+        if not deliveries:
+            logging.debug(NO_NEW_STATUSES)
+            if tenant.prev_report:
+                tenant.prev_report = ''
+                self.save_state(tenant)
+            return IDLE
+        if delivered:
+            tenant.timestamp = max(
+                tenant.timestamp,
+                response.get('current_date', tenant.timestamp)
+            )
+            tenant.prev_report = ''
+            self.save_state(tenant)
+        return CHANGED
+
+    def confirm(self, tenant, deliveries):
+        """Ждём доставки уведомлений и фиксируем доставленные статусы.
+
+        Если что-то не доставлено, запись кеша ответов сбрасывается, чтобы
+        такой же ответ при следующем опросе разобрать и отправить заново.
+        """
+        delivered = True
+        for changed, delivery in deliveries:
+            if delivery.result():
+                tenant.index.commit(changed)
+            else:
+                delivered = False
+        if not delivered and self.cache is not None:
+            self.cache.invalidate(tenant.headers)
+        return delivered
+
+    def poll_tenant(self, tenant):
+        """Выполняем один опрос пользователя и возвращаем его итог."""
+        if self.leases is not None and not self.leases.holds(tenant.chat_id):
+            tenant.loaded = False
+            return DEFERRED
+        try:
+            self.restore_state(tenant)
+            self._wait_for(self.budget)
+            response = homework.request_api(
+                tenant.headers, tenant.timestamp, self.session, self.cache,
+                None, homework.REQUEST_TIMEOUT, self.stream
+            )
+            try:
+                return self.handle_response(tenant, response)
+            finally:
+                close_stream(response)
+        except RateLimitedError as error:
+            logging.warning(error)
+            return DEFERRED
+        except EmptyResponseFromAPIError as error:
+            logging.error('Пустой ответ от API - %s', error)
+        except Exception as error:
+            self.report_error(tenant, error)
+        return ERROR
+
+    def run_cycle(self):
+        """Опрашиваем всех пользователей один раз и возвращаем итоги."""
+        return list(self.executor.map(self.poll_tenant, self.tenants))
+
+    def run(self):
+        """Опрашиваем всех пользователей раз в `retry_period` секунд."""
+        while True:
+            started = self.clock()
+            self.run_cycle()
+            time.sleep(max(0.0, started + self.retry_period - self.clock()))
+
+
+def run_threaded(telegram_token, tenants_file,
+                 max_in_flight=homework.MAX_IN_FLIGHT, store=None):
+    """Запускаем многопользовательский опрос API в пуле потоков."""
+    tenants = load_tenants(tenants_file)
+    logging.info('Загружено пользователей: %s.', len(tenants))
+    pool = HttpPool(per_host=max_in_flight)
+    leases = None
+    if store is not None:
+        leases = LeaseKeeper(
+            store, [tenant.chat_id for tenant in tenants]
+        ).start()
+    bot = pool.make_bot(telegram_token)
+    statuses = StatusCache(homework.HOMEWORK_VERDICTS)
+    poller = ThreadedPoller(
+        bot, tenants, max_in_flight, session=pool, store=store,
+        cache=ResponseCache(), leases=leases, statuses=statuses
+    ).start()
+    commands = homework.start_commands(
+        statuses, [tenant.chat_id for tenant in tenants], bot, poller.reply,
+        store
+    )
+    try:
+        poller.run()
+    finally:
+        poller.stop()
+        pool.close()
+        if commands is not None:
+            commands.stop()
+        if leases is not None:
+            leases.stop()
+        if store is not None:
+            store.close()